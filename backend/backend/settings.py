@@ -15,6 +15,7 @@ import sys
 from datetime import timedelta
 from pathlib import Path
 
+from celery.schedules import crontab
 from dotenv_vault import load_dotenv
 
 from .api_description import API_DESCRIPTION
@@ -312,6 +313,24 @@ CELERY_TASK_TIME_LIMIT = 30 * 60
 CELERY_TASK_ACKS_LATE = True
 CELERY_TASK_REJECT_ON_WORKER_LOST = True
 CELERY_RESULT_BACKEND = "django-db"
+CELERY_BEAT_SCHEDULE = {
+    "create-log-partitions-ahead": {
+        "task": "zane_api.tasks.create_log_partitions_ahead",
+        "schedule": crontab(minute=0, hour="*/6"),
+    },
+    "drop-expired-logs": {
+        "task": "zane_api.tasks.drop_expired_logs",
+        "schedule": crontab(minute=30, hour=0),
+    },
+    "purge-expired-logs": {
+        "task": "zane_api.tasks.purge_expired_logs",
+        "schedule": crontab(minute=15),
+    },
+    "archive-logs": {
+        "task": "zane_api.tasks.archive_logs",
+        "schedule": crontab(minute=0, hour=1),
+    },
+}
 CELERY_CACHE_BACKEND = "default"
 CELERY_ACCEPT_CONTENT = ["application/json"]
 CELERY_TASK_SERIALIZER = "json"
@@ -335,9 +354,71 @@ ZANE_FRONT_SERVICE_INTERNAL_DOMAIN = (
 )
 ZANE_FLUENTD_HOST = os.environ.get("ZANE_FLUENTD_HOST", "unix://$HOME/.fluentd/fluentd.sock")
 
+# Logs ingestion
+LOGS_INGEST_STREAMING = os.environ.get("LOGS_INGEST_STREAMING", "true") == "true"
+LOGS_INGEST_CHUNK_SIZE = int(os.environ.get("LOGS_INGEST_CHUNK_SIZE", 500))
+LOGS_COLLECTOR_SOCKET = os.environ.get("LOGS_COLLECTOR_SOCKET")
+LOGS_COLLECTOR_PORT = int(os.environ.get("LOGS_COLLECTOR_PORT", 24224))
+# `direct` writes the logs to the DB inside the request, `queue` appends them to a redis stream
+# drained by the `run_log_queue_writer` command
+LOGS_INGEST_MODE = os.environ.get("LOGS_INGEST_MODE", "direct")
+LOGS_QUEUE_STREAM = os.environ.get("LOGS_QUEUE_STREAM", "zane:logs:ingest")
+LOGS_QUEUE_GROUP = "log-writers"
+# number of pending batches in the stream after which new batches are rejected with a `429`
+LOGS_QUEUE_MAX_LENGTH = int(os.environ.get("LOGS_QUEUE_MAX_LENGTH", 10_000))
+# estimation of the number of batches drained per second, used to compute the `Retry-After` header
+LOGS_QUEUE_DRAIN_RATE = int(os.environ.get("LOGS_QUEUE_DRAIN_RATE", 100))
+# the log tables are partitioned by day, partitions older than the retention are dropped
+LOGS_RETENTION_DAYS = int(os.environ.get("LOGS_RETENTION_DAYS", 30))
+LOGS_PARTITIONS_DAYS_AHEAD = 7
+# maximum number of rows deleted per transaction when purging the logs of services with a shorter retention
+LOGS_PURGE_CHUNK_SIZE = int(os.environ.get("LOGS_PURGE_CHUNK_SIZE", 5_000))
+# service logs older than this are moved from the database to compressed segments in `LOGS_ARCHIVE_DIR`
+LOGS_ARCHIVE_AFTER_DAYS = int(os.environ.get("LOGS_ARCHIVE_AFTER_DAYS", 7))
+LOGS_ARCHIVE_DIR = os.environ.get("LOGS_ARCHIVE_DIR", str(BASE_DIR / ".logs-archive"))
+# number of the most recent logs of each deployment kept in redis to serve the first page of its logs
+LOGS_RECENT_BUFFER_SIZE = int(os.environ.get("LOGS_RECENT_BUFFER_SIZE", 500))
+# default budget of log lines ingested per second for each service, shared by all the API workers
+LOGS_SERVICE_RATE_LIMIT = int(os.environ.get("LOGS_SERVICE_RATE_LIMIT", 1_000))
+# the budget of a service is refilled every window, so it can burst up to `rate limit * window` lines
+LOGS_RATE_LIMIT_WINDOW_SECONDS = 10
+# number of rows fetched at a time from the server-side cursor of the log exports
+LOGS_EXPORT_CHUNK_SIZE = int(os.environ.get("LOGS_EXPORT_CHUNK_SIZE", 2_000))
+# lines of a container received within this delay of the previous one can be joined into the same multi-line record
+LOGS_MULTILINE_WINDOW_MS = int(os.environ.get("LOGS_MULTILINE_WINDOW_MS", 1_000))
+# maximum number of lines joined into a single multi-line record
+LOGS_MULTILINE_MAX_LINES = int(os.environ.get("LOGS_MULTILINE_MAX_LINES", 500))
+# lines longer than this (in characters) are stored compressed in a separate table, the log only keeps a preview
+LOGS_MAX_INLINE_LENGTH = int(os.environ.get("LOGS_MAX_INLINE_LENGTH", 16_384))
+# number of characters of the line kept in the log when it is longer than `LOGS_MAX_INLINE_LENGTH`
+LOGS_PREVIEW_LENGTH = int(os.environ.get("LOGS_PREVIEW_LENGTH", 1_024))
+# headers of the requests & responses kept in the http logs (case insensitive, comma separated), `*` keeps all of them
+# each distinct set of headers is stored once, the headers unique to a request or a client (ids, IPs, URLs) are left out
+LOGS_HTTP_HEADERS_ALLOWLIST = os.environ.get(
+    "LOGS_HTTP_HEADERS_ALLOWLIST",
+    "Accept,Accept-Encoding,Accept-Language,Cache-Control,Content-Encoding,Content-Type,Origin,Server,User-Agent,X-Forwarded-Proto",
+).split(",")
+
 DEFAULT_HEALTHCHECK_TIMEOUT = 30  # seconds
 DEFAULT_HEALTHCHECK_INTERVAL = 30  # seconds
 DEFAULT_HEALTHCHECK_WAIT_INTERVAL = 5.0  # seconds
+# the deployment monitor also checks the requests received by the deployment (from the http log rollups),
+# and marks the deployment as unhealthy if they breach one of these thresholds
+DEPLOYMENT_HTTP_5XX_WINDOW_MINUTES = int(
+    os.environ.get("DEPLOYMENT_HTTP_5XX_WINDOW_MINUTES", 5)
+)
+DEPLOYMENT_HTTP_MAX_5XX_RATIO = float(
+    os.environ.get("DEPLOYMENT_HTTP_MAX_5XX_RATIO", 0.5)
+)
+DEPLOYMENT_HTTP_LATENCY_WINDOW_MINUTES = int(
+    os.environ.get("DEPLOYMENT_HTTP_LATENCY_WINDOW_MINUTES", 5)
+)
+# `0` disables the latency threshold
+DEPLOYMENT_HTTP_MAX_P99_MS = int(os.environ.get("DEPLOYMENT_HTTP_MAX_P99_MS", 30_000))
+# below this number of requests in the window, the thresholds are not checked
+DEPLOYMENT_HTTP_HEALTH_MIN_REQUESTS = int(
+    os.environ.get("DEPLOYMENT_HTTP_HEALTH_MIN_REQUESTS", 20)
+)
 
 if not TESTING:
     register_zaneops_app_on_proxy(
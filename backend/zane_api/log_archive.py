@@ -0,0 +1,346 @@
+"""
+Cold storage of the old `SimpleLog` rows, in zstd compressed NDJSON segments, one file per service per day.
+
+A segment is a sequence of independent zstd frames, each frame containing a block of logs sorted by time.
+Next to each segment, a sparse index stores the time of the first log of every block with its byte offset,
+so that reading a time range only decompresses the blocks overlapping it.
+"""
+
+import bisect
+import datetime
+import heapq
+import json
+import mmap
+import os
+import struct
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterator, Iterable
+
+import zstandard
+from django.conf import settings
+from django.db import transaction
+from django.db.models.functions import TruncDay
+
+from .models import SimpleLog, SimpleLogField
+from .utils import chunked
+
+LOG_SEGMENT_BLOCK_SIZE = 1_000
+LOG_SEGMENT_COMPRESSION_LEVEL = 9
+LOG_SEGMENT_EXTENSION = ".ndjson.zst"
+LOG_SEGMENT_INDEX_EXTENSION = ".idx"
+# (time of the first log of the block in microseconds since the epoch, offset of the block in the segment)
+LOG_SEGMENT_INDEX_ENTRY = struct.Struct("<qQ")
+ARCHIVED_LOG_FIELDS = (
+    "id",
+    "created_at",
+    "service_id",
+    "deployment_id",
+    "time",
+    "content",
+    "content_json",
+    "content_blob_id",
+    "level",
+    "source",
+)
+
+
+@dataclass
+class LogSegmentIndexEntry:
+    time: int
+    offset: int
+
+
+def to_microseconds(value: datetime.datetime) -> int:
+    epoch = datetime.datetime(1970, 1, 1, tzinfo=datetime.UTC)
+    return (value - epoch) // datetime.timedelta(microseconds=1)
+
+
+def get_segment_path(service_id: str, day: datetime.date) -> Path:
+    return (
+        Path(settings.LOGS_ARCHIVE_DIR)
+        / service_id
+        / f"{day.isoformat()}{LOG_SEGMENT_EXTENSION}"
+    )
+
+
+def get_segment_index_path(segment_path: Path) -> Path:
+    return segment_path.with_name(
+        segment_path.name.removesuffix(LOG_SEGMENT_EXTENSION)
+        + LOG_SEGMENT_INDEX_EXTENSION
+    )
+
+
+def list_segment_days(service_id: str) -> list[datetime.date]:
+    service_dir = Path(settings.LOGS_ARCHIVE_DIR) / service_id
+    if not service_dir.is_dir():
+        return []
+    return sorted(
+        datetime.date.fromisoformat(path.name.removesuffix(LOG_SEGMENT_EXTENSION))
+        for path in service_dir.glob(f"*{LOG_SEGMENT_EXTENSION}")
+    )
+
+
+def serialize_log(log: dict) -> dict:
+    content_blob_id = log.get("content_blob_id")
+    return {
+        **log,
+        "id": str(log["id"]),
+        "created_at": log["created_at"].isoformat(),
+        "time": log["time"].isoformat(),
+        "content_blob_id": (
+            str(content_blob_id) if content_blob_id is not None else None
+        ),
+    }
+
+
+def deserialize_log(line: bytes) -> dict:
+    log = json.loads(line)
+    log["created_at"] = datetime.datetime.fromisoformat(log["created_at"])
+    log["time"] = datetime.datetime.fromisoformat(log["time"])
+    if "content_json" not in log:
+        # segments archived before `content_json`, when `content` stored the parsed JSON lines
+        content = log["content"]
+        log["content"], log["content_json"] = (
+            (content, None)
+            if isinstance(content, str) or content is None
+            else (None, content)
+        )
+    return log
+
+
+def read_segment_index(segment_path: Path) -> list[LogSegmentIndexEntry]:
+    data = get_segment_index_path(segment_path).read_bytes()
+    return [
+        LogSegmentIndexEntry(time=time, offset=offset)
+        for time, offset in LOG_SEGMENT_INDEX_ENTRY.iter_unpack(data)
+    ]
+
+
+def write_segment(segment_path: Path, logs: Iterable[dict]):
+    """
+    Write the logs (sorted by time) as a segment and its index, one block at a time,
+    both files are written to a temporary path then renamed, so that readers never see a partial segment.
+    """
+    segment_path.parent.mkdir(parents=True, exist_ok=True)
+    index_path = get_segment_index_path(segment_path)
+    compressor = zstandard.ZstdCompressor(level=LOG_SEGMENT_COMPRESSION_LEVEL)
+
+    tmp_segment_path = segment_path.with_name(f".{segment_path.name}.tmp")
+    tmp_index_path = index_path.with_name(f".{index_path.name}.tmp")
+    with open(tmp_segment_path, "wb") as segment, open(tmp_index_path, "wb") as index:
+        for block in chunked(logs, LOG_SEGMENT_BLOCK_SIZE):
+            index.write(
+                LOG_SEGMENT_INDEX_ENTRY.pack(
+                    to_microseconds(block[0]["time"]), segment.tell()
+                )
+            )
+            segment.write(
+                compressor.compress(
+                    b"".join(
+                        json.dumps(serialize_log(log)).encode() + b"\n" for log in block
+                    )
+                )
+            )
+        segment.flush()
+        os.fsync(segment.fileno())
+        index.flush()
+        os.fsync(index.fileno())
+    os.replace(tmp_segment_path, segment_path)
+    os.replace(tmp_index_path, index_path)
+
+
+def read_segment(
+    segment_path: Path,
+    time_after: datetime.datetime | None = None,
+    time_before: datetime.datetime | None = None,
+    reverse: bool = False,
+) -> Iterator[dict]:
+    """
+    Read the logs of a segment in the time range `[time_after, time_before)`, from the newest if `reverse`,
+    only the blocks overlapping the range are decompressed.
+    """
+    index = read_segment_index(segment_path)
+    block_times = [entry.time for entry in index]
+
+    first_block = 0
+    if time_after is not None:
+        # the last block starting before `time_after` may contain logs of the range
+        first_block = max(
+            bisect.bisect_right(block_times, to_microseconds(time_after)) - 1, 0
+        )
+    last_block = len(index) - 1
+    if time_before is not None:
+        # the blocks starting at or after `time_before` only contain logs after the range
+        last_block = bisect.bisect_left(block_times, to_microseconds(time_before)) - 1
+
+    blocks = range(first_block, last_block + 1)
+    if len(blocks) == 0:
+        return
+
+    decompressor = zstandard.ZstdDecompressor()
+    with open(segment_path, "rb") as file, mmap.mmap(
+        file.fileno(), 0, access=mmap.ACCESS_READ
+    ) as segment:
+        for position in reversed(blocks) if reverse else blocks:
+            start = index[position].offset
+            end = (
+                index[position + 1].offset
+                if position + 1 < len(index)
+                else len(segment)
+            )
+            lines = decompressor.decompress(segment[start:end]).splitlines()
+            if reverse:
+                lines.reverse()
+            for line in lines:
+                log = deserialize_log(line)
+                if time_after is not None and log["time"] < time_after:
+                    continue
+                if time_before is not None and log["time"] >= time_before:
+                    continue
+                yield log
+
+
+def iter_archived_logs(
+    service_id: str,
+    time_after: datetime.datetime | None = None,
+    time_before: datetime.datetime | None = None,
+    reverse: bool = False,
+) -> Iterator[dict]:
+    """
+    Read the archived logs of a service in the time range `[time_after, time_before)`,
+    sorted by time, from the newest if `reverse`.
+    """
+    days = list_segment_days(service_id)
+    for day in reversed(days) if reverse else days:
+        day_start = datetime.datetime.combine(day, datetime.time(), tzinfo=datetime.UTC)
+        if time_before is not None and day_start >= time_before:
+            continue
+        if (
+            time_after is not None
+            and day_start + datetime.timedelta(days=1) <= time_after
+        ):
+            continue
+        yield from read_segment(
+            get_segment_path(service_id, day), time_after, time_before, reverse
+        )
+
+
+def merge_logs(archived: Iterable[dict], logs: Iterable[dict]) -> Iterator[dict]:
+    """
+    Merge two streams of logs sorted by time & id, the logs of `logs` replace the archived logs with the same id.
+    """
+    previous = None
+    # on equal keys, `heapq.merge` yields the archived log first
+    for log in heapq.merge(
+        archived, logs, key=lambda log: (log["time"], str(log["id"]))
+    ):
+        if previous is not None and str(previous["id"]) != str(log["id"]):
+            yield previous
+        previous = log
+    if previous is not None:
+        yield previous
+
+
+def archive_service_logs_of_day(service_id: str, day: datetime.date) -> int:
+    """
+    Move the logs of a service for a day to its segment, returns the number of logs archived.
+    """
+    day_start = datetime.datetime.combine(day, datetime.time(), tzinfo=datetime.UTC)
+    queryset = SimpleLog.objects.filter(
+        service_id=service_id,
+        time__gte=day_start,
+        time__lt=day_start + datetime.timedelta(days=1),
+    )
+    if not queryset.exists():
+        return 0
+    # deleted by id, as logs of the day can still be received while they are being archived
+    archived_ids = []
+
+    def iter_logs() -> Iterator[dict]:
+        for log in (
+            queryset.order_by("time", "id")
+            .values(*ARCHIVED_LOG_FIELDS)
+            .iterator(chunk_size=LOG_SEGMENT_BLOCK_SIZE)
+        ):
+            archived_ids.append(log["id"])
+            yield log
+
+    logs = iter_logs()
+    segment_path = get_segment_path(service_id, day)
+    if segment_path.exists():
+        # logs received late (or left by an interrupted archival) are merged with the existing segment
+        logs = merge_logs(read_segment(segment_path), logs)
+    write_segment(segment_path, logs)
+
+    # the archived logs are filtered on their fields from their JSON, the extracted fields are not needed anymore
+    fields_queryset = SimpleLogField.objects.filter(
+        service_id=service_id,
+        time__gte=day_start,
+        time__lt=day_start + datetime.timedelta(days=1),
+    )
+    with transaction.atomic():
+        for start in range(0, len(archived_ids), LOG_SEGMENT_BLOCK_SIZE):
+            block_ids = archived_ids[start : start + LOG_SEGMENT_BLOCK_SIZE]
+            queryset.filter(id__in=block_ids).delete()
+            fields_queryset.filter(log_id__in=block_ids).delete()
+    return len(archived_ids)
+
+
+def archive_old_logs(
+    archive_after_days: int | None = None, now: datetime.datetime | None = None
+) -> dict[str, int]:
+    """
+    Archive the logs of services older than `archive_after_days` (full days only),
+    returns the number of logs archived per service.
+    """
+    archive_after_days = archive_after_days or settings.LOGS_ARCHIVE_AFTER_DAYS
+    now = now or datetime.datetime.now(tz=datetime.UTC)
+    cutoff = datetime.datetime.combine(
+        (now - datetime.timedelta(days=archive_after_days)).date(),
+        datetime.time(),
+        tzinfo=datetime.UTC,
+    )
+
+    archived: dict[str, int] = {}
+    service_days = (
+        SimpleLog.objects.filter(service_id__isnull=False, time__lt=cutoff)
+        .annotate(day=TruncDay("time", tzinfo=datetime.UTC))
+        .values_list("service_id", "day")
+        .distinct()
+        .order_by("service_id", "day")
+    )
+    for service_id, day in service_days:
+        count = archive_service_logs_of_day(service_id, day.date())
+        archived[service_id] = archived.get(service_id, 0) + count
+    return archived
+
+
+def delete_expired_segments(
+    service_id: str, retention_days: int, now: datetime.datetime | None = None
+) -> tuple[int, int]:
+    """
+    Delete the segments of a service older than `retention_days`,
+    returns the number of segments deleted and their size in bytes.
+    """
+    now = now or datetime.datetime.now(tz=datetime.UTC)
+    cutoff = (now - datetime.timedelta(days=retention_days)).date()
+    deleted_count = 0
+    bytes_reclaimed = 0
+    for day in list_segment_days(service_id):
+        # a segment is only deleted when all its logs are expired
+        if day >= cutoff:
+            break
+        segment_path = get_segment_path(service_id, day)
+        for path in (segment_path, get_segment_index_path(segment_path)):
+            bytes_reclaimed += path.stat().st_size
+            path.unlink()
+        deleted_count += 1
+    return deleted_count, bytes_reclaimed
+
+
+def list_archived_services() -> list[str]:
+    archive_dir = Path(settings.LOGS_ARCHIVE_DIR)
+    if not archive_dir.is_dir():
+        return []
+    return sorted(path.name for path in archive_dir.iterdir() if path.is_dir())
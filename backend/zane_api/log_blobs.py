@@ -0,0 +1,82 @@
+"""
+Side storage of the log lines longer than `LOGS_MAX_INLINE_LENGTH` (JSON dumps, base64 blobs...):
+the `SimpleLog` row only keeps a preview of the line, and points to a `SimpleLogBlob` storing the full line
+zstd compressed, which is fetched on demand.
+"""
+
+import datetime
+import uuid
+from typing import Any
+
+import zstandard
+from django.conf import settings
+from django.db.models import Sum
+from django.db.models.functions import Length
+
+from .models import SimpleLogBlob
+
+LOG_BLOB_COMPRESSION_LEVEL = 3
+LOG_BLOB_BATCH_SIZE = 100
+
+
+def compress_log_blob(content: str) -> bytes:
+    return zstandard.ZstdCompressor(level=LOG_BLOB_COMPRESSION_LEVEL).compress(
+        content.encode()
+    )
+
+
+def read_log_blob(blob: SimpleLogBlob) -> str:
+    return zstandard.ZstdDecompressor().decompress(bytes(blob.content)).decode()
+
+
+def spill_oversized_logs(rows: list[dict[str, Any]]) -> list[SimpleLogBlob]:
+    """
+    Replace the `content` of the rows longer than `LOGS_MAX_INLINE_LENGTH` by its first `LOGS_PREVIEW_LENGTH`
+    characters and a pointer to the blob storing the full line, returns the blobs to store with the rows.
+    """
+    blobs = []
+    for row in rows:
+        content = row.get("content")
+        if content is None or len(content) <= settings.LOGS_MAX_INLINE_LENGTH:
+            continue
+        blob_id = row.get("dedupe_key") or uuid.uuid4()
+        blobs.append(
+            SimpleLogBlob(
+                id=blob_id,
+                service_id=row.get("service_id"),
+                deployment_id=row.get("deployment_id"),
+                time=row["time"],
+                length=len(content),
+                content=compress_log_blob(content),
+            )
+        )
+        row["content"] = content[: settings.LOGS_PREVIEW_LENGTH]
+        row["content_blob_id"] = blob_id
+    return blobs
+
+
+def store_log_blobs(blobs: list[SimpleLogBlob]):
+    # the blobs of the lines sent again by fluentd are already stored
+    SimpleLogBlob.objects.bulk_create(
+        blobs, batch_size=LOG_BLOB_BATCH_SIZE, ignore_conflicts=True
+    )
+
+
+def delete_expired_log_blobs(
+    retention_days: int,
+    service_id: str | None = None,
+    now: datetime.datetime | None = None,
+) -> tuple[int, int]:
+    """
+    Delete the blobs of the logs older than `retention_days` (only the ones of `service_id` if given),
+    returns the number of blobs deleted and their compressed size in bytes.
+    """
+    now = now or datetime.datetime.now(tz=datetime.UTC)
+    blobs = SimpleLogBlob.objects.filter(
+        time__lt=now - datetime.timedelta(days=retention_days)
+    )
+    if service_id is not None:
+        blobs = blobs.filter(service_id=service_id)
+    size = blobs.aggregate(size=Sum(Length("content")))["size"] or 0
+    count, _ = blobs.delete()
+    return count, size
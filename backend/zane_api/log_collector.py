@@ -0,0 +1,262 @@
+"""
+Standalone log collector speaking the fluentd Forward protocol,
+so that docker can send container logs directly to zane instead of going through fluentd and the HTTP API.
+Protocol reference: https://github.com/fluent/fluentd/wiki/Forward-Protocol-Specification-v1
+"""
+
+import asyncio
+import datetime
+import gzip
+import signal
+import struct
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any
+
+import msgpack
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+from . import log_ingestion
+
+EVENT_TIME_EXT_TYPE = 0
+SOCKET_READ_SIZE = 64 * 1024  # 64KB
+
+
+class ForwardProtocolError(Exception):
+    """Raised when a message does not follow the fluentd Forward protocol."""
+
+
+def decode_ext_type(code: int, data: bytes):
+    if code == EVENT_TIME_EXT_TYPE:
+        seconds, nanoseconds = struct.unpack(">II", data)
+        return seconds + nanoseconds / 1_000_000_000
+    return msgpack.ExtType(code, data)
+
+
+def new_unpacker() -> msgpack.Unpacker:
+    return msgpack.Unpacker(
+        raw=False,
+        ext_hook=decode_ext_type,
+        max_buffer_size=log_ingestion.MSGPACK_MAX_BUFFER_SIZE,
+    )
+
+
+@dataclass
+class ForwardMessage:
+    records: list[dict] = field(default_factory=list)
+    chunk_id: str | None = None
+
+
+def to_container_log(tag: str, time: int | float, record: Any) -> dict:
+    """
+    Convert a forwarded event into the same record shape as the one posted by fluentd to `/api/logs/tail`.
+    """
+    if not isinstance(record, dict) or not isinstance(time, (int, float)):
+        raise ForwardProtocolError("Invalid event, expected a `[time, record]` pair")
+    return {
+        **record,
+        "tag": tag,
+        "time": datetime.datetime.fromtimestamp(time, tz=datetime.UTC).isoformat(),
+    }
+
+
+def decode_forward_message(message: Any) -> ForwardMessage:
+    """
+    Decode any of the Message, Forward, PackedForward & CompressedPackedForward modes.
+    """
+    if (
+        not isinstance(message, (list, tuple))
+        or len(message) < 2
+        or not isinstance(message[0], str)
+    ):
+        raise ForwardProtocolError("Expected a message in the form `[tag, ...]`")
+
+    tag, entries = message[0], message[1]
+    match entries:
+        case int() | float():
+            # Message mode: [tag, time, record, option?]
+            if len(message) < 3:
+                raise ForwardProtocolError("Missing the record of the message")
+            option = message[3] if len(message) > 3 else None
+            records = [to_container_log(tag, entries, message[2])]
+        case list() | tuple():
+            # Forward mode: [tag, [[time, record], ...], option?]
+            option = message[2] if len(message) > 2 else None
+            records = [to_container_log(tag, *entry) for entry in entries]
+        case bytes():
+            # (Compressed)PackedForward mode: [tag, <msgpack stream of [time, record]>, option?]
+            option = message[2] if len(message) > 2 else None
+            if isinstance(option, dict) and option.get("compressed") == "gzip":
+                try:
+                    entries = gzip.decompress(entries)
+                except (OSError, EOFError) as e:
+                    raise ForwardProtocolError(str(e)) from e
+            unpacker = new_unpacker()
+            unpacker.feed(entries)
+            try:
+                records = [to_container_log(tag, *entry) for entry in unpacker]
+            except (ValueError, TypeError, msgpack.UnpackException) as e:
+                raise ForwardProtocolError(str(e)) from e
+        case _:
+            raise ForwardProtocolError("Unknown message mode")
+
+    chunk_id = option.get("chunk") if isinstance(option, dict) else None
+    return ForwardMessage(records=records, chunk_id=chunk_id)
+
+
+def write_forwarded_logs(records: list[dict]) -> tuple[int, int]:
+    """
+    Store a batch of forwarded records in a single transaction,
+    invalid records are dropped as there is no client to report the error to.
+    """
+    simple_logs_inserted = 0
+    http_logs_inserted = 0
+    with transaction.atomic():
+        for chunk in log_ingestion.chunked(records, settings.LOGS_INGEST_CHUNK_SIZE):
+            simple_count, http_count = log_ingestion.ingest_container_logs(
+                log_ingestion.validate_container_logs(chunk, drop_invalid=True)
+            )
+            simple_logs_inserted += simple_count
+            http_logs_inserted += http_count
+    return simple_logs_inserted, http_logs_inserted
+
+
+class LogCollector:
+    def __init__(
+        self,
+        batch_size: int = 5_000,
+        flush_interval: float = 1.0,
+        writers: int = 2,
+        max_pending_messages: int = 10_000,
+    ):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.writers = writers
+        # When full, reading from the sockets is paused until the writers catch up
+        self.queue: asyncio.Queue[tuple[ForwardMessage, asyncio.Future | None]] = (
+            asyncio.Queue(maxsize=max_pending_messages)
+        )
+        self.executor = ThreadPoolExecutor(
+            max_workers=writers, thread_name_prefix="log-writer"
+        )
+
+    async def handle_connection(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ):
+        loop = asyncio.get_running_loop()
+        unpacker = new_unpacker()
+        try:
+            while data := await reader.read(SOCKET_READ_SIZE):
+                unpacker.feed(data)
+                for message in unpacker:
+                    try:
+                        forward_message = decode_forward_message(message)
+                    except ForwardProtocolError as e:
+                        print(f"Ignoring invalid forward message: {e}")
+                        continue
+
+                    written = (
+                        loop.create_future()
+                        if forward_message.chunk_id is not None
+                        else None
+                    )
+                    await self.queue.put((forward_message, written))
+                    if written is not None:
+                        # only acknowledge the chunk when it has been stored, otherwise the sender will retry it
+                        await written
+                        writer.write(msgpack.packb({"ack": forward_message.chunk_id}))
+                        await writer.drain()
+        except (msgpack.UnpackException, ValueError) as e:
+            print(f"Closing connection after an invalid payload: {e}")
+        except Exception as e:
+            print(f"Closing connection after an error: {e!r}")
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                # the sender may have already reset the connection
+                pass
+
+    @staticmethod
+    def write_batch(records: list[dict]) -> tuple[int, int]:
+        # runs in the thread pool, each writer thread having its own database connection
+        close_old_connections()
+        return write_forwarded_logs(records)
+
+    async def next_batch(self) -> tuple[list[dict], list[asyncio.Future]]:
+        loop = asyncio.get_running_loop()
+        records: list[dict] = []
+        waiters: list[asyncio.Future] = []
+
+        message, written = await self.queue.get()
+        deadline = loop.time() + self.flush_interval
+        while True:
+            records.extend(message.records)
+            if written is not None:
+                waiters.append(written)
+            time_left = deadline - loop.time()
+            if len(records) >= self.batch_size or time_left <= 0:
+                break
+            try:
+                message, written = await asyncio.wait_for(
+                    self.queue.get(), timeout=time_left
+                )
+            except asyncio.TimeoutError:
+                break
+        return records, waiters
+
+    async def flush_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            records, waiters = await self.next_batch()
+            try:
+                await loop.run_in_executor(self.executor, self.write_batch, records)
+            except Exception as e:
+                print(f"Failed to write a batch of {len(records)} logs: {e!r}")
+                for waiter in waiters:
+                    if not waiter.done():
+                        waiter.set_exception(e)
+            else:
+                for waiter in waiters:
+                    if not waiter.done():
+                        waiter.set_result(None)
+
+    async def drain(self):
+        while not self.queue.empty():
+            records, waiters = await self.next_batch()
+            await asyncio.get_running_loop().run_in_executor(
+                self.executor, self.write_batch, records
+            )
+            for waiter in waiters:
+                if not waiter.done():
+                    waiter.set_result(None)
+
+    async def serve(
+        self, socket_path: str | None = None, host: str = "0.0.0.0", port: int = 24224
+    ):
+        if socket_path is not None:
+            server = await asyncio.start_unix_server(
+                self.handle_connection, path=socket_path
+            )
+        else:
+            server = await asyncio.start_server(
+                self.handle_connection, host=host, port=port
+            )
+
+        stop_event = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for stop_signal in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(stop_signal, stop_event.set)
+
+        flushers = [asyncio.create_task(self.flush_loop()) for _ in range(self.writers)]
+        async with server:
+            await stop_event.wait()
+            server.close()
+            await server.wait_closed()
+
+        for flusher in flushers:
+            flusher.cancel()
+        await self.drain()
+        self.executor.shutdown(wait=True)
@@ -0,0 +1,83 @@
+"""
+Export of the logs of a deployment as NDJSON (one JSON object per line), optionally gzip compressed.
+The lines are encoded as the logs are read, so the memory used by an export does not depend on its size.
+"""
+
+import json
+import zlib
+from typing import Any, AsyncIterator, Iterable, Iterator
+
+from asgiref.sync import sync_to_async
+from django.core.serializers.json import DjangoJSONEncoder
+
+NDJSON_CONTENT_TYPE = "application/x-ndjson"
+GZIP_CONTENT_TYPE = "application/gzip"
+EXPORT_COMPRESSIONS = ("none", "gzip")
+# the lines are sent in chunks of about this size (before compression)
+EXPORT_FLUSH_SIZE = 64 * 1024
+EXPORTED_LOG_FIELDS = (
+    "id",
+    "service_id",
+    "deployment_id",
+    "time",
+    "created_at",
+    "content",
+    "content_json",
+    "content_blob_id",
+    "level",
+    "source",
+)
+
+
+def to_exported_log(log: dict[str, Any]) -> dict[str, Any]:
+    """
+    Same shape as the logs of the API: `content` is the parsed JSON of the line if it is valid JSON
+    """
+    exported = {
+        field: log.get(field)
+        for field in EXPORTED_LOG_FIELDS
+        if field != "content_json"
+    }
+    if log.get("content_json") is not None:
+        exported["content"] = log["content_json"]
+    return exported
+
+
+def iter_ndjson(
+    logs: Iterable[dict[str, Any]], compress: bool = False
+) -> Iterator[bytes]:
+    # `wbits=31` writes a gzip header & trailer, so the export can be read with `gunzip`
+    compressor = zlib.compressobj(wbits=31) if compress else None
+    lines: list[bytes] = []
+    size = 0
+    for log in logs:
+        line = json.dumps(to_exported_log(log), cls=DjangoJSONEncoder).encode() + b"\n"
+        lines.append(line)
+        size += len(line)
+        if size >= EXPORT_FLUSH_SIZE:
+            chunk = b"".join(lines)
+            lines, size = [], 0
+            if compressor is not None:
+                chunk = compressor.compress(chunk)
+            if len(chunk) > 0:
+                yield chunk
+
+    chunk = b"".join(lines)
+    if compressor is not None:
+        chunk = compressor.compress(chunk) + compressor.flush()
+    if len(chunk) > 0:
+        yield chunk
+
+
+async def aiter_chunks(chunks: Iterator[bytes]) -> AsyncIterator[bytes]:
+    """
+    Serve `chunks` to an ASGI server, which would otherwise read a sync iterator whole before sending it.
+    Each chunk is produced in the thread of the request (`thread_sensitive`), where the cursor of the export lives.
+    """
+    next_chunk = sync_to_async(next, thread_sensitive=True)
+    try:
+        while (chunk := await next_chunk(chunks, None)) is not None:
+            yield chunk
+    finally:
+        # closes the server-side cursor when the client disconnects
+        await sync_to_async(chunks.close, thread_sensitive=True)()
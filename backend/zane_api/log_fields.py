@@ -0,0 +1,76 @@
+"""
+Extraction of the fields of the JSON log lines configured for their service (`logs_extracted_fields`)
+into `SimpleLogField` rows, so that the logs can be filtered on them with an index
+instead of scanning the JSON of every line.
+"""
+
+import json
+from typing import Any
+
+from .models import DockerRegistryService
+
+# longer values are not extracted, filtering on them would need a scan anyway
+LOG_FIELD_MAX_VALUE_LENGTH = 255
+MAX_EXTRACTED_FIELDS = 10
+
+
+def get_field_value(content: Any, path: str) -> str | None:
+    """
+    Value at `path` (keys separated by dots, or indexes of arrays) in the JSON of a line, as stored in `SimpleLogField`:
+    the text of the strings and the JSON of the numbers & booleans.
+    Returns `None` when the path is missing, or when the value is `null`, an object, an array or too long.
+    """
+    for key in path.split("."):
+        if isinstance(content, dict):
+            content = content.get(key)
+        elif isinstance(content, list) and key.isdigit() and int(key) < len(content):
+            content = content[int(key)]
+        else:
+            return None
+    if content is None or isinstance(content, (dict, list)):
+        return None
+    value = content if isinstance(content, str) else json.dumps(content)
+    if len(value) > LOG_FIELD_MAX_VALUE_LENGTH:
+        return None
+    return value
+
+
+def extract_log_fields(rows: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    """
+    `SimpleLogField` rows of the fields found in the JSON lines of `rows`, for the services with extracted fields.
+    """
+    service_ids = {
+        row["service_id"]
+        for row in rows
+        if row.get("service_id") is not None and row.get("content_json") is not None
+    }
+    if len(service_ids) == 0:
+        return []
+    paths_per_service = {
+        service_id: paths
+        for service_id, paths in DockerRegistryService.objects.filter(
+            id__in=service_ids
+        ).values_list("id", "logs_extracted_fields")
+        if len(paths) > 0
+    }
+    if len(paths_per_service) == 0:
+        return []
+
+    fields = []
+    for row in rows:
+        paths = paths_per_service.get(row.get("service_id"), [])
+        if len(paths) == 0 or row.get("content_json") is None:
+            continue
+        for path in paths:
+            value = get_field_value(row["content_json"], path)
+            if value is not None:
+                fields.append(
+                    dict(
+                        log_id=row["id"],
+                        service_id=row["service_id"],
+                        time=row["time"],
+                        name=path,
+                        value=value,
+                    )
+                )
+    return fields
@@ -0,0 +1,107 @@
+"""
+Storage of the headers of the http logs: only the headers in `LOGS_HTTP_HEADERS_ALLOWLIST` are kept,
+and each distinct set of headers is stored once in `HttpHeaderSet`, keyed by the hash of its content.
+Most requests of a service share a few combinations of headers, so the logs only store the id of their sets.
+"""
+
+import datetime
+import hashlib
+import json
+import uuid
+
+from django.conf import settings
+from django.db import connection
+
+from .models import HttpHeaderSet
+
+# the `last_seen_at` of a set is only updated when it is older than this, to avoid updating the sets on every batch
+HEADER_SET_LAST_SEEN_PRECISION = datetime.timedelta(days=1)
+
+
+def filter_headers(headers: dict[str, list[str]]) -> dict[str, list[str]]:
+    allowlist = {name.strip().lower() for name in settings.LOGS_HTTP_HEADERS_ALLOWLIST}
+    if "*" in allowlist:
+        return headers
+    return {
+        name: values for name, values in headers.items() if name.lower() in allowlist
+    }
+
+
+def get_header_set_id(headers: dict[str, list[str]]) -> uuid.UUID:
+    content = json.dumps(headers, sort_keys=True, separators=(",", ":"))
+    return uuid.UUID(bytes=hashlib.sha256(content.encode()).digest()[:16])
+
+
+def add_header_set(
+    header_sets: dict[uuid.UUID, dict[str, list[str]]],
+    headers: dict[str, list[str]],
+) -> uuid.UUID | None:
+    """
+    Add the allowed headers to the sets of the batch, returns the id of their set (`None` if no header is allowed).
+    """
+    headers = filter_headers(headers)
+    if len(headers) == 0:
+        return None
+    header_set_id = get_header_set_id(headers)
+    header_sets[header_set_id] = headers
+    return header_set_id
+
+
+def store_header_sets(
+    header_sets: dict[uuid.UUID, dict[str, list[str]]],
+    now: datetime.datetime | None = None,
+):
+    """
+    Insert the sets not stored yet, and refresh the `last_seen_at` of the others.
+    The stored sets are locked until the end of the transaction (with the logs referencing them),
+    so that `delete_unused_header_sets` cannot delete them in between.
+    """
+    if len(header_sets) == 0:
+        return
+    now = now or datetime.datetime.now(tz=datetime.UTC)
+    table = connection.ops.quote_name(HttpHeaderSet._meta.db_table)
+    with connection.cursor() as cursor:
+        # `KEY SHARE` does not block the other batches using the same sets, only their deletion
+        cursor.execute(
+            f'SELECT "id", "last_seen_at" FROM {table} WHERE "id" = ANY(%s) FOR KEY SHARE',
+            [list(header_sets)],
+        )
+        last_seen: dict[uuid.UUID, datetime.datetime] = dict(cursor.fetchall())
+    HttpHeaderSet.objects.bulk_create(
+        [
+            HttpHeaderSet(id=header_set_id, headers=headers, last_seen_at=now)
+            for header_set_id, headers in header_sets.items()
+            if header_set_id not in last_seen
+        ],
+        # inserted by another batch since the query above
+        ignore_conflicts=True,
+    )
+    stale_ids = [
+        header_set_id
+        for header_set_id, last_seen_at in last_seen.items()
+        if last_seen_at < now - HEADER_SET_LAST_SEEN_PRECISION
+    ]
+    if len(stale_ids) > 0:
+        HttpHeaderSet.objects.filter(id__in=stale_ids).update(last_seen_at=now)
+
+
+def delete_unused_header_sets(
+    retention_days: int, now: datetime.datetime | None = None
+) -> int:
+    """
+    Delete the sets which are not referenced by any log anymore: the sets not seen since the logs were expired
+    (with a margin for the precision of `last_seen_at`), returns the number of sets deleted.
+    The sets locked by a batch being ingested are skipped, they are used again.
+    """
+    now = now or datetime.datetime.now(tz=datetime.UTC)
+    cutoff = (
+        now - datetime.timedelta(days=retention_days) - HEADER_SET_LAST_SEEN_PRECISION
+    )
+    table = connection.ops.quote_name(HttpHeaderSet._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {table} WHERE "id" IN ('
+            f'SELECT "id" FROM {table} WHERE "last_seen_at" < %s FOR UPDATE SKIP LOCKED)',
+            [cutoff],
+        )
+        return cursor.rowcount
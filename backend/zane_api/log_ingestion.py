@@ -0,0 +1,817 @@
+import codecs
+import datetime
+import functools
+import gzip
+import hashlib
+import io
+import json
+import re
+import uuid
+from typing import Any, Callable, IO, Iterable, Iterator
+
+import msgpack
+import zstandard
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, models, transaction
+from django.utils import timezone
+from rest_framework import serializers
+
+from . import log_blobs, log_fields, log_headers, log_live, log_rate_limit, log_rollups
+from .models import (
+    HttpLog,
+    DockerDeployment,
+    DockerRegistryService,
+    Log,
+    SimpleLog,
+    SimpleLogField,
+    SmallChoiceField,
+)
+from .utils import chunked, generate_log_id
+from .views.helpers import ZaneServices
+from .views.serializers import (
+    HTTPServiceLogSerializer,
+    DockerContainerLogSerializer,
+    DockerContainerLogsRequestSerializer,
+)
+
+CADDY_ACCESS_LOGGER_PREFIX = "http.log.access"
+BULK_CREATE_BATCH_SIZE = 1_000
+STREAM_READ_SIZE = 64 * 1024  # 64KB
+LOG_TAG_CACHE_SIZE = 1_024
+MSGPACK_MAX_BUFFER_SIZE = 64 * 1024 * 1024  # 64MB, maximum size of a single record
+JSON_MAX_BUFFER_SIZE = 64 * 1024 * 1024  # 64MB, maximum size of a single record
+MAX_DECOMPRESSED_SIZE = (
+    512 * 1024 * 1024
+)  # 512MB, maximum size of a compressed body once decompressed
+MSGPACK_CONTENT_TYPES = ("application/msgpack", "application/x-msgpack")
+JSON_CONTENT_TYPES = ("application/json", "")
+JSON_NUMBER_CHARACTERS = "0123456789.eE+-"
+
+
+# ==============================
+#     Fluentd batch parsing    #
+# ==============================
+
+
+class LogParseError(Exception):
+    """Raised when a batch of logs sent to the API cannot be decoded."""
+
+
+class UnsupportedLogFormat(Exception):
+    """Raised when a batch of logs is sent with an unknown content type or encoding."""
+
+
+class LogPayloadTooLarge(LogParseError):
+    """Raised when a record or the decompressed body of a batch of logs is over its size limit."""
+
+
+class LimitedReader:
+    """
+    Reader of a decompressed stream, failing once more than `max_size` bytes have been read from it,
+    so that a small compressed body cannot inflate into more than the worker can hold.
+    """
+
+    def __init__(self, stream: IO[bytes], max_size: int):
+        self.stream = stream
+        self.max_size = max_size
+        self.size = 0
+
+    def read(self, size: int = -1) -> bytes:
+        # never read more than one byte past the limit, even when asked for everything
+        remaining = self.max_size - self.size + 1
+        if size is None or size < 0 or size > remaining:
+            size = remaining
+        chunk = self.stream.read(size)
+        self.size += len(chunk)
+        if self.size > self.max_size:
+            raise LogPayloadTooLarge(
+                f"The decompressed body is larger than {self.max_size} bytes."
+            )
+        return chunk
+
+
+def decode_content_encoding(
+    stream: IO[bytes] | None, content_encoding: str | None
+) -> IO[bytes] | None:
+    """
+    Wrap `stream` to decompress the body on the fly according to its `Content-Encoding`.
+    """
+    encoding = (content_encoding or "identity").strip().lower()
+    if stream is None or encoding == "identity":
+        return stream
+    match encoding:
+        case "gzip" | "x-gzip":
+            decompressed = gzip.GzipFile(fileobj=stream, mode="rb")
+        case "zstd":
+            decompressed = zstandard.ZstdDecompressor().stream_reader(stream)
+        case _:
+            raise UnsupportedLogFormat(f"Unsupported content encoding `{encoding}`.")
+    return LimitedReader(decompressed, MAX_DECOMPRESSED_SIZE)
+
+
+def iter_msgpack_records(
+    stream: IO[bytes] | None, read_size: int = STREAM_READ_SIZE
+) -> Iterator[Any]:
+    """
+    Decode a stream of concatenated msgpack records (the format of fluentd `out_http` with `@type msgpack`),
+    a record packed as an array of records is also accepted.
+    """
+    if stream is None:
+        return
+    unpacker = msgpack.Unpacker(
+        stream,
+        raw=False,
+        read_size=read_size,
+        max_buffer_size=MSGPACK_MAX_BUFFER_SIZE,
+    )
+    try:
+        for item in unpacker:
+            if isinstance(item, list):
+                yield from item
+            else:
+                yield item
+    except msgpack.BufferFull as e:
+        raise LogPayloadTooLarge(
+            f"A record is larger than {MSGPACK_MAX_BUFFER_SIZE} bytes."
+        ) from e
+    except (
+        msgpack.UnpackException,
+        msgpack.ExtraData,
+        ValueError,
+        zstandard.ZstdError,
+        EOFError,
+        OSError,
+    ) as e:
+        raise LogParseError(str(e)) from e
+
+
+def get_media_type(content_type: str | None) -> str:
+    return (content_type or "").split(";")[0].strip().lower()
+
+
+def iter_log_records(
+    stream: IO[bytes] | None,
+    content_type: str | None,
+    content_encoding: str | None = None,
+) -> Iterator[Any]:
+    """
+    Iterate over the fluentd records of a request body, depending on its content type & encoding.
+    """
+    media_type = get_media_type(content_type)
+    stream = decode_content_encoding(stream, content_encoding)
+    if media_type in MSGPACK_CONTENT_TYPES:
+        return iter_msgpack_records(stream)
+    if media_type in JSON_CONTENT_TYPES:
+        return iter_json_array(stream)
+    raise UnsupportedLogFormat(f"Unsupported media type `{media_type}`.")
+
+
+def iter_json_array(
+    stream: IO[bytes] | None,
+    read_size: int = STREAM_READ_SIZE,
+    max_buffer_size: int = JSON_MAX_BUFFER_SIZE,
+) -> Iterator[Any]:
+    """
+    Incrementally decode a JSON array from `stream`, yielding its items one by one,
+    so that only the items not yet consumed are kept in memory instead of the whole body.
+    The items larger than `max_buffer_size` are rejected with `LogPayloadTooLarge`.
+    """
+    decoder = json.JSONDecoder()
+    utf8_decoder = codecs.getincrementaldecoder("utf-8")()
+    buffer = ""
+    position = 0
+    # what is expected next: `[`, an item or `]` (right after `[`), an item, `,` or `]`, then only whitespace
+    expected = "array"
+    eof = stream is None
+    next_read_size = read_size
+
+    def read_more():
+        nonlocal buffer, position, eof
+        if len(buffer) - position >= max_buffer_size:
+            raise LogPayloadTooLarge(
+                f"A record is larger than {max_buffer_size} bytes."
+            )
+        # drop what has already been consumed to keep the buffer small
+        try:
+            chunk = stream.read(min(next_read_size, max_buffer_size))
+            if not chunk:
+                eof = True
+            buffer = buffer[position:] + utf8_decoder.decode(chunk, final=eof)
+        except (UnicodeDecodeError, zstandard.ZstdError, EOFError, OSError) as e:
+            # decompression errors are raised when reading the stream
+            raise LogParseError(str(e)) from e
+        position = 0
+
+    while True:
+        while position < len(buffer) and buffer[position] in " \t\n\r":
+            position += 1
+
+        if position >= len(buffer):
+            if eof:
+                if expected not in ("array", "end"):
+                    raise LogParseError("Unterminated JSON array")
+                return
+            read_more()
+            continue
+
+        char = buffer[position]
+        match expected:
+            case "array":
+                if char != "[":
+                    raise LogParseError("Expected a JSON array")
+                expected = "item_or_close"
+                position += 1
+                continue
+            case "separator":
+                if char not in ",]":
+                    raise LogParseError("Expected `,` or `]` after an item")
+                expected = "item" if char == "," else "end"
+                position += 1
+                continue
+            case "end":
+                raise LogParseError("Extra data after the JSON array")
+            case "item_or_close" if char == "]":
+                expected = "end"
+                position += 1
+                continue
+            case _ if char in ",]":
+                raise LogParseError("Expected a JSON value")
+
+        try:
+            item, end = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError as e:
+            if eof:
+                raise LogParseError(str(e)) from e
+            # the item is split across reads, read bigger chunks
+            # to avoid decoding big items too many times
+            read_more()
+            next_read_size *= 2
+            continue
+        if not eof and buffer[end:].strip(JSON_NUMBER_CHARACTERS) == "":
+            # a number at the end of the read may continue in the next one (`12|345`, `1.|5`)
+            read_more()
+            continue
+        position = end
+        expected = "separator"
+        next_read_size = read_size
+        yield item
+
+
+_INVALID = object()
+
+
+class CompiledRecordValidator:
+    """
+    Lightweight equivalent of a flat DRF serializer, the checks for each field are built once
+    from the serializer declaration instead of running the full DRF field machinery for every record.
+    It only accepts records that are already in their canonical shape and returns `None` otherwise,
+    these records should then be validated by the serializer itself to get the exact errors.
+    """
+
+    def __init__(self, serializer_class: type[serializers.Serializer]):
+        self.field_checks: list[tuple[str, Callable[[Any], Any]]] = [
+            (name, self.compile_field(field))
+            for name, field in serializer_class().fields.items()
+        ]
+
+    @staticmethod
+    def compile_field(field: serializers.Field) -> Callable[[Any], Any]:
+        if isinstance(field, serializers.ChoiceField):
+            choices = frozenset(field.choices.keys())
+            return lambda value: value if value in choices else _INVALID
+
+        if isinstance(field, serializers.DateTimeField):
+
+            def check_datetime(value: Any):
+                if type(value) is not str:
+                    return _INVALID
+                try:
+                    parsed = datetime.datetime.fromisoformat(value)
+                except ValueError:
+                    return _INVALID
+                if parsed.tzinfo is None:
+                    return parsed.replace(tzinfo=datetime.UTC)
+                # converted to UTC like the serializer does, `+02:00` times are not stored with their offset
+                try:
+                    return parsed.astimezone(datetime.UTC)
+                except OverflowError:
+                    return _INVALID
+
+            return check_datetime
+
+        if isinstance(field, serializers.CharField):
+            allow_blank = field.allow_blank
+            allow_null = field.allow_null
+            trim_whitespace = field.trim_whitespace
+
+            def check_string(value: Any):
+                if value is None and allow_null:
+                    return None
+                # the NUL characters are rejected by the serializer (and by postgres)
+                if type(value) is not str or "\x00" in value:
+                    return _INVALID
+                if trim_whitespace:
+                    value = value.strip()
+                if not allow_blank and not value.strip():
+                    return _INVALID
+                return value
+
+            return check_string
+
+        raise TypeError(f"Unsupported field type for fast validation: {field!r}")
+
+    def __call__(self, record: Any) -> dict | None:
+        if type(record) is not dict:
+            return None
+        validated = {}
+        for name, check in self.field_checks:
+            value = check(record.get(name))
+            if value is _INVALID:
+                return None
+            validated[name] = value
+        return validated
+
+
+validate_container_log = CompiledRecordValidator(DockerContainerLogSerializer)
+
+
+def validate_container_logs(
+    records: list[Any], drop_invalid: bool = False
+) -> list[dict]:
+    """
+    Validate a batch of fluentd records with the compiled validator,
+    falling back to the DRF serializer (which raises the validation errors) for the rest of the batch.
+    With `drop_invalid`, the records rejected by the serializer are skipped instead.
+    """
+    validated_logs = []
+    for record in records:
+        validated = validate_container_log(record)
+        if validated is None:
+            if drop_invalid:
+                serializer = DockerContainerLogSerializer(data=record)
+                if serializer.is_valid():
+                    validated_logs.append(serializer.validated_data)
+                continue
+            serializer = DockerContainerLogsRequestSerializer(data=records)
+            serializer.is_valid(raise_exception=True)
+            return serializer.validated_data
+        validated_logs.append(validated)
+    return validated_logs
+
+
+@functools.lru_cache(maxsize=LOG_TAG_CACHE_SIZE)
+def decode_log_tag(tag: str) -> tuple[str | None, str | None] | None:
+    """
+    Decode the fluentd tag of a container into `(service_id, deployment_id)`,
+    the tag is the same for every line of a deployment so the result is memoized.
+    """
+    try:
+        json_tag = json.loads(tag)
+    except json.JSONDecodeError:
+        return None
+    if not isinstance(json_tag, dict):
+        return None
+    return json_tag.get("service_id"), json_tag.get("deployment_id")
+
+
+def get_dedupe_key(log: dict, occurrence: int = 0) -> uuid.UUID:
+    """
+    Stable key of a fluentd record: the same line sent again (when fluentd retries a batch) gets the same key.
+    Identical lines of a container with the same time (like blank lines or repeated messages) are told apart
+    by their `occurrence` in the batch, which is the same when the batch is retried.
+    """
+    parts = [log["container_id"], log["time"].isoformat(), log["source"], log["log"]]
+    if occurrence > 0:
+        parts.append(str(occurrence))
+    digest = hashlib.blake2b("\0".join(parts).encode(), digest_size=16).digest()
+    return uuid.UUID(bytes=digest)
+
+
+def parse_log_content(line: str) -> tuple[str | None, Any]:
+    """
+    Split a line into the `content` & `content_json` columns of a `SimpleLog`:
+    the lines which are JSON objects or arrays are only stored parsed, the others as text.
+    """
+    if line.lstrip()[:1] in ("{", "["):
+        try:
+            return None, json.loads(line)
+        except json.JSONDecodeError:
+            pass
+    return line, None
+
+
+def route_container_logs(
+    logs: list[dict],
+) -> tuple[list[dict], list[tuple[dict, uuid.UUID]]]:
+    """
+    Dispatch validated fluentd records depending on the service that emitted them,
+    returns the `SimpleLog` rows and the caddy access logs found in the batch (with the dedupe key of their line).
+    """
+    simple_logs: list[dict[str, Any]] = []
+    access_logs: list[tuple[dict, uuid.UUID]] = []
+    occurrences: dict[uuid.UUID, int] = {}
+
+    def next_dedupe_key(log: dict) -> uuid.UUID:
+        dedupe_key = get_dedupe_key(log)
+        occurrence = occurrences.get(dedupe_key, 0)
+        occurrences[dedupe_key] = occurrence + 1
+        if occurrence == 0:
+            return dedupe_key
+        return get_dedupe_key(log, occurrence)
+
+    for log in logs:
+        decoded_tag = decode_log_tag(log["tag"])
+        if decoded_tag is None:
+            # Ignore this log
+            continue
+        else:
+            service_id, deployment_id = decoded_tag
+            match service_id:
+                case None:
+                    # Ignore this log
+                    continue
+                case ZaneServices.PROXY:
+                    content, content_json = parse_log_content(log["log"])
+                    dedupe_key = next_dedupe_key(log)
+                    if is_caddy_access_log(content_json):
+                        access_logs.append((content_json, dedupe_key))
+                    simple_logs.append(
+                        dict(
+                            dedupe_key=dedupe_key,
+                            source=SimpleLog.LogSource.PROXY,
+                            level=(
+                                SimpleLog.LogLevel.INFO
+                                if log["source"] == "stdout"
+                                else SimpleLog.LogLevel.ERROR
+                            ),
+                            content=content,
+                            content_json=content_json,
+                            time=log["time"],
+                        )
+                    )
+                case ZaneServices.API | ZaneServices.WORKER:
+                    # do nothing for now...
+                    pass
+                case _:
+                    line = log["log"]
+                    # the oversized lines are spilled as text (see `log_blobs`), parsing them would be wasted
+                    content, content_json = (
+                        (line, None)
+                        if len(line) > settings.LOGS_MAX_INLINE_LENGTH
+                        else parse_log_content(line)
+                    )
+                    simple_logs.append(
+                        dict(
+                            # generated here as it is published to the live tail with the log
+                            id=generate_log_id(),
+                            dedupe_key=next_dedupe_key(log),
+                            source=SimpleLog.LogSource.SERVICE,
+                            level=(
+                                SimpleLog.LogLevel.INFO
+                                if log["source"] == "stdout"
+                                else SimpleLog.LogLevel.ERROR
+                            ),
+                            content=content,
+                            content_json=content_json,
+                            time=log["time"],
+                            deployment_id=deployment_id,
+                            service_id=service_id,
+                        )
+                    )
+    return simple_logs, access_logs
+
+
+@functools.lru_cache(maxsize=LOG_TAG_CACHE_SIZE)
+def compile_multiline_pattern(pattern: str) -> re.Pattern:
+    return re.compile(pattern)
+
+
+def coalesce_multiline_logs(logs: list[dict]) -> list[dict]:
+    """
+    Join the lines of the multi-line records (like stack traces) of the services with a `logs_multiline_pattern`:
+    a line which does not match the pattern is appended to the previous line of the same container & stream,
+    if it was received less than `LOGS_MULTILINE_WINDOW_MS` after it.
+    The joined record keeps the time of its first line. Only the lines of the same batch can be joined.
+    """
+    service_ids = set()
+    for log in logs:
+        decoded_tag = decode_log_tag(log["tag"])
+        if decoded_tag is not None and decoded_tag[0] is not None:
+            service_ids.add(decoded_tag[0])
+    if len(service_ids) == 0:
+        return logs
+    patterns = {
+        service_id: compile_multiline_pattern(pattern)
+        for service_id, pattern in DockerRegistryService.objects.filter(
+            id__in=service_ids, logs_multiline_pattern__isnull=False
+        ).values_list("id", "logs_multiline_pattern")
+        if pattern != ""
+    }
+    if len(patterns) == 0:
+        return logs
+
+    window = datetime.timedelta(milliseconds=settings.LOGS_MULTILINE_WINDOW_MS)
+    coalesced: list[dict] = []
+    # the record being joined of each container & stream, with the time & count of its lines
+    open_records: dict[tuple[str, str], tuple[dict, datetime.datetime, int]] = {}
+    for log in logs:
+        decoded_tag = decode_log_tag(log["tag"])
+        pattern = patterns.get(decoded_tag[0]) if decoded_tag is not None else None
+        if pattern is None:
+            coalesced.append(log)
+            continue
+
+        key = (log["container_id"], log["source"])
+        open_record = open_records.get(key)
+        if open_record is not None and pattern.match(log["log"]) is None:
+            record, last_time, line_count = open_record
+            if (
+                log["time"] - last_time <= window
+                and line_count < settings.LOGS_MULTILINE_MAX_LINES
+            ):
+                record["log"] = f"{record['log']}\n{log['log']}"
+                open_records[key] = (record, log["time"], line_count + 1)
+                continue
+
+        record = dict(log)
+        coalesced.append(record)
+        open_records[key] = (record, log["time"], 1)
+    return coalesced
+
+
+def ingest_container_logs(logs: list[dict]) -> tuple[int, int]:
+    """
+    Store a batch of validated fluentd records,
+    returns the number of `SimpleLog` and `HttpLog` rows inserted.
+    """
+    simple_logs, access_logs = route_container_logs(coalesce_multiline_logs(logs))
+    simple_logs = log_rate_limit.apply_service_rate_limits(simple_logs)
+    log_blobs.store_log_blobs(log_blobs.spill_oversized_logs(simple_logs))
+    http_logs = parse_caddy_access_logs(access_logs)
+    # the lines already stored (sent again by fluentd) are skipped, and are neither counted nor published
+    inserted_simple_logs = insert_logs(SimpleLog, simple_logs)
+    insert_logs(SimpleLogField, log_fields.extract_log_fields(inserted_simple_logs))
+    inserted_http_logs = insert_logs(HttpLog, http_logs)
+    log_rollups.upsert_http_log_rollups(
+        log_rollups.aggregate_http_logs(inserted_http_logs)
+    )
+    # only the committed logs are sent to the live tail
+    transaction.on_commit(
+        functools.partial(log_live.publish_deployment_logs, inserted_simple_logs)
+    )
+    return len(inserted_simple_logs), len(inserted_http_logs)
+
+
+def is_caddy_access_log(content: Any) -> bool:
+    return isinstance(content, dict) and str(content.get("logger", "")).startswith(
+        CADDY_ACCESS_LOGGER_PREFIX
+    )
+
+
+def parse_caddy_access_logs(
+    access_logs: list[tuple[dict, uuid.UUID | None]]
+) -> list[dict[str, Any]]:
+    """
+    Convert a batch of caddy access log entries (with the dedupe key of their line) into `HttpLog` rows.
+    The service of each deployment is resolved with a single query for the whole batch,
+    entries that do not match the shape of a caddy access log are ignored.
+    The header sets of the rows are stored here, the rows only reference them.
+    """
+    validated_logs: list[tuple[dict, uuid.UUID | None]] = []
+    for access_log, dedupe_key in access_logs:
+        serializer = HTTPServiceLogSerializer(data=access_log)
+        if serializer.is_valid():
+            validated_logs.append((serializer.validated_data, dedupe_key))
+
+    deployment_hashes = {
+        log["zane_deployment_current_hash"]
+        for log, _ in validated_logs
+        if log.get("zane_deployment_current_hash")
+    }
+    service_ids_per_deployment: dict[str, str] = dict(
+        DockerDeployment.objects.filter(hash__in=deployment_hashes).values_list(
+            "hash", "service_id"
+        )
+    )
+
+    http_logs: list[dict[str, Any]] = []
+    header_sets: dict[uuid.UUID, dict[str, list[str]]] = {}
+    for log, dedupe_key in validated_logs:
+        request = log["request"]
+        deployment_id = log.get("zane_deployment_current_hash") or None
+        http_logs.append(
+            dict(
+                dedupe_key=dedupe_key,
+                time=datetime.datetime.fromtimestamp(log["ts"], tz=datetime.UTC),
+                deployment_id=deployment_id,
+                service_id=service_ids_per_deployment.get(deployment_id),
+                request_method=request["method"],
+                status=log["status"],
+                request_duration_ms=round(log["duration"] * 1000),
+                request_header_set_id=log_headers.add_header_set(
+                    header_sets, request["headers"]
+                ),
+                response_header_set_id=log_headers.add_header_set(
+                    header_sets, log["resp_headers"]
+                ),
+                request_host=request["host"],
+                request_uri=request["uri"][: HttpLog.request_uri.field.max_length],
+                request_ip=request["client_ip"],
+            )
+        )
+    log_headers.store_header_sets(header_sets)
+    return http_logs
+
+
+# ==============================
+#         Log writers          #
+# ==============================
+
+
+def _get_insert_fields(model: type[Log]) -> list[models.Field]:
+    return [
+        field
+        for field in model._meta.concrete_fields
+        if not getattr(field, "generated", False)
+    ]
+
+
+def _complete_row(
+    fields: list[models.Field], row: dict[str, Any], now: datetime.datetime
+) -> dict[str, Any]:
+    """
+    Fill the columns not provided in `row` the same way django would on `save()`,
+    since the rows written with `COPY` never go through a model instance.
+    """
+    completed = dict(row)
+    for field in fields:
+        if field.attname in completed:
+            continue
+        if getattr(field, "auto_now_add", False) or getattr(field, "auto_now", False):
+            completed[field.attname] = now
+        else:
+            completed[field.attname] = field.get_default()
+    return completed
+
+
+def _escape_copy_value(field: models.Field, value: Any) -> str:
+    """
+    Encode a value in the postgres `COPY ... FROM STDIN` text format.
+    """
+    if isinstance(field, models.JSONField):
+        if value is None:
+            return r"\N"
+        value = json.dumps(value, cls=DjangoJSONEncoder)
+    elif value is None:
+        return r"\N"
+    elif isinstance(field, SmallChoiceField):
+        value = str(field.get_prep_value(value))
+    elif isinstance(value, datetime.datetime):
+        value = value.isoformat()
+    else:
+        value = str(value)
+    return (
+        value.replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
+
+
+def copy_is_available() -> bool:
+    return connection.vendor == "postgresql"
+
+
+def copy_logs(model: type[Log], rows: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    """
+    Stream `rows` with `COPY FROM STDIN` into a temporary staging table, then move them to the table of `model`
+    with `INSERT ... ON CONFLICT DO NOTHING`, since `COPY` alone cannot skip the lines already stored.
+    This skips the model instantiation and the multi-row INSERT statement of `bulk_create`.
+    Returns the rows inserted.
+    """
+    if len(rows) == 0:
+        return []
+
+    fields = _get_insert_fields(model)
+    now = timezone.now()
+    buffer = io.StringIO()
+    completed_rows = []
+    for row in rows:
+        completed_row = _complete_row(fields, row, now)
+        completed_rows.append(completed_row)
+        buffer.write(
+            "\t".join(
+                _escape_copy_value(field, completed_row[field.attname])
+                for field in fields
+            )
+        )
+        buffer.write("\n")
+    buffer.seek(0)
+
+    quote_name = connection.ops.quote_name
+    table = model._meta.db_table
+    staging_table = f"{table}_staging"
+    columns = ", ".join(quote_name(field.column) for field in fields)
+    sql = f"COPY {quote_name(staging_table)} ({columns}) FROM STDIN"
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        # kept for the other batches of the transaction, dropped at the end of it
+        cursor.execute(
+            f"CREATE TEMPORARY TABLE IF NOT EXISTS {quote_name(staging_table)} "
+            f"(LIKE {quote_name(table)}) ON COMMIT DROP"
+        )
+        raw_cursor = cursor.cursor
+        if hasattr(raw_cursor, "copy_expert"):
+            # psycopg2
+            raw_cursor.copy_expert(sql, buffer)
+        else:
+            # psycopg 3
+            with raw_cursor.copy(sql) as copy:
+                copy.write(buffer.getvalue())
+        cursor.execute(
+            f"INSERT INTO {quote_name(table)} ({columns}) "
+            f"SELECT {columns} FROM {quote_name(staging_table)} "
+            f"ON CONFLICT DO NOTHING RETURNING id"
+        )
+        inserted_ids = {row_id for (row_id,) in cursor.fetchall()}
+        cursor.execute(f"TRUNCATE {quote_name(staging_table)}")
+    return [row for row in completed_rows if row["id"] in inserted_ids]
+
+
+def bulk_create_logs(
+    model: type[Log], rows: list[dict[str, Any]]
+) -> list[dict[str, Any]]:
+    dedupe_keys = [row["dedupe_key"] for row in rows if row.get("dedupe_key")]
+    if len(dedupe_keys) > 0:
+        stored_keys = set(
+            model.objects.filter(dedupe_key__in=dedupe_keys).values_list(
+                "dedupe_key", flat=True
+            )
+        )
+        rows = [row for row in rows if row.get("dedupe_key") not in stored_keys]
+    created = model.objects.bulk_create(
+        [model(**row) for row in rows],
+        batch_size=BULK_CREATE_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+    if len(created) == 0:
+        return []
+    # `ignore_conflicts` returns all the objects, even those skipped because a concurrent batch
+    # stored the same dedupe key in the meantime: only the ids found after the insert were inserted
+    inserted_ids = set(
+        model.objects.filter(
+            id__in=[log.id for log in created],
+            time__gte=min(log.time for log in created),
+            time__lte=max(log.time for log in created),
+        ).values_list("id", flat=True)
+    )
+    # the same rows as `copy_logs`, with all the columns of the model
+    fields = _get_insert_fields(model)
+    return [
+        dict(row, **{field.attname: getattr(log, field.attname) for field in fields})
+        for row, log in zip(rows, created)
+        if log.id in inserted_ids
+    ]
+
+
+def deduplicate_rows(rows: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    """
+    Keep the first row of each dedupe key of the batch, the rows without a key are all kept.
+    """
+    seen_keys = set()
+    deduplicated = []
+    for row in rows:
+        dedupe_key = row.get("dedupe_key")
+        if dedupe_key is not None:
+            if dedupe_key in seen_keys:
+                continue
+            seen_keys.add(dedupe_key)
+        deduplicated.append(row)
+    return deduplicated
+
+
+def insert_logs(
+    model: type[Log], rows: list[dict[str, Any]], use_copy: bool | None = None
+) -> list[dict[str, Any]]:
+    """
+    Insert a batch of log rows, using `COPY` when the database supports it
+    and falling back to `bulk_create` otherwise.
+    The rows with the dedupe key of a row already stored (or of a previous row of the batch) are skipped,
+    returns the rows inserted.
+    """
+    if use_copy is None:
+        use_copy = copy_is_available()
+    rows = deduplicate_rows(rows)
+    if use_copy:
+        return copy_logs(model, rows)
+    return bulk_create_logs(model, rows)
+
+
+def write_logs(
+    model: type[Log], rows: list[dict[str, Any]], use_copy: bool | None = None
+) -> int:
+    """
+    Same as `insert_logs`, returns the number of rows inserted.
+    """
+    return len(insert_logs(model, rows, use_copy))
@@ -0,0 +1,149 @@
+"""
+Live tail of the logs of deployments: every batch of logs stored by the ingest path is published
+to a redis channel per deployment, and the clients following a deployment subscribe to it over SSE,
+so following the logs never reads the database.
+
+The most recent logs of each deployment are also kept in a capped redis list,
+which serves the first page of the logs of a deployment without querying the log table.
+"""
+
+import datetime
+import json
+import time
+from typing import Any, AsyncIterator, Iterable
+
+import redis
+import redis.asyncio
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+from .utils import get_redis_client
+
+LIVE_TAIL_CHANNEL_PREFIX = "logs:deployment"
+LIVE_TAIL_HEARTBEAT_SECONDS = 15
+# delay (in milliseconds) before the browser reconnects when the stream is closed
+LIVE_TAIL_RETRY_MS = 3_000
+LIVE_LOG_FIELDS = (
+    "id",
+    "service_id",
+    "deployment_id",
+    "time",
+    "created_at",
+    "content",
+    "content_json",
+    "content_blob_id",
+    "level",
+    "source",
+)
+
+
+def get_live_tail_channel(deployment_id: str) -> str:
+    return f"{LIVE_TAIL_CHANNEL_PREFIX}:{deployment_id}"
+
+
+def get_recent_logs_key(deployment_id: str) -> str:
+    return f"{LIVE_TAIL_CHANNEL_PREFIX}:{deployment_id}:recent"
+
+
+def publish_deployment_logs(rows: Iterable[dict[str, Any]]):
+    """
+    Publish the `SimpleLog` rows of a batch to the channel of their deployment, one message per deployment,
+    and push them to the list of the recent logs of the deployment, capped to `LOGS_RECENT_BUFFER_SIZE` logs.
+    Publishing is best effort: the logs are already stored and a live tail missing them is not worth failing the batch.
+    """
+    now = timezone.now()
+    messages: dict[str, list[dict[str, Any]]] = {}
+    for row in rows:
+        deployment_id = row.get("deployment_id")
+        if deployment_id is None:
+            continue
+        log = {field: row.get(field) for field in LIVE_LOG_FIELDS}
+        # the rows written with `COPY` get their `created_at` from the database
+        log["created_at"] = log["created_at"] or now
+        messages.setdefault(deployment_id, []).append(log)
+    if len(messages) == 0:
+        return
+
+    try:
+        pipeline = get_redis_client().pipeline(transaction=False)
+        for deployment_id, logs in messages.items():
+            pipeline.publish(
+                get_live_tail_channel(deployment_id),
+                json.dumps(logs, cls=DjangoJSONEncoder),
+            )
+            # pushed from the oldest, so that the head of the list is the newest log
+            recent_logs_key = get_recent_logs_key(deployment_id)
+            pipeline.lpush(
+                recent_logs_key,
+                *(
+                    json.dumps(log, cls=DjangoJSONEncoder)
+                    for log in sorted(
+                        logs, key=lambda log: (log["time"], str(log["id"]))
+                    )
+                ),
+            )
+            pipeline.ltrim(recent_logs_key, 0, settings.LOGS_RECENT_BUFFER_SIZE - 1)
+            pipeline.expire(
+                recent_logs_key, datetime.timedelta(days=settings.LOGS_RETENTION_DAYS)
+            )
+        pipeline.execute()
+    except redis.RedisError as e:
+        print(f"Could not publish the logs of {len(messages)} deployments: {e}")
+
+
+def get_recent_deployment_logs(deployment_id: str) -> list[dict[str, Any]] | None:
+    """
+    The recent logs of a deployment kept in redis, from the newest,
+    returns `None` if redis cannot be reached.
+    """
+    try:
+        entries = get_redis_client().lrange(get_recent_logs_key(deployment_id), 0, -1)
+    except redis.RedisError as e:
+        print(f"Could not read the recent logs of `{deployment_id}`: {e}")
+        return None
+
+    logs = []
+    for entry in entries:
+        log = json.loads(entry)
+        log["time"] = datetime.datetime.fromisoformat(log["time"])
+        log["created_at"] = datetime.datetime.fromisoformat(log["created_at"])
+        logs.append(log)
+    # batches are not always received in order
+    logs.sort(key=lambda log: (log["time"], log["id"]), reverse=True)
+    return logs
+
+
+def format_event(data: bytes | str, event: str = "logs") -> str:
+    if isinstance(data, bytes):
+        data = data.decode()
+    return f"event: {event}\ndata: {data}\n\n"
+
+
+async def stream_deployment_logs(
+    deployment_id: str, heartbeat_seconds: float = LIVE_TAIL_HEARTBEAT_SECONDS
+) -> AsyncIterator[str]:
+    """
+    Server-sent events of the logs published for a deployment, one `logs` event per published batch
+    (a JSON array of logs), with a comment sent every `heartbeat_seconds` to keep idle connections open.
+    The subscription is closed when the client disconnects, which cancels the iteration.
+    """
+    client = redis.asyncio.Redis.from_url(settings.REDIS_URL)
+    pubsub = client.pubsub(ignore_subscribe_messages=True)
+    try:
+        await pubsub.subscribe(get_live_tail_channel(deployment_id))
+        yield f"retry: {LIVE_TAIL_RETRY_MS}\n\n"
+        last_sent_at = time.monotonic()
+        while True:
+            message = await pubsub.get_message(
+                ignore_subscribe_messages=True, timeout=heartbeat_seconds
+            )
+            if message is not None and message["type"] == "message":
+                yield format_event(message["data"])
+                last_sent_at = time.monotonic()
+            elif time.monotonic() - last_sent_at >= heartbeat_seconds:
+                yield ": heartbeat\n\n"
+                last_sent_at = time.monotonic()
+    finally:
+        await pubsub.aclose()
+        await client.aclose()
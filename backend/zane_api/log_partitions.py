@@ -0,0 +1,180 @@
+"""
+Management of the daily partitions of the log tables (`SimpleLog`, `SimpleLogField` & `HttpLog`),
+which are partitioned by range on `time`, one partition per day (UTC) and a default partition
+catching the logs outside any daily partition.
+"""
+
+import datetime
+
+from django.db import connection, transaction, models
+
+from .models import SimpleLog, SimpleLogField, HttpLog
+
+LOG_PARTITIONED_MODELS = (SimpleLog, SimpleLogField, HttpLog)
+LOG_PARTITION_SUFFIX_FORMAT = "%Y%m%d"
+
+
+def get_partition_name(table: str, day: datetime.date) -> str:
+    return f"{table}_{day.strftime(LOG_PARTITION_SUFFIX_FORMAT)}"
+
+
+def get_default_partition_name(table: str) -> str:
+    return f"{table}_default"
+
+
+def get_partition_bounds(day: datetime.date) -> tuple[str, str]:
+    next_day = day + datetime.timedelta(days=1)
+    return f"{day.isoformat()} 00:00:00+00", f"{next_day.isoformat()} 00:00:00+00"
+
+
+def is_partitioned(table: str) -> bool:
+    if connection.vendor != "postgresql":
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", [table]
+        )
+        row = cursor.fetchone()
+    return row is not None and row[0] == "p"
+
+
+def list_log_partitions(table: str) -> dict[str, datetime.date]:
+    """
+    Daily partitions of the table, indexed by name, the default partition is not included.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT child.relname FROM pg_inherits
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE pg_inherits.inhparent = to_regclass(%s)
+            """,
+            [table],
+        )
+        names = [name for (name,) in cursor.fetchall()]
+
+    partitions = {}
+    for name in names:
+        suffix = name.removeprefix(f"{table}_")
+        try:
+            partitions[name] = datetime.datetime.strptime(
+                suffix, LOG_PARTITION_SUFFIX_FORMAT
+            ).date()
+        except ValueError:
+            continue
+    return partitions
+
+
+def create_log_partition(model: type[models.Model], day: datetime.date):
+    quote_name = connection.ops.quote_name
+    table = model._meta.db_table
+    partition = get_partition_name(table, day)
+    default_partition = get_default_partition_name(table)
+    lower_bound, upper_bound = get_partition_bounds(day)
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            SELECT EXISTS (
+                SELECT 1 FROM {quote_name(default_partition)} WHERE "time" >= %s AND "time" < %s
+            )
+            """,
+            [lower_bound, upper_bound],
+        )
+        (has_default_rows,) = cursor.fetchone()
+
+        if not has_default_rows:
+            cursor.execute(
+                f"CREATE TABLE {quote_name(partition)} PARTITION OF {quote_name(table)} "
+                f"FOR VALUES FROM ('{lower_bound}') TO ('{upper_bound}')"
+            )
+            return
+
+        # Postgres refuses to create a partition for rows already stored in the default partition,
+        # so they are moved to a standalone table which is then attached as the partition of the day
+        cursor.execute(
+            f"CREATE TABLE {quote_name(partition)} "
+            f"(LIKE {quote_name(table)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING GENERATED)"
+        )
+        # generated columns are computed again on insert
+        columns = ", ".join(
+            quote_name(field.column)
+            for field in model._meta.concrete_fields
+            if not field.generated
+        )
+        cursor.execute(
+            f"""
+            WITH moved AS (
+                DELETE FROM {quote_name(default_partition)} WHERE "time" >= %s AND "time" < %s RETURNING {columns}
+            )
+            INSERT INTO {quote_name(partition)} ({columns}) SELECT {columns} FROM moved
+            """,
+            [lower_bound, upper_bound],
+        )
+        cursor.execute(
+            f"ALTER TABLE {quote_name(table)} ATTACH PARTITION {quote_name(partition)} "
+            f"FOR VALUES FROM ('{lower_bound}') TO ('{upper_bound}')"
+        )
+
+
+def create_log_partitions(
+    days_ahead: int, start: datetime.date | None = None
+) -> list[str]:
+    """
+    Create the missing daily partitions from `start` (today by default) to `start + days_ahead`,
+    returns the names of the partitions created.
+    """
+    start = start or datetime.datetime.now(tz=datetime.UTC).date()
+    created = []
+    for model in LOG_PARTITIONED_MODELS:
+        table = model._meta.db_table
+        if not is_partitioned(table):
+            continue
+        existing_partitions = list_log_partitions(table)
+        for offset in range(days_ahead + 1):
+            day = start + datetime.timedelta(days=offset)
+            partition = get_partition_name(table, day)
+            if partition not in existing_partitions:
+                create_log_partition(model, day)
+                created.append(partition)
+    return created
+
+
+def drop_expired_log_partitions(
+    retention_days: int, now: datetime.datetime | None = None
+) -> tuple[list[str], int]:
+    """
+    Detach & drop the daily partitions containing only logs older than `retention_days`,
+    and delete the expired logs left in the default partitions.
+    Returns the names of the partitions dropped and the number of rows deleted from the default partitions.
+    """
+    quote_name = connection.ops.quote_name
+    now = now or datetime.datetime.now(tz=datetime.UTC)
+    cutoff = now - datetime.timedelta(days=retention_days)
+
+    dropped = []
+    deleted_count = 0
+    for model in LOG_PARTITIONED_MODELS:
+        table = model._meta.db_table
+        if not is_partitioned(table):
+            continue
+        for partition, day in sorted(list_log_partitions(table).items()):
+            partition_end = datetime.datetime.combine(
+                day + datetime.timedelta(days=1), datetime.time(), tzinfo=datetime.UTC
+            )
+            if partition_end > cutoff:
+                continue
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute(
+                    f"ALTER TABLE {quote_name(table)} DETACH PARTITION {quote_name(partition)}"
+                )
+                cursor.execute(f"DROP TABLE {quote_name(partition)}")
+            dropped.append(partition)
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {quote_name(get_default_partition_name(table))} WHERE "time" < %s',
+                [cutoff],
+            )
+            deleted_count += cursor.rowcount
+    return dropped, deleted_count
@@ -0,0 +1,204 @@
+"""
+Redis stream used as a buffer between `/api/logs/tail` and the database,
+so that the latency of the ingest endpoint does not depend on the latency of the database.
+Batches are stored raw (as received) and decoded by the writers of the consumer group.
+"""
+
+import io
+import math
+import socket
+import time
+from typing import Any
+
+import redis
+from django.conf import settings
+from django.db import (
+    DatabaseError,
+    DataError,
+    IntegrityError,
+    close_old_connections,
+    transaction,
+)
+
+from . import log_ingestion
+from .utils import get_redis_client
+
+QUEUE_READ_COUNT = 100
+QUEUE_BLOCK_MS = 5_000
+# pending batches not acked after this delay belong to a dead writer and are claimed by another one
+QUEUE_CLAIM_MIN_IDLE_MS = 60_000
+QUEUE_MAX_RETRY_AFTER = 60
+# delay before retrying the entries which could not be written because of the database
+QUEUE_RETRY_DELAY_SECONDS = 5
+
+
+def get_retry_after(queue_length: int) -> int:
+    """
+    Estimation (in seconds) of the time needed for the writers to drain the queue back under its limit.
+    """
+    excess = queue_length - settings.LOGS_QUEUE_MAX_LENGTH + 1
+    return min(
+        max(math.ceil(excess / settings.LOGS_QUEUE_DRAIN_RATE), 1),
+        QUEUE_MAX_RETRY_AFTER,
+    )
+
+
+def enqueue_log_batch(
+    body: bytes, content_type: str | None, content_encoding: str | None
+) -> int | None:
+    """
+    Append a raw batch of logs to the queue,
+    returns the number of seconds to wait if the queue is full, or `None` if the batch has been queued.
+    """
+    client = get_redis_client()
+    queue_length = client.xlen(settings.LOGS_QUEUE_STREAM)
+    if queue_length >= settings.LOGS_QUEUE_MAX_LENGTH:
+        return get_retry_after(queue_length)
+
+    client.xadd(
+        settings.LOGS_QUEUE_STREAM,
+        {
+            "body": body,
+            "content_type": content_type or "",
+            "content_encoding": content_encoding or "",
+        },
+    )
+    return None
+
+
+def write_queued_batches(
+    entries: list[tuple[bytes, dict[bytes, bytes]]]
+) -> tuple[int, int]:
+    """
+    Store the logs of many queued batches in a single transaction,
+    batches that cannot be decoded or that the database rejects and invalid records are dropped
+    as the client is already gone, otherwise they would be retried forever and block the queue.
+    The other database errors (connection lost, timeouts, deadlocks...) are raised, so that the batches are retried.
+    """
+    simple_logs_inserted = 0
+    http_logs_inserted = 0
+    with transaction.atomic():
+        for entry_id, fields in entries:
+            if not fields:
+                # entries deleted while pending are returned without their fields
+                continue
+            content_encoding = fields.get(b"content_encoding", b"").decode() or None
+            records = log_ingestion.iter_log_records(
+                io.BytesIO(fields.get(b"body", b"")),
+                fields.get(b"content_type", b"").decode(),
+                content_encoding,
+            )
+            batch_simple_count = 0
+            batch_http_count = 0
+            try:
+                # a savepoint per batch, so that a malformed batch does not lose the others
+                with transaction.atomic():
+                    for chunk in log_ingestion.chunked(
+                        records, settings.LOGS_INGEST_CHUNK_SIZE
+                    ):
+                        simple_count, http_count = log_ingestion.ingest_container_logs(
+                            log_ingestion.validate_container_logs(
+                                chunk, drop_invalid=True
+                            )
+                        )
+                        batch_simple_count += simple_count
+                        batch_http_count += http_count
+            except (
+                log_ingestion.LogParseError,
+                log_ingestion.UnsupportedLogFormat,
+            ) as e:
+                print(f"Dropping the invalid log batch `{entry_id!r}`: {e}")
+                continue
+            except (DataError, IntegrityError) as e:
+                print(
+                    f"Dropping the log batch `{entry_id!r}` rejected by the database: {e}"
+                )
+                continue
+            simple_logs_inserted += batch_simple_count
+            http_logs_inserted += batch_http_count
+    return simple_logs_inserted, http_logs_inserted
+
+
+class LogQueueWriter:
+    """
+    Member of the consumer group draining the logs queue,
+    start as many writers as needed to keep up with the ingested volume.
+    """
+
+    def __init__(
+        self,
+        consumer_name: str | None = None,
+        read_count: int = QUEUE_READ_COUNT,
+        block_ms: int = QUEUE_BLOCK_MS,
+    ):
+        self.client = get_redis_client()
+        self.stream = settings.LOGS_QUEUE_STREAM
+        self.group = settings.LOGS_QUEUE_GROUP
+        self.consumer_name = consumer_name or socket.gethostname()
+        self.read_count = read_count
+        self.block_ms = block_ms
+
+    def create_group(self):
+        try:
+            self.client.xgroup_create(self.stream, self.group, id="0", mkstream=True)
+        except redis.ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    def read_entries(self, last_id: str) -> list[tuple[bytes, dict[bytes, bytes]]]:
+        response: list[Any] = self.client.xreadgroup(
+            self.group,
+            self.consumer_name,
+            {self.stream: last_id},
+            count=self.read_count,
+            block=self.block_ms if last_id == ">" else None,
+        )
+        if not response:
+            return []
+        _, entries = response[0]
+        return entries
+
+    def claim_stale_entries(self) -> list[tuple[bytes, dict[bytes, bytes]]]:
+        response = self.client.xautoclaim(
+            self.stream,
+            self.group,
+            self.consumer_name,
+            min_idle_time=QUEUE_CLAIM_MIN_IDLE_MS,
+            count=self.read_count,
+        )
+        return response[1]
+
+    def process(self, entries: list[tuple[bytes, dict[bytes, bytes]]]):
+        if len(entries) == 0:
+            return
+        start_time = time.monotonic()
+        try:
+            simple_count, http_count = write_queued_batches(entries)
+        except DatabaseError as e:
+            # not acked: the entries stay pending and are read again by `run`
+            print(
+                f"Could not write {len(entries)} log batches, retrying in {QUEUE_RETRY_DELAY_SECONDS}s: {e}"
+            )
+            time.sleep(QUEUE_RETRY_DELAY_SECONDS)
+            return
+        # only ack after the commit, so that the entries are retried if the writer crashes in between
+        entry_ids = [entry_id for entry_id, _ in entries]
+        self.client.xack(self.stream, self.group, *entry_ids)
+        self.client.xdel(self.stream, *entry_ids)
+        print(
+            f"Wrote {simple_count} simple logs & {http_count} http logs from {len(entries)} batches "
+            f"in {time.monotonic() - start_time:.3f}s"
+        )
+
+    def run(self):
+        self.create_group()
+        while True:
+            # drop the connection if it was lost, it is opened again by the next query
+            close_old_connections()
+            # first finish the entries this consumer read but did not write (before being restarted or on an error)
+            entries = self.read_entries("0")
+            if len(entries) == 0:
+                entries = self.read_entries(">")
+            if len(entries) == 0:
+                entries = self.claim_stale_entries()
+            self.process(entries)
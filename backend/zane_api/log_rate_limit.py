@@ -0,0 +1,103 @@
+"""
+Per-service rate limiting of the ingested logs, so that a chatty service cannot delay the logs of the others.
+
+Each service has a budget of `rate limit * LOGS_RATE_LIMIT_WINDOW_SECONDS` lines, refilled at the start of every window.
+The budget used is counted in the cache (redis), so that all the API workers share the same limit.
+The lines over the budget are sampled (`logs_overflow_sample_rate`) or dropped, and a `SYSTEM` log
+records the number of lines dropped.
+"""
+
+import math
+import time
+from typing import Any
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from .models import DockerRegistryService, SimpleLog
+
+RATE_LIMIT_CACHE_PREFIX = "logs:rate-limit"
+
+
+def acquire_log_budget(service_id: str, count: int, rate_limit: int) -> int:
+    """
+    Take `count` lines from the budget of the current window of the service,
+    returns the number of lines within the budget.
+    """
+    window = settings.LOGS_RATE_LIMIT_WINDOW_SECONDS
+    budget = rate_limit * window
+    key = f"{RATE_LIMIT_CACHE_PREFIX}:{service_id}:{int(time.time()) // window}"
+    # `incr` is atomic, `add` only creates the counter if no other worker did
+    cache.add(key, 0, timeout=window * 2)
+    try:
+        used = cache.incr(key, count)
+    except ValueError:
+        # the counter expired in between
+        cache.add(key, 0, timeout=window * 2)
+        used = cache.incr(key, count)
+    return max(min(budget - (used - count), count), 0)
+
+
+def is_sampled(position: int, sample_rate: float) -> bool:
+    """
+    Spread the lines kept evenly: one line every `1 / sample_rate` lines.
+    """
+    return math.floor((position + 1) * sample_rate) > math.floor(position * sample_rate)
+
+
+def apply_service_rate_limits(rows: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    """
+    Drop the `SimpleLog` rows of the services over their budget (except the sampled ones),
+    with a `SYSTEM` log per service & deployment recording the number of lines dropped.
+    """
+    rows_per_service: dict[str, list[dict[str, Any]]] = {}
+    for row in rows:
+        service_id = row.get("service_id")
+        if service_id is not None:
+            rows_per_service.setdefault(service_id, []).append(row)
+    if len(rows_per_service) == 0:
+        return rows
+
+    services_settings = {
+        service_id: (rate_limit, sample_rate)
+        for service_id, rate_limit, sample_rate in DockerRegistryService.objects.filter(
+            id__in=rows_per_service.keys()
+        ).values_list("id", "logs_rate_limit", "logs_overflow_sample_rate")
+    }
+
+    dropped_ids = set()
+    system_logs = []
+    for service_id, service_rows in rows_per_service.items():
+        rate_limit, sample_rate = services_settings.get(service_id, (None, 0.0))
+        allowed = acquire_log_budget(
+            service_id,
+            len(service_rows),
+            rate_limit or settings.LOGS_SERVICE_RATE_LIMIT,
+        )
+        dropped_per_deployment: dict[str | None, int] = {}
+        for position, row in enumerate(service_rows[allowed:]):
+            if not is_sampled(position, sample_rate):
+                dropped_ids.add(id(row))
+                deployment_id = row.get("deployment_id")
+                dropped_per_deployment[deployment_id] = (
+                    dropped_per_deployment.get(deployment_id, 0) + 1
+                )
+        for deployment_id, dropped_count in dropped_per_deployment.items():
+            system_logs.append(
+                dict(
+                    source=SimpleLog.LogSource.SYSTEM,
+                    level=SimpleLog.LogLevel.ERROR,
+                    content=(
+                        f"{dropped_count} log lines dropped, the service exceeded its limit"
+                        f" of {rate_limit or settings.LOGS_SERVICE_RATE_LIMIT} lines per second"
+                    ),
+                    time=timezone.now(),
+                    deployment_id=deployment_id,
+                    service_id=service_id,
+                )
+            )
+
+    if len(dropped_ids) == 0:
+        return rows
+    return [row for row in rows if id(row) not in dropped_ids] + system_logs
@@ -0,0 +1,102 @@
+"""
+Retention of the logs of the services with a shorter retention than the default one,
+the logs older than the default retention are dropped with their partition (see `log_partitions.py`).
+"""
+
+import datetime
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from django.db.models.functions import Coalesce
+
+from .log_archive import delete_expired_segments
+from .log_blobs import delete_expired_log_blobs
+from .models import DockerRegistryService, SimpleLog, SimpleLogField, HttpLog
+
+
+@dataclass
+class LogPurgeReport:
+    service_id: str
+    retention_days: int
+    rows_deleted: int = 0
+    bytes_reclaimed: int = 0
+
+
+def get_services_with_custom_retention() -> list[tuple[str, int]]:
+    """
+    Services with a retention (their own or the one of their project) shorter than the default one.
+    """
+    return list(
+        DockerRegistryService.objects.filter(
+            Q(logs_retention_days__isnull=False)
+            | Q(project__logs_retention_days__isnull=False)
+        )
+        .annotate(
+            retention_days=Coalesce(
+                "logs_retention_days", "project__logs_retention_days"
+            )
+        )
+        .filter(retention_days__lt=settings.LOGS_RETENTION_DAYS)
+        .values_list("id", "retention_days")
+    )
+
+
+def delete_expired_logs_chunk(
+    table: str, service_id: str, cutoff: datetime.datetime, chunk_size: int
+) -> tuple[int, int]:
+    """
+    Delete at most `chunk_size` logs of the service older than `cutoff`,
+    returns the number of rows deleted and their size in bytes.
+    """
+    quote_name = connection.ops.quote_name
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            WITH expired AS (
+                SELECT id, "time" FROM {quote_name(table)}
+                WHERE service_id = %s AND "time" < %s
+                LIMIT %s
+            ), deleted AS (
+                DELETE FROM {quote_name(table)} log USING expired
+                WHERE log.id = expired.id AND log."time" = expired."time"
+                RETURNING pg_column_size(log.*) AS size
+            )
+            SELECT count(*), coalesce(sum(size), 0) FROM deleted
+            """,
+            [service_id, cutoff, chunk_size],
+        )
+        rows_deleted, bytes_reclaimed = cursor.fetchone()
+    return rows_deleted, int(bytes_reclaimed)
+
+
+def purge_expired_service_logs(
+    chunk_size: int | None = None, now: datetime.datetime | None = None
+) -> list[LogPurgeReport]:
+    """
+    Delete the logs older than the retention of their service, in chunks of `chunk_size` rows,
+    each chunk being deleted in its own transaction to keep the locks short.
+    """
+    chunk_size = chunk_size or settings.LOGS_PURGE_CHUNK_SIZE
+    now = now or datetime.datetime.now(tz=datetime.UTC)
+
+    reports = []
+    for service_id, retention_days in get_services_with_custom_retention():
+        report = LogPurgeReport(service_id=service_id, retention_days=retention_days)
+        cutoff = now - datetime.timedelta(days=retention_days)
+        for model in (SimpleLog, SimpleLogField, HttpLog):
+            while True:
+                rows_deleted, bytes_reclaimed = delete_expired_logs_chunk(
+                    model._meta.db_table, service_id, cutoff, chunk_size
+                )
+                report.rows_deleted += rows_deleted
+                report.bytes_reclaimed += bytes_reclaimed
+                if rows_deleted < chunk_size:
+                    break
+        _, segments_size = delete_expired_segments(service_id, retention_days, now)
+        report.bytes_reclaimed += segments_size
+        _, blobs_size = delete_expired_log_blobs(retention_days, service_id, now)
+        report.bytes_reclaimed += blobs_size
+        reports.append(report)
+    return reports
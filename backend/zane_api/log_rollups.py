@@ -0,0 +1,333 @@
+"""
+Per-minute rollups of the `HttpLog` of each deployment (see `HttpLogRollup`),
+updated on ingest so that the HTTP metrics never aggregate the raw access logs.
+
+The request durations are counted in fixed buckets laid out like an HDR histogram:
+the durations below `HISTOGRAM_SUB_BUCKET_COUNT` ms have a bucket each, then every power of two
+is split in `HISTOGRAM_SUB_BUCKET_COUNT` buckets, which bounds the error of the percentiles to 12.5%.
+All the histograms have the same buckets, so merging them (minutes into hours or days) is a sum.
+"""
+
+import datetime
+import math
+import re
+from dataclasses import dataclass
+from typing import Any, Iterable
+
+from django.conf import settings
+from django.db import connection, models
+
+from .models import HttpLogRollup
+
+HISTOGRAM_SUB_BUCKET_BITS = 3
+HISTOGRAM_SUB_BUCKET_COUNT = 1 << HISTOGRAM_SUB_BUCKET_BITS
+# durations are capped to ~70 minutes
+HISTOGRAM_MAX_BIT_LENGTH = 22
+HISTOGRAM_MAX_VALUE = (1 << HISTOGRAM_MAX_BIT_LENGTH) - 1
+HISTOGRAM_BUCKET_COUNT = (
+    HISTOGRAM_MAX_BIT_LENGTH - HISTOGRAM_SUB_BUCKET_BITS + 1
+) * HISTOGRAM_SUB_BUCKET_COUNT
+ROLLUP_UPSERT_BATCH_SIZE = 500
+ROLLUP_COUNT_FIELDS = (
+    "request_count",
+    "status_1xx_count",
+    "status_2xx_count",
+    "status_3xx_count",
+    "status_4xx_count",
+    "status_5xx_count",
+    "duration_sum_ms",
+)
+ROLLUP_INTERVALS = ("minute", "hour", "day")
+# the segments of the paths identifying a resource are replaced, so that `/users/42` & `/users/43`
+# share the rollups of `/users/:id` instead of adding a row per user each minute
+PATH_SEGMENT_PLACEHOLDERS = (
+    (re.compile(r"[0-9]+"), ":id"),
+    (
+        re.compile(
+            r"[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}"
+        ),
+        ":uuid",
+    ),
+    (re.compile(r"[0-9a-fA-F]{16,}"), ":hash"),
+)
+
+
+def get_bucket_index(value: int) -> int:
+    value = min(max(value, 0), HISTOGRAM_MAX_VALUE)
+    if value < HISTOGRAM_SUB_BUCKET_COUNT:
+        return value
+    shift = value.bit_length() - HISTOGRAM_SUB_BUCKET_BITS - 1
+    return (shift + 1) * HISTOGRAM_SUB_BUCKET_COUNT + (
+        (value >> shift) - HISTOGRAM_SUB_BUCKET_COUNT
+    )
+
+
+def get_bucket_bounds(index: int) -> tuple[int, int]:
+    """
+    Range of the durations counted in a bucket, as `[lower, upper)`
+    """
+    group, offset = divmod(index, HISTOGRAM_SUB_BUCKET_COUNT)
+    if group == 0:
+        return index, index + 1
+    shift = group - 1
+    lower = (HISTOGRAM_SUB_BUCKET_COUNT + offset) << shift
+    return lower, lower + (1 << shift)
+
+
+def new_histogram() -> list[int]:
+    return [0] * HISTOGRAM_BUCKET_COUNT
+
+
+def merge_histogram(target: list[int], histogram: list[int]):
+    for index, count in enumerate(histogram):
+        target[index] += count
+
+
+def get_percentile(histogram: list[int], percentile: float) -> int | None:
+    """
+    Highest duration of the bucket containing the percentile, `None` for an empty histogram.
+    """
+    total = sum(histogram)
+    if total == 0:
+        return None
+    rank = max(math.ceil(total * percentile / 100), 1)
+    cumulated = 0
+    for index, count in enumerate(histogram):
+        cumulated += count
+        if cumulated >= rank:
+            return get_bucket_bounds(index)[1] - 1
+    return HISTOGRAM_MAX_VALUE
+
+
+def normalize_path_segment(segment: str) -> str:
+    for pattern, placeholder in PATH_SEGMENT_PLACEHOLDERS:
+        if pattern.fullmatch(segment):
+            return placeholder
+    return segment
+
+
+def get_request_path(request_uri: str) -> str:
+    path = request_uri.split("?", 1)[0] or "/"
+    path = "/".join(normalize_path_segment(segment) for segment in path.split("/"))
+    return path[: HttpLogRollup.request_path.field.max_length]
+
+
+def aggregate_http_logs(http_logs: Iterable[dict[str, Any]]) -> list[dict[str, Any]]:
+    """
+    Rollups of a batch of `HttpLog` rows, per deployment, minute & path, plus the totals of each deployment & minute.
+    """
+    rollups: dict[tuple[str, str, datetime.datetime], dict[str, Any]] = {}
+    for log in http_logs:
+        deployment_id = log.get("deployment_id")
+        if deployment_id is None:
+            continue
+        minute = log["time"].replace(second=0, microsecond=0)
+        status_class = log["status"] // 100
+        duration = log["request_duration_ms"]
+        for request_path in ("", get_request_path(log["request_uri"])):
+            key = (deployment_id, request_path, minute)
+            rollup = rollups.get(key)
+            if rollup is None:
+                rollup = rollups[key] = dict(
+                    deployment_id=deployment_id,
+                    service_id=log.get("service_id"),
+                    minute=minute,
+                    request_path=request_path,
+                    duration_max_ms=0,
+                    duration_histogram=new_histogram(),
+                    **{field: 0 for field in ROLLUP_COUNT_FIELDS},
+                )
+            rollup["request_count"] += 1
+            if 1 <= status_class <= 5:
+                rollup[f"status_{status_class}xx_count"] += 1
+            rollup["duration_sum_ms"] += duration
+            rollup["duration_max_ms"] = max(rollup["duration_max_ms"], duration)
+            rollup["duration_histogram"][get_bucket_index(duration)] += 1
+    # always upserted in the same order, so that concurrent batches cannot deadlock
+    return [rollups[key] for key in sorted(rollups)]
+
+
+def upsert_http_log_rollups(rollups: list[dict[str, Any]]) -> int:
+    """
+    Add the rollups of a batch to the stored ones, in one `INSERT ... ON CONFLICT DO UPDATE` per chunk.
+    """
+    if len(rollups) == 0:
+        return 0
+
+    quote_name = connection.ops.quote_name
+    columns = [
+        "deployment_id",
+        "service_id",
+        "minute",
+        "request_path",
+        *ROLLUP_COUNT_FIELDS,
+        "duration_max_ms",
+        "duration_histogram",
+    ]
+    placeholders = ", ".join(
+        "%s::bigint[]" if column == "duration_histogram" else "%s" for column in columns
+    )
+    updates = ", ".join(
+        [
+            f"{quote_name(field)} = rollup.{quote_name(field)} + EXCLUDED.{quote_name(field)}"
+            for field in ROLLUP_COUNT_FIELDS
+        ]
+        + [
+            "service_id = COALESCE(EXCLUDED.service_id, rollup.service_id)",
+            "duration_max_ms = GREATEST(rollup.duration_max_ms, EXCLUDED.duration_max_ms)",
+            # element-wise sum of the histograms
+            """duration_histogram = ARRAY(
+                SELECT stored + added
+                FROM unnest(rollup.duration_histogram, EXCLUDED.duration_histogram)
+                    WITH ORDINALITY AS bucket(stored, added, position)
+                ORDER BY position
+            )""",
+        ]
+    )
+
+    with connection.cursor() as cursor:
+        for start in range(0, len(rollups), ROLLUP_UPSERT_BATCH_SIZE):
+            chunk = rollups[start : start + ROLLUP_UPSERT_BATCH_SIZE]
+            values = ", ".join(f"({placeholders})" for _ in chunk)
+            cursor.execute(
+                f"""
+                INSERT INTO {quote_name(HttpLogRollup._meta.db_table)} AS rollup
+                ({", ".join(quote_name(column) for column in columns)})
+                VALUES {values}
+                ON CONFLICT (deployment_id, request_path, minute) DO UPDATE SET {updates}
+                """,
+                [rollup[column] for rollup in chunk for column in columns],
+            )
+    return len(rollups)
+
+
+@dataclass
+class HttpMetrics:
+    time: datetime.datetime
+    request_count: int = 0
+    status_1xx_count: int = 0
+    status_2xx_count: int = 0
+    status_3xx_count: int = 0
+    status_4xx_count: int = 0
+    status_5xx_count: int = 0
+    duration_sum_ms: int = 0
+    duration_max_ms: int = 0
+    avg_duration_ms: float | None = None
+    p50_duration_ms: int | None = None
+    p95_duration_ms: int | None = None
+    p99_duration_ms: int | None = None
+
+
+def truncate_time(value: datetime.datetime, interval: str) -> datetime.datetime:
+    value = value.replace(second=0, microsecond=0)
+    if interval in ("hour", "day"):
+        value = value.replace(minute=0)
+    if interval == "day":
+        value = value.replace(hour=0)
+    return value
+
+
+def add_rollup(metrics: HttpMetrics, histogram: list[int], rollup: HttpLogRollup):
+    for field in ROLLUP_COUNT_FIELDS:
+        setattr(metrics, field, getattr(metrics, field) + getattr(rollup, field))
+    metrics.duration_max_ms = max(metrics.duration_max_ms, rollup.duration_max_ms)
+    merge_histogram(histogram, rollup.duration_histogram)
+
+
+def complete_metrics(metrics: HttpMetrics, histogram: list[int]):
+    if metrics.request_count > 0:
+        metrics.avg_duration_ms = metrics.duration_sum_ms / metrics.request_count
+    metrics.p50_duration_ms = get_percentile(histogram, 50)
+    metrics.p95_duration_ms = get_percentile(histogram, 95)
+    metrics.p99_duration_ms = get_percentile(histogram, 99)
+
+
+def get_http_metrics(
+    rollups: models.QuerySet[HttpLogRollup], interval: str = "minute"
+) -> list[HttpMetrics]:
+    """
+    Merge the rollups per `interval` (`minute`, `hour` or `day`), sorted by time.
+    """
+    metrics: dict[datetime.datetime, HttpMetrics] = {}
+    histograms: dict[datetime.datetime, list[int]] = {}
+    for rollup in rollups.order_by("minute").iterator():
+        time = truncate_time(rollup.minute, interval)
+        current = metrics.get(time)
+        if current is None:
+            current = metrics[time] = HttpMetrics(time=time)
+            histograms[time] = new_histogram()
+        add_rollup(current, histograms[time], rollup)
+
+    for time, current in metrics.items():
+        complete_metrics(current, histograms[time])
+    return list(metrics.values())
+
+
+def get_recent_http_metrics(
+    deployment_id: str,
+    window: datetime.timedelta,
+    now: datetime.datetime | None = None,
+) -> HttpMetrics:
+    """
+    Metrics of all the requests of a deployment during the last `window` (rounded to the minute).
+    """
+    now = now or datetime.datetime.now(tz=datetime.UTC)
+    metrics = HttpMetrics(time=truncate_time(now - window, "minute"))
+    histogram = new_histogram()
+    for rollup in HttpLogRollup.objects.filter(
+        deployment_id=deployment_id, request_path="", minute__gte=metrics.time
+    ).iterator():
+        add_rollup(metrics, histogram, rollup)
+    complete_metrics(metrics, histogram)
+    return metrics
+
+
+def get_http_health_breach(
+    deployment_id: str, now: datetime.datetime | None = None
+) -> str | None:
+    """
+    Check the requests received by a deployment against the HTTP health thresholds of the settings,
+    returns the reason why the deployment is unhealthy, or `None` if no threshold is breached
+    (or if there were too few requests to tell).
+    """
+    error_window = settings.DEPLOYMENT_HTTP_5XX_WINDOW_MINUTES
+    errors = get_recent_http_metrics(
+        deployment_id, datetime.timedelta(minutes=error_window), now
+    )
+    if (
+        errors.request_count > 0
+        and errors.request_count >= settings.DEPLOYMENT_HTTP_HEALTH_MIN_REQUESTS
+    ):
+        error_ratio = errors.status_5xx_count / errors.request_count
+        if error_ratio > settings.DEPLOYMENT_HTTP_MAX_5XX_RATIO:
+            return (
+                f"{error_ratio:.0%} of the requests of the last {error_window} minutes failed with a 5xx status"
+                f" (the limit is {settings.DEPLOYMENT_HTTP_MAX_5XX_RATIO:.0%})."
+            )
+
+    if settings.DEPLOYMENT_HTTP_MAX_P99_MS > 0:
+        latency_window = settings.DEPLOYMENT_HTTP_LATENCY_WINDOW_MINUTES
+        latency = get_recent_http_metrics(
+            deployment_id, datetime.timedelta(minutes=latency_window), now
+        )
+        # no percentile without requests in the window
+        if (
+            latency.request_count >= settings.DEPLOYMENT_HTTP_HEALTH_MIN_REQUESTS
+            and latency.p99_duration_ms is not None
+            and latency.p99_duration_ms > settings.DEPLOYMENT_HTTP_MAX_P99_MS
+        ):
+            return (
+                f"The p99 latency of the requests of the last {latency_window} minutes is {latency.p99_duration_ms}ms"
+                f" (the limit is {settings.DEPLOYMENT_HTTP_MAX_P99_MS}ms)."
+            )
+    return None
+
+
+def delete_expired_http_log_rollups(
+    retention_days: int, now: datetime.datetime | None = None
+) -> int:
+    now = now or datetime.datetime.now(tz=datetime.UTC)
+    deleted_count, _ = HttpLogRollup.objects.filter(
+        minute__lt=now - datetime.timedelta(days=retention_days)
+    ).delete()
+    return deleted_count
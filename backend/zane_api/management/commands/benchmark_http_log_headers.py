@@ -0,0 +1,226 @@
+import datetime
+import io
+import json
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from ...log_headers import add_header_set
+from ...utils import generate_log_id
+
+# the columns of `HttpLog` apart from the headers
+HTTP_LOG_COLUMNS = """
+    "id" uuid NOT NULL,
+    "created_at" timestamptz NOT NULL DEFAULT now(),
+    "time" timestamptz NOT NULL,
+    "service_id" varchar NULL,
+    "deployment_id" varchar NULL,
+    "request_method" varchar(7) NOT NULL,
+    "status" integer NOT NULL,
+    "request_duration_ms" integer NOT NULL,
+    "request_host" varchar(1000) NOT NULL,
+    "request_uri" varchar(2000) NOT NULL,
+    "request_ip" inet NOT NULL,
+"""
+# the headers of the logs before (full header maps in every row) and after the header sets
+LAYOUTS = {
+    "json": f"""
+        CREATE TEMPORARY TABLE "benchmark_http_log_json" (
+            {HTTP_LOG_COLUMNS}
+            "request_headers" jsonb NOT NULL,
+            "response_headers" jsonb NOT NULL
+        )
+    """,
+    "header sets": f"""
+        CREATE TEMPORARY TABLE "benchmark_http_log_header_sets" (
+            {HTTP_LOG_COLUMNS}
+            "request_header_set_id" uuid NULL,
+            "response_header_set_id" uuid NULL
+        )
+    """,
+}
+HEADER_SET_TABLE = """
+    CREATE TEMPORARY TABLE "benchmark_http_header_set" (
+        "id" uuid PRIMARY KEY,
+        "headers" jsonb NOT NULL
+    )
+"""
+USER_AGENTS = (
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10.15; rv:127.0) Gecko/20100101 Firefox/127.0",
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/126.0 Safari/537.36",
+    "Mozilla/5.0 (iPhone; CPU iPhone OS 17_5 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Mobile/15E148",
+    "curl/8.5.0",
+    "Go-http-client/2.0",
+)
+
+
+def generate_headers(
+    i: int, now: datetime.datetime
+) -> tuple[dict[str, list[str]], dict[str, list[str]]]:
+    """
+    Headers of a request of a browser/API client, with the values unique to each request (cookies, dates, sizes)
+    """
+    request_headers = {
+        "Accept": ["*/*"],
+        "Accept-Encoding": ["gzip, deflate, br, zstd"],
+        "Accept-Language": ["en,en-US;q=0.8,fr;q=0.5,fr-FR;q=0.3"],
+        "Cookie": [f"sessionid={random.getrandbits(128):032x}"],
+        "Sec-Fetch-Dest": ["empty"],
+        "Sec-Fetch-Mode": ["cors"],
+        "Sec-Fetch-Site": ["same-origin"],
+        "User-Agent": [USER_AGENTS[i % len(USER_AGENTS)]],
+    }
+    response_headers = {
+        "Content-Length": [str(random.randint(100, 10_000))],
+        "Content-Type": ["application/json"],
+        "Cross-Origin-Opener-Policy": ["same-origin"],
+        "Date": [
+            (now + datetime.timedelta(milliseconds=i)).strftime(
+                "%a, %d %b %Y %H:%M:%S GMT"
+            )
+        ],
+        "Referrer-Policy": ["same-origin"],
+        "Server": ["Caddy"],
+        "Vary": ["Accept, Cookie"],
+        "X-Content-Type-Options": ["nosniff"],
+        "X-Frame-Options": ["DENY"],
+    }
+    return request_headers, response_headers
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the insert rate and the size of the http logs storing their full headers as JSON "
+        "and storing references to deduplicated header sets (after the allowlist), "
+        "the tables are temporary and dropped at the end."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=200_000)
+        parser.add_argument("--batch-size", type=int, default=1_000)
+
+    def handle(self, *args, **options):
+        total_rows: int = options["rows"]
+        batch_size: int = options["batch_size"]
+
+        self.stdout.write(
+            f"Inserting {total_rows} http logs in batches of {batch_size}\n"
+        )
+        self.stdout.write(
+            f"{'layout':<12} {'rows/sec':>10} {'logs':>10} {'header sets':>12} {'total':>10}"
+        )
+        for layout in LAYOUTS:
+            rows_per_sec, logs_size, header_sets_size = self.run_benchmark(
+                layout, total_rows, batch_size
+            )
+            self.stdout.write(
+                f"{layout:<12} {rows_per_sec:>10,.0f} {logs_size / 1024 / 1024:>7.1f} MB"
+                f" {header_sets_size / 1024 / 1024:>9.1f} MB"
+                f" {(logs_size + header_sets_size) / 1024 / 1024:>7.1f} MB"
+            )
+
+    @staticmethod
+    def escape(value: str) -> str:
+        return value.replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n")
+
+    def generate_batch(
+        self, layout: str, start: int, size: int, header_sets: dict
+    ) -> io.StringIO:
+        buffer = io.StringIO()
+        now = datetime.datetime.now(tz=datetime.UTC)
+        for i in range(start, start + size):
+            request_headers, response_headers = generate_headers(i, now)
+            if layout == "json":
+                headers = [
+                    self.escape(json.dumps(request_headers)),
+                    self.escape(json.dumps(response_headers)),
+                ]
+            else:
+                headers = [
+                    str(header_set_id) if header_set_id is not None else r"\N"
+                    for header_set_id in (
+                        add_header_set(header_sets, request_headers),
+                        add_header_set(header_sets, response_headers),
+                    )
+                ]
+            values = [
+                str(generate_log_id()),
+                (now + datetime.timedelta(milliseconds=i)).isoformat(),
+                "srv_dkr_benchmark",
+                "dpl_dkr_benchmark",
+                "GET",
+                "200",
+                str(i % 500),
+                "benchmark.zaneops.local",
+                f"/api/items/{i % 1_000}",
+                "10.0.0.2",
+                *headers,
+            ]
+            buffer.write("\t".join(values) + "\n")
+        buffer.seek(0)
+        return buffer
+
+    def run_benchmark(
+        self, layout: str, total_rows: int, batch_size: int
+    ) -> tuple[float, int, int]:
+        table = (
+            "benchmark_http_log_json"
+            if layout == "json"
+            else "benchmark_http_log_header_sets"
+        )
+        header_columns = (
+            '"request_headers", "response_headers"'
+            if layout == "json"
+            else '"request_header_set_id", "response_header_set_id"'
+        )
+        columns = (
+            '"id", "time", "service_id", "deployment_id", "request_method", "status", "request_duration_ms",'
+            f' "request_host", "request_uri", "request_ip", {header_columns}'
+        )
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(LAYOUTS[layout])
+            cursor.execute(HEADER_SET_TABLE)
+
+            # same path as the ingestion: `COPY` into a staging table, then `INSERT ... SELECT`
+            staging_table = f"{table}_staging"
+            cursor.execute(
+                f'CREATE TEMPORARY TABLE "{staging_table}" (LIKE "{table}" INCLUDING DEFAULTS)'
+            )
+            raw_cursor = cursor.cursor
+            sql = f'COPY "{staging_table}" ({columns}) FROM STDIN'
+            start_time = time.perf_counter()
+            for start in range(0, total_rows, batch_size):
+                # the header sets are generated with the batch, as they are at ingest
+                header_sets = {}
+                batch = self.generate_batch(
+                    layout, start, min(batch_size, total_rows - start), header_sets
+                )
+                if hasattr(raw_cursor, "copy_expert"):
+                    raw_cursor.copy_expert(sql, batch)
+                else:
+                    with raw_cursor.copy(sql) as copy:
+                        copy.write(batch.getvalue())
+                if len(header_sets) > 0:
+                    cursor.executemany(
+                        'INSERT INTO "benchmark_http_header_set" ("id", "headers") VALUES (%s, %s) '
+                        "ON CONFLICT DO NOTHING",
+                        [
+                            (header_set_id, json.dumps(headers))
+                            for header_set_id, headers in header_sets.items()
+                        ],
+                    )
+                cursor.execute(
+                    f'INSERT INTO "{table}" ({columns}) SELECT {columns} FROM "{staging_table}"'
+                )
+                cursor.execute(f'TRUNCATE "{staging_table}"')
+            elapsed = time.perf_counter() - start_time
+
+            cursor.execute(
+                "SELECT pg_total_relation_size(%s), pg_total_relation_size(%s)",
+                [table, "benchmark_http_header_set"],
+            )
+            logs_size, header_sets_size = cursor.fetchone()
+            transaction.set_rollback(True)
+        return total_rows / elapsed, logs_size, header_sets_size
@@ -0,0 +1,219 @@
+import datetime
+import io
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from ...utils import generate_log_id
+
+BENCHMARK_TABLE = "benchmark_log_indexes"
+# the indexes of `SimpleLog` before & after the BRIN index on `time` (the search & unique indexes are the same in both)
+INDEX_SETS = {
+    "btree": (
+        '("deployment_id")',
+        '("service_id")',
+        '("source")',
+        '("level")',
+        '("time")',
+        '("deployment_id", "time", "id")',
+        '("service_id", "time", "id")',
+    ),
+    "brin": (
+        'USING brin ("time") WITH (autosummarize = on)',
+        '("deployment_id", "time", "id")',
+        '("service_id", "time", "id")',
+    ),
+}
+# the queries run on the log table (see `LogCursorPagination`, `log_archive` & `log_retention`)
+QUERIES = {
+    "deployment page": f"""
+        SELECT * FROM "{BENCHMARK_TABLE}" WHERE "deployment_id" = %(deployment_id)s
+        ORDER BY "time" DESC, "id" DESC LIMIT 50
+    """,
+    "deployment errors page": f"""
+        SELECT * FROM "{BENCHMARK_TABLE}" WHERE "deployment_id" = %(deployment_id)s AND "level" = 0
+        ORDER BY "time" DESC, "id" DESC LIMIT 50
+    """,
+    "service hour": f"""
+        SELECT count(*) FROM "{BENCHMARK_TABLE}" WHERE "service_id" = %(service_id)s
+        AND "time" >= %(hour_start)s AND "time" < %(hour_end)s
+    """,
+    "all services hour": f"""
+        SELECT "service_id", count(*) FROM "{BENCHMARK_TABLE}"
+        WHERE "time" >= %(hour_start)s AND "time" < %(hour_end)s GROUP BY "service_id"
+    """,
+}
+
+
+def get_log_time(start_time: datetime.datetime, position: int) -> datetime.datetime:
+    # 10 lines per second
+    return start_time + datetime.timedelta(milliseconds=position * 100)
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the insert rate, the size of the indexes and the query times of the log table "
+        "with the B-tree indexes and with the BRIN index on `time`, the tables are temporary and dropped at the end."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=500_000)
+        parser.add_argument("--batch-size", type=int, default=1_000)
+        parser.add_argument("--services", type=int, default=20)
+        parser.add_argument("--query-runs", type=int, default=20)
+
+    def handle(self, *args, **options):
+        total_rows: int = options["rows"]
+        batch_size: int = options["batch_size"]
+        services: int = options["services"]
+        query_runs: int = options["query_runs"]
+
+        self.stdout.write(
+            f"Inserting {total_rows} rows of {services} services in batches of {batch_size},"
+            f" median of {query_runs} runs per query\n"
+        )
+        results = {
+            name: self.run_benchmark(
+                indexes, total_rows, batch_size, services, query_runs
+            )
+            for name, indexes in INDEX_SETS.items()
+        }
+
+        self.stdout.write(f"{'':<30}" + "".join(f"{name:>12}" for name in results))
+        rows = [
+            ("rows/sec", "{:,.0f}", "rows_per_sec"),
+            ("indexes size (MB)", "{:.1f}", "indexes_size"),
+            *((f"{query} (ms)", "{:.2f}", query) for query in QUERIES),
+        ]
+        for label, value_format, key in rows:
+            self.stdout.write(
+                f"{label:<30}"
+                + "".join(
+                    f"{value_format.format(result[key]):>12}"
+                    for result in results.values()
+                )
+            )
+
+    @staticmethod
+    def generate_batch(
+        start: int,
+        size: int,
+        total_rows: int,
+        services: int,
+        start_time: datetime.datetime,
+    ) -> io.StringIO:
+        buffer = io.StringIO()
+        for i in range(start, start + size):
+            service = i % services
+            # two deployments per service, the logs of the first one are older
+            deployment = f"{service}-{0 if i < total_rows // 2 else 1}"
+            buffer.write(
+                "\t".join(
+                    [
+                        str(generate_log_id()),
+                        get_log_time(start_time, i).isoformat(),
+                        f"srv_dkr_{service}",
+                        f"dpl_dkr_{deployment}",
+                        f"1:M * Benchmark line #{i}",
+                        "0" if i % 20 == 0 else "1",
+                        "2",
+                    ]
+                )
+                + "\n"
+            )
+        buffer.seek(0)
+        return buffer
+
+    def run_benchmark(
+        self,
+        indexes: tuple[str, ...],
+        total_rows: int,
+        batch_size: int,
+        services: int,
+        query_runs: int,
+    ) -> dict[str, float]:
+        start_time = datetime.datetime(2024, 7, 1, tzinfo=datetime.UTC)
+        columns = (
+            '"id", "time", "service_id", "deployment_id", "content", "level", "source"'
+        )
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                CREATE TEMPORARY TABLE "{BENCHMARK_TABLE}" (
+                    "id" uuid NOT NULL,
+                    "created_at" timestamptz NOT NULL DEFAULT now(),
+                    "time" timestamptz NOT NULL,
+                    "service_id" varchar NULL,
+                    "deployment_id" varchar NULL,
+                    "content" text NULL,
+                    "level" smallint NOT NULL,
+                    "source" smallint NOT NULL,
+                    PRIMARY KEY ("id", "time")
+                )
+                """
+            )
+            for position, index_sql in enumerate(indexes):
+                cursor.execute(
+                    f'CREATE INDEX "{BENCHMARK_TABLE}_{position}_idx" ON "{BENCHMARK_TABLE}" {index_sql}'
+                )
+            batches = [
+                self.generate_batch(
+                    start,
+                    min(batch_size, total_rows - start),
+                    total_rows,
+                    services,
+                    start_time,
+                )
+                for start in range(0, total_rows, batch_size)
+            ]
+
+            # same path as the ingestion: `COPY` into a staging table, then `INSERT ... SELECT`
+            staging_table = f"{BENCHMARK_TABLE}_staging"
+            cursor.execute(
+                f'CREATE TEMPORARY TABLE "{staging_table}" (LIKE "{BENCHMARK_TABLE}" INCLUDING DEFAULTS)'
+            )
+            raw_cursor = cursor.cursor
+            sql = f'COPY "{staging_table}" ({columns}) FROM STDIN'
+            insert_start = time.perf_counter()
+            for batch in batches:
+                if hasattr(raw_cursor, "copy_expert"):
+                    raw_cursor.copy_expert(sql, batch)
+                else:
+                    with raw_cursor.copy(sql) as copy:
+                        copy.write(batch.getvalue())
+                cursor.execute(
+                    f'INSERT INTO "{BENCHMARK_TABLE}" ({columns}) SELECT {columns} FROM "{staging_table}"'
+                )
+                cursor.execute(f'TRUNCATE "{staging_table}"')
+            result = {"rows_per_sec": total_rows / (time.perf_counter() - insert_start)}
+
+            # what autovacuum does on the log tables (it never processes temporary tables)
+            for position, index_sql in enumerate(indexes):
+                if "brin" in index_sql:
+                    cursor.execute(
+                        "SELECT brin_summarize_new_values(%s::regclass)",
+                        [f"{BENCHMARK_TABLE}_{position}_idx"],
+                    )
+            cursor.execute(f'ANALYZE "{BENCHMARK_TABLE}"')
+            cursor.execute("SELECT pg_indexes_size(%s)", [BENCHMARK_TABLE])
+            result["indexes_size"] = cursor.fetchone()[0] / 1024 / 1024
+
+            middle = get_log_time(start_time, total_rows // 2)
+            params = {
+                "deployment_id": "dpl_dkr_1-0",
+                "service_id": "srv_dkr_1",
+                "hour_start": middle,
+                "hour_end": middle + datetime.timedelta(hours=1),
+            }
+            for name, query in QUERIES.items():
+                durations = []
+                for _ in range(query_runs):
+                    query_start = time.perf_counter()
+                    cursor.execute(query, params)
+                    cursor.fetchall()
+                    durations.append((time.perf_counter() - query_start) * 1000)
+                result[name] = statistics.median(durations)
+            transaction.set_rollback(True)
+        return result
@@ -0,0 +1,70 @@
+import datetime
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from ...log_ingestion import write_logs, copy_is_available
+from ...models import SimpleLog
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the throughput (rows/sec) and peak memory of the log writers "
+        "(`COPY FROM STDIN` vs `bulk_create`), every write is rolled back at the end."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=50_000)
+        parser.add_argument("--batch-size", type=int, default=1_000)
+
+    def handle(self, *args, **options):
+        total_rows: int = options["rows"]
+        batch_size: int = options["batch_size"]
+
+        paths = [("bulk_create", False)]
+        if copy_is_available():
+            paths.insert(0, ("copy", True))
+
+        self.stdout.write(
+            f"Inserting {total_rows} SimpleLog rows in batches of {batch_size}\n"
+        )
+        self.stdout.write(f"{'writer':<12} {'rows/sec':>12} {'peak memory':>14}")
+        for name, use_copy in paths:
+            rows_per_sec, peak_memory = self.run_benchmark(
+                total_rows, batch_size, use_copy
+            )
+            self.stdout.write(
+                f"{name:<12} {rows_per_sec:>12,.0f} {peak_memory / 1024 / 1024:>11.2f} MB"
+            )
+
+    @staticmethod
+    def generate_batch(start: int, size: int) -> list[dict]:
+        now = datetime.datetime.now(tz=datetime.UTC)
+        return [
+            dict(
+                source=SimpleLog.LogSource.SERVICE,
+                level=SimpleLog.LogLevel.INFO,
+                content=f"1:M {now.isoformat()} * Benchmark line #{start + i}\twith a tab",
+                time=now,
+                deployment_id="dpl_dkr_benchmark",
+                service_id="srv_dkr_benchmark",
+            )
+            for i in range(size)
+        ]
+
+    def run_benchmark(
+        self, total_rows: int, batch_size: int, use_copy: bool
+    ) -> tuple[float, int]:
+        tracemalloc.start()
+        start_time = time.perf_counter()
+        with transaction.atomic():
+            for start in range(0, total_rows, batch_size):
+                batch = self.generate_batch(start, min(batch_size, total_rows - start))
+                write_logs(SimpleLog, batch, use_copy=use_copy)
+            elapsed = time.perf_counter() - start_time
+            transaction.set_rollback(True)
+        _, peak_memory = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return total_rows / elapsed, peak_memory
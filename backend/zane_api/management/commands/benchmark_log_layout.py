@@ -0,0 +1,183 @@
+import datetime
+import io
+import json
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from ...utils import generate_log_id
+
+# the `SimpleLog` table before (random ids, jsonb content, text level & source) and after the compact layout,
+# with the same indexes as the log table
+LAYOUTS = {
+    "legacy": """
+        CREATE TEMPORARY TABLE "benchmark_log_legacy" (
+            "id" uuid PRIMARY KEY,
+            "created_at" timestamptz NOT NULL DEFAULT now(),
+            "service_id" varchar NULL,
+            "deployment_id" varchar NULL,
+            "time" timestamptz NOT NULL,
+            "content" jsonb NULL,
+            "content_search_vector" tsvector GENERATED ALWAYS AS (
+                to_tsvector('simple', COALESCE("content"::text, ''))
+            ) STORED,
+            "level" varchar(10) NOT NULL,
+            "source" varchar(10) NOT NULL
+        )
+    """,
+    "compact": """
+        CREATE TEMPORARY TABLE "benchmark_log_compact" (
+            "id" uuid PRIMARY KEY,
+            "created_at" timestamptz NOT NULL DEFAULT now(),
+            "service_id" varchar NULL,
+            "deployment_id" varchar NULL,
+            "time" timestamptz NOT NULL,
+            "content" text NULL,
+            "content_json" jsonb NULL,
+            "content_search_vector" tsvector GENERATED ALWAYS AS (
+                to_tsvector('simple', COALESCE("content", '') || ' ' || COALESCE("content_json"::text, ''))
+            ) STORED,
+            "level" smallint NOT NULL,
+            "source" smallint NOT NULL
+        )
+    """,
+}
+LAYOUT_INDEXES = (
+    '("deployment_id")',
+    '("service_id")',
+    '("source")',
+    '("level")',
+    '("time")',
+    '("deployment_id", "time", "id")',
+    '("service_id", "time", "id")',
+    'USING gin ("content_search_vector")',
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the insert rate (rows/sec) and the size of the `SimpleLog` table "
+        "in its legacy & compact layouts, the tables are temporary and dropped at the end."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=200_000)
+        parser.add_argument("--batch-size", type=int, default=1_000)
+        parser.add_argument(
+            "--json-ratio",
+            type=float,
+            default=0.1,
+            help="Share of the lines which are JSON objects",
+        )
+
+    def handle(self, *args, **options):
+        total_rows: int = options["rows"]
+        batch_size: int = options["batch_size"]
+        json_ratio: float = options["json_ratio"]
+
+        self.stdout.write(
+            f"Inserting {total_rows} rows in batches of {batch_size} ({json_ratio:.0%} of JSON lines)\n"
+        )
+        self.stdout.write(
+            f"{'layout':<10} {'rows/sec':>10} {'table':>10} {'indexes':>10} {'total':>10}"
+        )
+        for layout in LAYOUTS:
+            rows_per_sec, table_size, indexes_size = self.run_benchmark(
+                layout, total_rows, batch_size, json_ratio
+            )
+            self.stdout.write(
+                f"{layout:<10} {rows_per_sec:>10,.0f} {table_size / 1024 / 1024:>7.1f} MB"
+                f" {indexes_size / 1024 / 1024:>7.1f} MB"
+                f" {(table_size + indexes_size) / 1024 / 1024:>7.1f} MB"
+            )
+
+    @staticmethod
+    def generate_batch(
+        layout: str, start: int, size: int, json_ratio: float
+    ) -> io.StringIO:
+        buffer = io.StringIO()
+        now = datetime.datetime.now(tz=datetime.UTC)
+        json_every = round(1 / json_ratio) if json_ratio > 0 else 0
+        for i in range(start, start + size):
+            is_json = json_every > 0 and i % json_every == 0
+            if is_json:
+                line = json.dumps(
+                    {"level": "info", "msg": f"handled request #{i}", "status": 200}
+                )
+            else:
+                line = f"1:M {now.isoformat()} * Benchmark line #{i}"
+            level, source = ("ERROR", "SERVICE") if i % 10 == 0 else ("INFO", "SERVICE")
+            log_time = (now + datetime.timedelta(microseconds=i)).isoformat()
+            if layout == "legacy":
+                values = [
+                    str(uuid.uuid4()),
+                    log_time,
+                    line if is_json else json.dumps(line),
+                    level,
+                    source,
+                ]
+            else:
+                values = [
+                    str(generate_log_id()),
+                    log_time,
+                    r"\N" if is_json else line,
+                    line if is_json else r"\N",
+                    "0" if level == "ERROR" else "1",
+                    "2",
+                ]
+            buffer.write(
+                "\t".join(["srv_dkr_benchmark", "dpl_dkr_benchmark", *values]) + "\n"
+            )
+        buffer.seek(0)
+        return buffer
+
+    def run_benchmark(
+        self, layout: str, total_rows: int, batch_size: int, json_ratio: float
+    ) -> tuple[float, int, int]:
+        table = f"benchmark_log_{layout}"
+        columns = (
+            '"service_id", "deployment_id", "id", "time", "content", "level", "source"'
+            if layout == "legacy"
+            else '"service_id", "deployment_id", "id", "time", "content", "content_json", "level", "source"'
+        )
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(LAYOUTS[layout])
+            for position, columns_sql in enumerate(LAYOUT_INDEXES):
+                cursor.execute(
+                    f'CREATE INDEX "{table}_{position}_idx" ON "{table}" {columns_sql}'
+                )
+            batches = [
+                self.generate_batch(
+                    layout, start, min(batch_size, total_rows - start), json_ratio
+                )
+                for start in range(0, total_rows, batch_size)
+            ]
+
+            # same path as the ingestion: `COPY` into a staging table, then `INSERT ... SELECT`
+            staging_table = f"{table}_staging"
+            cursor.execute(
+                f'CREATE TEMPORARY TABLE "{staging_table}" (LIKE "{table}" INCLUDING DEFAULTS)'
+            )
+            raw_cursor = cursor.cursor
+            sql = f'COPY "{staging_table}" ({columns}) FROM STDIN'
+            start_time = time.perf_counter()
+            for batch in batches:
+                if hasattr(raw_cursor, "copy_expert"):
+                    raw_cursor.copy_expert(sql, batch)
+                else:
+                    with raw_cursor.copy(sql) as copy:
+                        copy.write(batch.getvalue())
+                cursor.execute(
+                    f'INSERT INTO "{table}" ({columns}) SELECT {columns} FROM "{staging_table}"'
+                )
+                cursor.execute(f'TRUNCATE "{staging_table}"')
+            elapsed = time.perf_counter() - start_time
+
+            cursor.execute(
+                "SELECT pg_table_size(%s), pg_indexes_size(%s)", [table, table]
+            )
+            table_size, indexes_size = cursor.fetchone()
+            transaction.set_rollback(True)
+        return total_rows / elapsed, table_size, indexes_size
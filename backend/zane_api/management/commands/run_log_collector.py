@@ -0,0 +1,55 @@
+import asyncio
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from ...log_collector import LogCollector
+
+
+class Command(BaseCommand):
+    help = (
+        "Run the log collector, receiving container logs with the fluentd Forward protocol "
+        "on a unix socket or a TCP port and writing them to the database in large batches."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--socket",
+            default=settings.LOGS_COLLECTOR_SOCKET,
+            help="Path of the unix socket to listen on, takes precedence over `--host` & `--port`",
+        )
+        parser.add_argument("--host", default="0.0.0.0")
+        parser.add_argument("--port", type=int, default=settings.LOGS_COLLECTOR_PORT)
+        parser.add_argument("--batch-size", type=int, default=5_000)
+        parser.add_argument(
+            "--flush-interval",
+            type=float,
+            default=1.0,
+            help="Maximum time (in seconds) a log waits before being written",
+        )
+        parser.add_argument(
+            "--writers",
+            type=int,
+            default=2,
+            help="Number of concurrent writers, each with its own database connection",
+        )
+
+    def handle(self, *args, **options):
+        socket_path: str | None = options["socket"]
+        if socket_path is not None and os.path.exists(socket_path):
+            # remove the socket left by a previous run
+            os.unlink(socket_path)
+
+        collector = LogCollector(
+            batch_size=options["batch_size"],
+            flush_interval=options["flush_interval"],
+            writers=options["writers"],
+        )
+        listening_on = socket_path or f"{options['host']}:{options['port']}"
+        self.stdout.write(f"Log collector listening on {listening_on}")
+        asyncio.run(
+            collector.serve(
+                socket_path=socket_path, host=options["host"], port=options["port"]
+            )
+        )
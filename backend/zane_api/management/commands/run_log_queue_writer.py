@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from ...log_queue import LogQueueWriter, QUEUE_READ_COUNT
+
+
+class Command(BaseCommand):
+    help = (
+        "Run a writer of the logs queue consumer group, reading the batches queued by `/api/logs/tail` "
+        "(with `LOGS_INGEST_MODE=queue`) and writing them to the database in large transactions."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--consumer",
+            default=None,
+            help="Name of the consumer in the group, must be unique per writer (defaults to the hostname)",
+        )
+        parser.add_argument(
+            "--read-count",
+            type=int,
+            default=QUEUE_READ_COUNT,
+            help="Maximum number of queued batches written in a single transaction",
+        )
+
+    def handle(self, *args, **options):
+        writer = LogQueueWriter(
+            consumer_name=options["consumer"], read_count=options["read_count"]
+        )
+        self.stdout.write(
+            f"Log queue writer `{writer.consumer_name}` reading from `{writer.stream}`"
+        )
+        writer.run()
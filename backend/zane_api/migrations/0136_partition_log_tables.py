@@ -0,0 +1,109 @@
+# Convert the log tables into tables partitioned by day on `time`
+
+from django.db import migrations
+
+LOG_MODELS = ("SimpleLog", "HttpLog")
+
+
+def partition_log_tables(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    quote_name = schema_editor.quote_name
+
+    for model_name in LOG_MODELS:
+        model = apps.get_model("zane_api", model_name)
+        table = model._meta.db_table
+        old_table = f"{table}_unpartitioned"
+
+        # free the index names for the indexes of the partitioned table
+        for index in model._meta.indexes:
+            schema_editor.remove_index(model, index)
+        schema_editor.execute(
+            f"ALTER TABLE {quote_name(table)} RENAME TO {quote_name(old_table)}"
+        )
+        schema_editor.execute(
+            f"ALTER TABLE {quote_name(old_table)} "
+            f"RENAME CONSTRAINT {quote_name(f'{table}_pkey')} TO {quote_name(f'{old_table}_pkey')}"
+        )
+
+        # the partition key has to be part of the primary key
+        schema_editor.execute(
+            f"CREATE TABLE {quote_name(table)} "
+            f"(LIKE {quote_name(old_table)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS) "
+            f'PARTITION BY RANGE ("time")'
+        )
+        schema_editor.execute(
+            f"ALTER TABLE {quote_name(table)} "
+            f'ADD CONSTRAINT {quote_name(f"{table}_pkey")} PRIMARY KEY ("id", "time")'
+        )
+        schema_editor.execute(
+            f"CREATE TABLE {quote_name(f'{table}_default')} PARTITION OF {quote_name(table)} DEFAULT"
+        )
+        for index in model._meta.indexes:
+            schema_editor.add_index(model, index)
+
+        # one partition per day of the existing logs, so that they do not end up in the default partition
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute(
+                f"""SELECT DISTINCT (date_trunc('day', "time" AT TIME ZONE 'UTC'))::date
+                FROM {quote_name(old_table)}"""
+            )
+            days = [day for (day,) in cursor.fetchall()]
+        for day in days:
+            next_day = day.fromordinal(day.toordinal() + 1)
+            schema_editor.execute(
+                f"CREATE TABLE {quote_name(f'{table}_{day:%Y%m%d}')} PARTITION OF {quote_name(table)} "
+                f"FOR VALUES FROM ('{day.isoformat()} 00:00:00+00') TO ('{next_day.isoformat()} 00:00:00+00')"
+            )
+
+        schema_editor.execute(
+            f"INSERT INTO {quote_name(table)} SELECT * FROM {quote_name(old_table)}"
+        )
+        schema_editor.execute(f"DROP TABLE {quote_name(old_table)}")
+
+
+def unpartition_log_tables(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    quote_name = schema_editor.quote_name
+
+    for model_name in LOG_MODELS:
+        model = apps.get_model("zane_api", model_name)
+        table = model._meta.db_table
+        partitioned_table = f"{table}_partitioned"
+
+        for index in model._meta.indexes:
+            schema_editor.remove_index(model, index)
+        schema_editor.execute(
+            f"ALTER TABLE {quote_name(table)} RENAME TO {quote_name(partitioned_table)}"
+        )
+        schema_editor.execute(
+            f"ALTER TABLE {quote_name(partitioned_table)} "
+            f"RENAME CONSTRAINT {quote_name(f'{table}_pkey')} TO {quote_name(f'{partitioned_table}_pkey')}"
+        )
+        schema_editor.execute(
+            f"CREATE TABLE {quote_name(table)} "
+            f"(LIKE {quote_name(partitioned_table)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+        )
+        schema_editor.execute(
+            f"ALTER TABLE {quote_name(table)} "
+            f'ADD CONSTRAINT {quote_name(f"{table}_pkey")} PRIMARY KEY ("id")'
+        )
+        for index in model._meta.indexes:
+            schema_editor.add_index(model, index)
+        schema_editor.execute(
+            f"INSERT INTO {quote_name(table)} SELECT * FROM {quote_name(partitioned_table)}"
+        )
+        # dropping the partitioned table also drops all its partitions
+        schema_editor.execute(f"DROP TABLE {quote_name(partitioned_table)}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("zane_api", "0135_alter_httplog_options_alter_simplelog_options"),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_log_tables, unpartition_log_tables),
+    ]
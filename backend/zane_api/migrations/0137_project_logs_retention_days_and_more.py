@@ -0,0 +1,23 @@
+# Generated by Django 5.0.4 on 2026-10-17 07:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("zane_api", "0136_partition_log_tables"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="dockerregistryservice",
+            name="logs_retention_days",
+            field=models.PositiveIntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name="project",
+            name="logs_retention_days",
+            field=models.PositiveIntegerField(null=True),
+        ),
+    ]
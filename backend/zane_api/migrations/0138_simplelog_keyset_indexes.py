@@ -0,0 +1,27 @@
+# Generated by Django 5.0.4 on 2026-10-17 07:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("zane_api", "0137_project_logs_retention_days_and_more"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="simplelog",
+            index=models.Index(
+                fields=["deployment_id", "time", "id"],
+                name="zane_api_si_deploym_077490_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="simplelog",
+            index=models.Index(
+                fields=["service_id", "time", "id"],
+                name="zane_api_si_service_97343c_idx",
+            ),
+        ),
+    ]
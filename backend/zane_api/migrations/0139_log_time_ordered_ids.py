@@ -0,0 +1,34 @@
+# Generated by Django 5.0.4 on 2026-10-17 07:14
+
+import zane_api.utils
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("zane_api", "0138_simplelog_keyset_indexes"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="httplog",
+            name="id",
+            field=models.UUIDField(
+                default=zane_api.utils.generate_log_id,
+                editable=False,
+                primary_key=True,
+                serialize=False,
+            ),
+        ),
+        migrations.AlterField(
+            model_name="simplelog",
+            name="id",
+            field=models.UUIDField(
+                default=zane_api.utils.generate_log_id,
+                editable=False,
+                primary_key=True,
+                serialize=False,
+            ),
+        ),
+    ]
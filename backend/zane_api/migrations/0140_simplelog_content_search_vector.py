@@ -0,0 +1,32 @@
+# Generated by Django 5.0.4 on 2026-10-17 07:20
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("zane_api", "0139_log_time_ordered_ids"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="simplelog",
+            name="content_search_vector",
+            field=models.GeneratedField(
+                db_persist=True,
+                expression=django.contrib.postgres.search.SearchVector(
+                    "content", config="simple"
+                ),
+                output_field=django.contrib.postgres.search.SearchVectorField(),
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="simplelog",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["content_search_vector"], name="zane_api_si_content_050a2e_gin"
+            ),
+        ),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 5.0.4 on 2026-10-17 07:46
+
+import django.contrib.postgres.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("zane_api", "0140_simplelog_content_search_vector"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="HttpLogRollup",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("deployment_id", models.CharField(max_length=255)),
+                ("service_id", models.CharField(max_length=255, null=True)),
+                ("minute", models.DateTimeField()),
+                (
+                    "request_path",
+                    models.CharField(blank=True, default="", max_length=255),
+                ),
+                ("request_count", models.PositiveBigIntegerField(default=0)),
+                ("status_1xx_count", models.PositiveBigIntegerField(default=0)),
+                ("status_2xx_count", models.PositiveBigIntegerField(default=0)),
+                ("status_3xx_count", models.PositiveBigIntegerField(default=0)),
+                ("status_4xx_count", models.PositiveBigIntegerField(default=0)),
+                ("status_5xx_count", models.PositiveBigIntegerField(default=0)),
+                ("duration_sum_ms", models.PositiveBigIntegerField(default=0)),
+                ("duration_max_ms", models.PositiveBigIntegerField(default=0)),
+                (
+                    "duration_histogram",
+                    django.contrib.postgres.fields.ArrayField(
+                        base_field=models.PositiveBigIntegerField(), size=None
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["service_id", "request_path", "minute"],
+                        name="zane_api_ht_service_3a85c6_idx",
+                    ),
+                    models.Index(
+                        fields=["minute"], name="zane_api_ht_minute_3a080f_idx"
+                    ),
+                ],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="httplogrollup",
+            constraint=models.UniqueConstraint(
+                fields=("deployment_id", "request_path", "minute"),
+                name="unique_http_log_rollup_per_minute",
+            ),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.0.4 on 2026-10-17 08:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("zane_api", "0141_httplogrollup"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="httplog",
+            name="dedupe_key",
+            field=models.UUIDField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="simplelog",
+            name="dedupe_key",
+            field=models.UUIDField(editable=False, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name="httplog",
+            constraint=models.UniqueConstraint(
+                fields=("dedupe_key", "time"), name="unique_httplog_dedupe_key"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="simplelog",
+            constraint=models.UniqueConstraint(
+                fields=("dedupe_key", "time"), name="unique_simplelog_dedupe_key"
+            ),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.0.4 on 2026-10-17 08:07
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("zane_api", "0142_log_dedupe_keys"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="dockerregistryservice",
+            name="logs_overflow_sample_rate",
+            field=models.FloatField(
+                default=0.0,
+                validators=[
+                    django.core.validators.MinValueValidator(0.0),
+                    django.core.validators.MaxValueValidator(1.0),
+                ],
+            ),
+        ),
+        migrations.AddField(
+            model_name="dockerregistryservice",
+            name="logs_rate_limit",
+            field=models.PositiveIntegerField(null=True),
+        ),
+    ]
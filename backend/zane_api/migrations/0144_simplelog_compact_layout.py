@@ -0,0 +1,112 @@
+# Compact layout of `SimpleLog`: text content with the JSON lines in their own column,
+# `level` & `source` stored as `smallint` codes
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+import zane_api.models.base
+from django.db import migrations, models
+
+LEVELS = ("ERROR", "INFO")
+SOURCES = ("SYSTEM", "PROXY", "SERVICE")
+
+
+def to_code(column: str, values: tuple[str, ...]) -> str:
+    cases = " ".join(f"WHEN '{value}' THEN {code}" for code, value in enumerate(values))
+    return f'CASE "{column}" {cases} END'
+
+
+def from_code(column: str, values: tuple[str, ...]) -> str:
+    cases = " ".join(f"WHEN {code} THEN '{value}'" for code, value in enumerate(values))
+    return f'CASE "{column}" {cases} END'
+
+
+# a single `ALTER TABLE` rewrites the table (and its partitions) once,
+# all the `USING` expressions are evaluated on the rows before the change
+COMPACT_LAYOUT_SQL = f"""
+ALTER TABLE "zane_api_simplelog"
+    ALTER COLUMN "content_json" TYPE jsonb
+        USING (CASE WHEN jsonb_typeof("content") NOT IN ('string', 'null') THEN "content" END),
+    ALTER COLUMN "content" TYPE text
+        USING (CASE WHEN jsonb_typeof("content") = 'string' THEN "content" #>> '{{}}' END),
+    ALTER COLUMN "level" TYPE smallint USING ({to_code("level", LEVELS)}),
+    ALTER COLUMN "source" TYPE smallint USING ({to_code("source", SOURCES)})
+"""
+
+LEGACY_LAYOUT_SQL = f"""
+ALTER TABLE "zane_api_simplelog"
+    ALTER COLUMN "content" TYPE jsonb USING (COALESCE("content_json", to_jsonb("content"))),
+    ALTER COLUMN "level" TYPE varchar(10) USING ({from_code("level", LEVELS)}),
+    ALTER COLUMN "source" TYPE varchar(10) USING ({from_code("source", SOURCES)})
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("zane_api", "0143_dockerregistryservice_logs_rate_limit"),
+    ]
+
+    operations = [
+        # the search vector is generated from `content`, whose type cannot change while it is used
+        migrations.RemoveIndex(
+            model_name="simplelog",
+            name="zane_api_si_content_050a2e_gin",
+        ),
+        migrations.RemoveField(
+            model_name="simplelog",
+            name="content_search_vector",
+        ),
+        migrations.AddField(
+            model_name="simplelog",
+            name="content_json",
+            field=models.JSONField(null=True),
+        ),
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunSQL(COMPACT_LAYOUT_SQL, LEGACY_LAYOUT_SQL),
+            ],
+            state_operations=[
+                migrations.AlterField(
+                    model_name="simplelog",
+                    name="content",
+                    field=models.TextField(null=True),
+                ),
+                migrations.AlterField(
+                    model_name="simplelog",
+                    name="level",
+                    field=zane_api.models.base.SmallChoiceField(
+                        choices=[("ERROR", "Error"), ("INFO", "Info")], default="INFO"
+                    ),
+                ),
+                migrations.AlterField(
+                    model_name="simplelog",
+                    name="source",
+                    field=zane_api.models.base.SmallChoiceField(
+                        choices=[
+                            ("SYSTEM", "System Logs"),
+                            ("PROXY", "Proxy Logs"),
+                            ("SERVICE", "Service Logs"),
+                        ],
+                        default="SERVICE",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddField(
+            model_name="simplelog",
+            name="content_search_vector",
+            field=models.GeneratedField(
+                db_persist=True,
+                expression=django.contrib.postgres.search.SearchVector(
+                    "content", "content_json", config="simple"
+                ),
+                output_field=django.contrib.postgres.search.SearchVectorField(),
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="simplelog",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["content_search_vector"], name="zane_api_si_content_050a2e_gin"
+            ),
+        ),
+    ]
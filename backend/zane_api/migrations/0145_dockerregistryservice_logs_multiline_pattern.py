@@ -0,0 +1,24 @@
+# Generated by Django 5.0.4 on 2026-10-17 08:36
+
+import zane_api.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("zane_api", "0144_simplelog_compact_layout"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="dockerregistryservice",
+            name="logs_multiline_pattern",
+            field=models.CharField(
+                blank=True,
+                max_length=255,
+                null=True,
+                validators=[zane_api.validators.validate_regex],
+            ),
+        ),
+    ]
@@ -0,0 +1,82 @@
+# Generated by Django 5.0.4 on 2026-10-17 08:46
+
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("zane_api", "0145_dockerregistryservice_logs_multiline_pattern"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="httplog",
+            name="zane_api_ht_service_7e2352_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="httplog",
+            name="zane_api_ht_status_28ab6e_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="httplog",
+            name="zane_api_ht_request_3f1f93_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="httplog",
+            name="zane_api_ht_request_56a459_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="httplog",
+            name="zane_api_ht_deploym_d671e6_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="httplog",
+            name="zane_api_ht_time_b680fd_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="simplelog",
+            name="zane_api_si_source_bba065_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="simplelog",
+            name="zane_api_si_service_d393fd_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="simplelog",
+            name="zane_api_si_deploym_ae4569_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="simplelog",
+            name="zane_api_si_level_c2fb11_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="simplelog",
+            name="zane_api_si_time_f4e15d_idx",
+        ),
+        migrations.AddIndex(
+            model_name="httplog",
+            index=django.contrib.postgres.indexes.BrinIndex(
+                autosummarize=True, fields=["time"], name="zane_api_ht_time_6f1195_brin"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="httplog",
+            index=models.Index(
+                fields=["deployment_id", "time"], name="zane_api_ht_deploym_a13348_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="httplog",
+            index=models.Index(
+                fields=["service_id", "time"], name="zane_api_ht_service_378390_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="simplelog",
+            index=django.contrib.postgres.indexes.BrinIndex(
+                autosummarize=True, fields=["time"], name="zane_api_si_time_2825a0_brin"
+            ),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.0.4 on 2026-10-17 08:55
+
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("zane_api", "0146_log_tables_brin_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="simplelog",
+            name="content_blob_id",
+            field=models.UUIDField(null=True),
+        ),
+        migrations.CreateModel(
+            name="SimpleLogBlob",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(editable=False, primary_key=True, serialize=False),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("service_id", models.CharField(null=True)),
+                ("deployment_id", models.CharField(null=True)),
+                ("time", models.DateTimeField()),
+                ("length", models.PositiveIntegerField()),
+                ("content", models.BinaryField()),
+            ],
+            options={
+                "indexes": [
+                    django.contrib.postgres.indexes.BrinIndex(
+                        autosummarize=True,
+                        fields=["time"],
+                        name="zane_api_si_time_17a622_brin",
+                    ),
+                    models.Index(
+                        fields=["service_id", "time"],
+                        name="zane_api_si_service_f7e808_idx",
+                    ),
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,96 @@
+# Generated by Django 5.0.4 on 2026-10-17 09:01
+
+import django.contrib.postgres.fields
+import zane_api.utils
+import zane_api.validators
+from django.db import migrations, models
+
+
+def partition_simplelog_field_table(apps, schema_editor):
+    """
+    Same layout as the log tables (see `0136_partition_log_tables`): partitioned by day on `time`,
+    the daily partitions are created by the `create_log_partitions_ahead` task.
+    """
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    quote_name = schema_editor.quote_name
+    model = apps.get_model("zane_api", "SimpleLogField")
+    table = model._meta.db_table
+    old_table = f"{table}_unpartitioned"
+
+    # the indexes of `CreateModel` are only created at the end of the migration, on the partitioned table
+    schema_editor.execute(
+        f"ALTER TABLE {quote_name(table)} RENAME TO {quote_name(old_table)}"
+    )
+    schema_editor.execute(
+        f"ALTER TABLE {quote_name(old_table)} "
+        f"RENAME CONSTRAINT {quote_name(f'{table}_pkey')} TO {quote_name(f'{old_table}_pkey')}"
+    )
+    schema_editor.execute(
+        f"CREATE TABLE {quote_name(table)} "
+        f"(LIKE {quote_name(old_table)} INCLUDING DEFAULTS) "
+        f'PARTITION BY RANGE ("time")'
+    )
+    schema_editor.execute(
+        f"ALTER TABLE {quote_name(table)} "
+        f'ADD CONSTRAINT {quote_name(f"{table}_pkey")} PRIMARY KEY ("id", "time")'
+    )
+    schema_editor.execute(
+        f"CREATE TABLE {quote_name(f'{table}_default')} PARTITION OF {quote_name(table)} DEFAULT"
+    )
+    # the table was just created, it has no rows to move
+    schema_editor.execute(f"DROP TABLE {quote_name(old_table)}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("zane_api", "0147_simplelog_content_blobs"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="dockerregistryservice",
+            name="logs_extracted_fields",
+            field=django.contrib.postgres.fields.ArrayField(
+                base_field=models.CharField(
+                    max_length=255,
+                    validators=[zane_api.validators.validate_json_field_path],
+                ),
+                blank=True,
+                default=list,
+                size=None,
+            ),
+        ),
+        migrations.CreateModel(
+            name="SimpleLogField",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=zane_api.utils.generate_log_id,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                ("log_id", models.UUIDField()),
+                ("service_id", models.CharField()),
+                ("time", models.DateTimeField()),
+                ("name", models.CharField(max_length=255)),
+                ("value", models.CharField(max_length=255)),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["service_id", "name", "value", "time"],
+                        name="zane_api_si_service_ec0c51_idx",
+                    )
+                ],
+            },
+        ),
+        # dropping the partitioned table (when unapplying `CreateModel`) also drops its partitions
+        migrations.RunPython(
+            partition_simplelog_field_table, migrations.RunPython.noop
+        ),
+    ]
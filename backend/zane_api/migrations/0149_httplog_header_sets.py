@@ -0,0 +1,139 @@
+# Generated by Django 5.0.4 on 2026-10-17 09:13
+
+import hashlib
+import json
+import uuid
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils import timezone
+
+HEADER_FIELDS = (
+    ("request_headers", "request_header_set_id"),
+    ("response_headers", "response_header_set_id"),
+)
+BATCH_SIZE = 1_000
+
+
+def get_header_set_id(headers: dict) -> uuid.UUID:
+    # same as `log_headers.get_header_set_id`
+    content = json.dumps(headers, sort_keys=True, separators=(",", ":"))
+    return uuid.UUID(bytes=hashlib.sha256(content.encode()).digest()[:16])
+
+
+def move_headers_to_header_sets(apps, schema_editor):
+    """
+    The headers of the existing logs are moved as they are, the allowlist only applies to the new logs.
+    """
+    HttpLog = apps.get_model("zane_api", "HttpLog")
+    HttpHeaderSet = apps.get_model("zane_api", "HttpHeaderSet")
+    quote_name = schema_editor.quote_name
+    log_table = quote_name(HttpLog._meta.db_table)
+    header_set_table = quote_name(HttpHeaderSet._meta.db_table)
+    now = timezone.now()
+
+    for headers_column, header_set_column in HEADER_FIELDS:
+        distinct_headers = (
+            HttpLog.objects.exclude(**{headers_column: {}})
+            .order_by()
+            .values_list(headers_column, flat=True)
+            .distinct()
+        )
+        batch = []
+        for headers in distinct_headers.iterator(chunk_size=BATCH_SIZE):
+            batch.append(
+                HttpHeaderSet(
+                    id=get_header_set_id(headers), headers=headers, last_seen_at=now
+                )
+            )
+            if len(batch) == BATCH_SIZE:
+                HttpHeaderSet.objects.bulk_create(batch, ignore_conflicts=True)
+                batch = []
+        HttpHeaderSet.objects.bulk_create(batch, ignore_conflicts=True)
+
+        schema_editor.execute(
+            f"UPDATE {log_table} SET {quote_name(header_set_column)} = header_set.id "
+            f"FROM {header_set_table} header_set "
+            f"WHERE {log_table}.{quote_name(headers_column)} = header_set.headers"
+        )
+
+
+def move_header_sets_to_headers(apps, schema_editor):
+    HttpLog = apps.get_model("zane_api", "HttpLog")
+    HttpHeaderSet = apps.get_model("zane_api", "HttpHeaderSet")
+    quote_name = schema_editor.quote_name
+    log_table = quote_name(HttpLog._meta.db_table)
+    header_set_table = quote_name(HttpHeaderSet._meta.db_table)
+
+    for headers_column, header_set_column in HEADER_FIELDS:
+        schema_editor.execute(
+            f"UPDATE {log_table} SET {quote_name(headers_column)} = COALESCE("
+            f"(SELECT headers FROM {header_set_table} header_set "
+            f"WHERE header_set.id = {log_table}.{quote_name(header_set_column)}), '{{}}'::jsonb)"
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("zane_api", "0148_simplelog_extracted_fields"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="HttpHeaderSet",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(editable=False, primary_key=True, serialize=False),
+                ),
+                ("headers", models.JSONField()),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("last_seen_at", models.DateTimeField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name="httplog",
+            name="request_header_set",
+            field=models.ForeignKey(
+                db_constraint=False,
+                db_index=False,
+                null=True,
+                on_delete=django.db.models.deletion.DO_NOTHING,
+                related_name="+",
+                to="zane_api.httpheaderset",
+            ),
+        ),
+        migrations.AddField(
+            model_name="httplog",
+            name="response_header_set",
+            field=models.ForeignKey(
+                db_constraint=False,
+                db_index=False,
+                null=True,
+                on_delete=django.db.models.deletion.DO_NOTHING,
+                related_name="+",
+                to="zane_api.httpheaderset",
+            ),
+        ),
+        # nullable first, so that the columns can be added back (then filled) when unapplying the migration
+        migrations.AlterField(
+            model_name="httplog",
+            name="request_headers",
+            field=models.JSONField(null=True),
+        ),
+        migrations.AlterField(
+            model_name="httplog",
+            name="response_headers",
+            field=models.JSONField(null=True),
+        ),
+        migrations.RunPython(move_headers_to_header_sets, move_header_sets_to_headers),
+        migrations.RemoveField(
+            model_name="httplog",
+            name="request_headers",
+        ),
+        migrations.RemoveField(
+            model_name="httplog",
+            name="response_headers",
+        ),
+    ]
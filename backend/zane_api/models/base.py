@@ -3,15 +3,32 @@ import uuid
 from typing import Union
 
 from django.conf import settings
-from django.core.validators import MinLengthValidator
+from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import BrinIndex, GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
+from django.core.validators import (
+    MinLengthValidator,
+    MinValueValidator,
+    MaxValueValidator,
+)
 from django.db import models
 from django.utils.translation import gettext_lazy as _
 from django_celery_beat.models import PeriodicTask, IntervalSchedule, CrontabSchedule
 from faker import Faker
 from shortuuid.django_fields import ShortUUIDField
 
-from ..utils import strip_slash_if_exists, datetime_to_timestamp_string
-from ..validators import validate_url_domain, validate_url_path, validate_env_name
+from ..utils import (
+    strip_slash_if_exists,
+    datetime_to_timestamp_string,
+    generate_log_id,
+)
+from ..validators import (
+    validate_url_domain,
+    validate_url_path,
+    validate_env_name,
+    validate_regex,
+    validate_json_field_path,
+)
 
 
 class TimestampedModel(models.Model):
@@ -35,6 +52,8 @@ class Project(TimestampedModel):
         prefix="prj_",
     )
     description = models.TextField(blank=True, null=True)
+    # `None` means the default retention (`settings.LOGS_RETENTION_DAYS`)
+    logs_retention_days = models.PositiveIntegerField(null=True)
 
     @property
     def create_task_id(self):
@@ -216,6 +235,26 @@ class DockerRegistryService(BaseService):
         max_length=255,
         null=True,
     )
+    # `None` means the retention of the project
+    logs_retention_days = models.PositiveIntegerField(null=True)
+    # maximum number of log lines ingested per second, `None` means `settings.LOGS_SERVICE_RATE_LIMIT`
+    logs_rate_limit = models.PositiveIntegerField(null=True)
+    # share of the lines over the rate limit which are still ingested, the others are dropped
+    logs_overflow_sample_rate = models.FloatField(
+        default=0.0, validators=[MinValueValidator(0.0), MaxValueValidator(1.0)]
+    )
+    # regex matching the first line of a log record, the following lines which do not match it
+    # (like the lines of a stack trace) are joined to the record, `None` stores every line on its own
+    logs_multiline_pattern = models.CharField(
+        max_length=255, null=True, blank=True, validators=[validate_regex]
+    )
+    # paths of the fields of the JSON log lines (like `request_id` or `user.id`) copied to `SimpleLogField` at ingest,
+    # so that the logs can be filtered on them
+    logs_extracted_fields = ArrayField(
+        models.CharField(max_length=255, validators=[validate_json_field_path]),
+        default=list,
+        blank=True,
+    )
 
     def __str__(self):
         return f"DockerRegistryService({self.slug})"
@@ -751,12 +790,48 @@ class GitDeployment(BaseDeployment):
         ]
 
 
+class SmallChoiceField(models.Field):
+    """
+    Text choices stored as a `smallint`: the position of the value in the choices.
+    The field reads & writes the text values, only the database sees the codes,
+    so new choices must always be appended.
+    """
+
+    def get_internal_type(self):
+        return "SmallIntegerField"
+
+    @property
+    def codes(self) -> list[str]:
+        return [value for value, _ in self.flatchoices]
+
+    def from_db_value(self, value, expression, connection):
+        return self.to_python(value)
+
+    def to_python(self, value):
+        if isinstance(value, int):
+            return self.codes[value]
+        return value
+
+    def get_prep_value(self, value):
+        value = super().get_prep_value(value)
+        if value is None or isinstance(value, int):
+            return value
+        try:
+            return self.codes.index(value)
+        except ValueError as e:
+            raise ValueError(
+                f"Field '{self.name}' expected one of {self.codes}, got {value!r}."
+            ) from e
+
+
 class Log(models.Model):
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    id = models.UUIDField(primary_key=True, default=generate_log_id, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     service_id = models.CharField(null=True)
     deployment_id = models.CharField(null=True)
     time = models.DateTimeField()
+    # hash of the source line, so that the lines sent again by fluentd are only stored once
+    dedupe_key = models.UUIDField(null=True, editable=False)
 
     class Meta:
         abstract = True
@@ -772,29 +847,102 @@ class SimpleLog(Log):
         PROXY = "PROXY", _("Proxy Logs")
         SERVICE = "SERVICE", _("Service Logs")
 
-    content = models.JSONField(null=True)
-    level = models.CharField(
-        max_length=10,
+    # the raw line, unless it is valid JSON, in which case it is only stored (parsed) in `content_json`
+    content = models.TextField(null=True)
+    content_json = models.JSONField(null=True)
+    # the lines longer than `LOGS_MAX_INLINE_LENGTH` only keep a preview in `content`,
+    # the full line is stored in the `SimpleLogBlob` with this id
+    content_blob_id = models.UUIDField(null=True)
+    # computed by postgres, used for the full text search of the logs (`q` parameter of the logs API)
+    content_search_vector = models.GeneratedField(
+        expression=SearchVector("content", "content_json", config="simple"),
+        output_field=SearchVectorField(),
+        db_persist=True,
+    )
+    level = SmallChoiceField(
         choices=LogLevel.choices,
         default=LogLevel.INFO,
     )
-    source = models.CharField(
-        max_length=10,
+    source = SmallChoiceField(
         choices=LogSource.choices,
         default=LogSource.SERVICE,
     )
 
     class Meta:
+        # the table is append-only & ordered by time: a BRIN index is enough for the time ranges,
+        # and every query on a deployment/service also goes through `time`
         indexes = [
-            models.Index(fields=["deployment_id"]),
-            models.Index(fields=["service_id"]),
-            models.Index(fields=["source"]),
-            models.Index(fields=["level"]),
-            models.Index(fields=["time"]),
+            BrinIndex(fields=["time"], autosummarize=True),
+            # keyset pagination of the logs of a deployment/service on `(time, id)`
+            models.Index(fields=["deployment_id", "time", "id"]),
+            models.Index(fields=["service_id", "time", "id"]),
+            GinIndex(fields=["content_search_vector"]),
+        ]
+        constraints = [
+            # the partition key (`time`) has to be part of the unique constraints of the partitioned table
+            models.UniqueConstraint(
+                fields=["dedupe_key", "time"], name="unique_simplelog_dedupe_key"
+            ),
         ]
         ordering = ("time",)
 
 
+class SimpleLogBlob(models.Model):
+    """
+    Full content of a `SimpleLog` line too long to be stored in the log table, zstd compressed.
+    The id is the dedupe key of the line, so that a line sent again by fluentd is only stored once.
+    """
+
+    id = models.UUIDField(primary_key=True, editable=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+    service_id = models.CharField(null=True)
+    deployment_id = models.CharField(null=True)
+    # time of the log, the blobs are deleted with the logs of the same time
+    time = models.DateTimeField()
+    # number of characters of the line
+    length = models.PositiveIntegerField()
+    content = models.BinaryField()
+
+    class Meta:
+        indexes = [
+            BrinIndex(fields=["time"], autosummarize=True),
+            models.Index(fields=["service_id", "time"]),
+        ]
+
+
+class SimpleLogField(models.Model):
+    """
+    Value of a field extracted from a JSON log line (see `DockerRegistryService.logs_extracted_fields`),
+    partitioned by day on `time` like the logs.
+    """
+
+    id = models.UUIDField(primary_key=True, default=generate_log_id, editable=False)
+    log_id = models.UUIDField()
+    service_id = models.CharField()
+    time = models.DateTimeField()
+    name = models.CharField(max_length=255)
+    # the text of the value for strings, its JSON otherwise (`42`, `true`)
+    value = models.CharField(max_length=255)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["service_id", "name", "value", "time"]),
+        ]
+
+
+class HttpHeaderSet(models.Model):
+    """
+    A set of headers (after the allowlist) of the requests or responses of the http logs, stored once:
+    the id is the hash of the headers, and the logs only keep the id of their sets.
+    """
+
+    id = models.UUIDField(primary_key=True, editable=False)
+    headers = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    # refreshed at most once a day, the sets unused for longer than the retention of the logs are deleted
+    last_seen_at = models.DateTimeField()
+
+
 class HttpLog(Log):
     class RequestMethod(models.TextChoices):
         GET = "GET", _("GET")
@@ -811,24 +959,78 @@ class HttpLog(Log):
     )
     status = models.PositiveIntegerField()
     request_duration_ms = models.PositiveIntegerField()
-    request_headers = models.JSONField()
-    response_headers = models.JSONField()
+    # `None` when none of the headers are in `LOGS_HTTP_HEADERS_ALLOWLIST`
+    request_header_set = models.ForeignKey(
+        to=HttpHeaderSet,
+        null=True,
+        on_delete=models.DO_NOTHING,
+        # the header sets are shared by many logs & deleted on their own, see `log_headers.py`
+        db_constraint=False,
+        db_index=False,
+        related_name="+",
+    )
+    response_header_set = models.ForeignKey(
+        to=HttpHeaderSet,
+        null=True,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        db_index=False,
+        related_name="+",
+    )
     request_host = models.URLField(max_length=1000)
     request_uri = models.CharField(max_length=2000)
     request_ip = models.GenericIPAddressField()
 
     class Meta:
+        # same as `SimpleLog`, the aggregates of the requests are read from `HttpLogRollup`
         indexes = [
-            models.Index(fields=["deployment_id"]),
-            models.Index(fields=["service_id"]),
-            models.Index(fields=["status"]),
-            models.Index(fields=["request_host"]),
-            models.Index(fields=["request_uri"]),
-            models.Index(fields=["time"]),
+            BrinIndex(fields=["time"], autosummarize=True),
+            models.Index(fields=["deployment_id", "time"]),
+            models.Index(fields=["service_id", "time"]),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["dedupe_key", "time"], name="unique_httplog_dedupe_key"
+            ),
         ]
         ordering = ("time",)
 
 
+class HttpLogRollup(models.Model):
+    """
+    Aggregates of the `HttpLog` of a deployment for a minute, updated incrementally on ingest,
+    one row per request path and one row with an empty `request_path` for the whole deployment.
+    The latencies are stored as a fixed-bucket histogram (see `log_rollups.py`),
+    so that the rollups of many minutes are merged by summing them.
+    """
+
+    deployment_id = models.CharField(max_length=255)
+    service_id = models.CharField(max_length=255, null=True)
+    minute = models.DateTimeField()
+    request_path = models.CharField(max_length=255, blank=True, default="")
+    request_count = models.PositiveBigIntegerField(default=0)
+    status_1xx_count = models.PositiveBigIntegerField(default=0)
+    status_2xx_count = models.PositiveBigIntegerField(default=0)
+    status_3xx_count = models.PositiveBigIntegerField(default=0)
+    status_4xx_count = models.PositiveBigIntegerField(default=0)
+    status_5xx_count = models.PositiveBigIntegerField(default=0)
+    duration_sum_ms = models.PositiveBigIntegerField(default=0)
+    duration_max_ms = models.PositiveBigIntegerField(default=0)
+    duration_histogram = ArrayField(models.PositiveBigIntegerField())
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["deployment_id", "request_path", "minute"],
+                name="unique_http_log_rollup_per_minute",
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["service_id", "request_path", "minute"]),
+            models.Index(fields=["minute"]),
+        ]
+
+
 class CRON(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     name = models.CharField(max_length=255)
@@ -1,5 +1,6 @@
 import os
 
+from django.conf import settings
 from django.contrib.auth.models import User
 from django.db.models import TextChoices
 from drf_spectacular.types import OpenApiTypes
@@ -9,7 +10,13 @@ from rest_framework import serializers
 from rest_framework.serializers import *
 
 from . import models
-from .validators import validate_url_path, validate_url_domain
+from .log_fields import MAX_EXTRACTED_FIELDS
+from .validators import (
+    validate_url_path,
+    validate_url_domain,
+    validate_regex,
+    validate_json_field_path,
+)
 
 
 class ErrorCode409Enum(TextChoices):
@@ -59,6 +66,7 @@ class ProjectSerializer(ModelSerializer):
             "updated_at",
             "healthy_services",
             "total_services",
+            "logs_retention_days",
         ]
 
 
@@ -182,3 +190,86 @@ class DockerServiceDeploymentSerializer(ModelSerializer):
             "service_snapshot",
             "changes",
         ]
+
+
+class DockerServiceLogSettingsSerializer(ModelSerializer):
+    logs_retention_days = serializers.IntegerField(
+        allow_null=True,
+        min_value=1,
+        max_value=settings.LOGS_RETENTION_DAYS,
+        help_text="Number of days the logs of the service are kept, `null` to use the retention of the project",
+    )
+    logs_rate_limit = serializers.IntegerField(
+        allow_null=True,
+        min_value=1,
+        help_text="Maximum number of log lines ingested per second, `null` to use the default limit",
+    )
+    logs_overflow_sample_rate = serializers.FloatField(
+        min_value=0.0,
+        max_value=1.0,
+        help_text="Share of the log lines over the rate limit which are still ingested, the others are dropped",
+    )
+    logs_multiline_pattern = serializers.CharField(
+        allow_null=True,
+        allow_blank=False,
+        max_length=255,
+        validators=[validate_regex],
+        help_text="Regular expression matching the first line of a log record (like `^\\S` or `^\\d{4}-`),"
+        " the lines which do not match it are joined to the previous line, `null` to store every line on its own",
+    )
+
+    logs_extracted_fields = serializers.ListField(
+        child=serializers.CharField(
+            max_length=255, validators=[validate_json_field_path]
+        ),
+        max_length=MAX_EXTRACTED_FIELDS,
+        help_text="Paths of the fields of the JSON log lines (like `request_id` or `user.id`) indexed at ingest,"
+        " the logs can then be filtered on them with the `field` parameter of the logs API",
+    )
+
+    class Meta:
+        model = models.DockerRegistryService
+        fields = [
+            "logs_retention_days",
+            "logs_rate_limit",
+            "logs_overflow_sample_rate",
+            "logs_multiline_pattern",
+            "logs_extracted_fields",
+        ]
+
+
+class SimpleLogSerializer(ModelSerializer):
+    content = serializers.SerializerMethodField()
+    # `default` for the logs archived or published before the field existed
+    content_blob_id = serializers.UUIDField(
+        read_only=True,
+        allow_null=True,
+        default=None,
+        help_text="Set when the line was too long to be stored with the log: `content` is only the start of the line,"
+        " the full line can be fetched from the log blobs API with this id",
+    )
+
+    @extend_schema_field(OpenApiTypes.ANY)
+    def get_content(self, obj: models.SimpleLog | dict):
+        """
+        The parsed JSON of the line if it is valid JSON, its text otherwise
+        """
+        if isinstance(obj, dict):
+            content, content_json = obj["content"], obj.get("content_json")
+        else:
+            content, content_json = obj.content, obj.content_json
+        return content_json if content_json is not None else content
+
+    class Meta:
+        model = models.SimpleLog
+        fields = [
+            "id",
+            "service_id",
+            "deployment_id",
+            "time",
+            "created_at",
+            "content",
+            "content_blob_id",
+            "level",
+            "source",
+        ]
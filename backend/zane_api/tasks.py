@@ -25,6 +25,16 @@ from .docker_operations import (
     scale_down_service_deployment,
     scale_back_service_deployment,
 )
+from .log_archive import (
+    archive_old_logs,
+    delete_expired_segments,
+    list_archived_services,
+)
+from .log_blobs import delete_expired_log_blobs
+from .log_headers import delete_unused_header_sets
+from .log_partitions import create_log_partitions, drop_expired_log_partitions
+from .log_retention import purge_expired_service_logs
+from .log_rollups import delete_expired_http_log_rollups, get_http_health_breach
 from .models import (
     DockerDeployment,
     PortConfiguration,
@@ -354,6 +364,12 @@ def monitor_docker_service_deployment(deployment_hash: str, auth_token: str):
                 deployment_status, deployment_status_reason = (
                     get_updated_docker_deployment_status(deployment, auth_token)
                 )
+                if deployment_status == DockerDeployment.DeploymentStatus.HEALTHY:
+                    # the requests received by the deployment, read from the access logs without probing it
+                    http_health_breach = get_http_health_breach(deployment.hash)
+                    if http_health_breach is not None:
+                        deployment_status = DockerDeployment.DeploymentStatus.UNHEALTHY
+                        deployment_status_reason = http_health_breach
                 deployment.status = deployment_status
                 deployment.status_reason = deployment_status_reason
         except LockAcquisitionError:
@@ -363,3 +379,47 @@ def monitor_docker_service_deployment(deployment_hash: str, auth_token: str):
             deployment.status_reason = str(e)
         finally:
             deployment.save()
+
+
+@shared_task
+def create_log_partitions_ahead():
+    created = create_log_partitions(days_ahead=settings.LOGS_PARTITIONS_DAYS_AHEAD)
+    return f"Created {len(created)} log partitions: {created}"
+
+
+@shared_task
+def drop_expired_logs():
+    dropped, deleted_count = drop_expired_log_partitions(
+        retention_days=settings.LOGS_RETENTION_DAYS
+    )
+    segments_deleted = 0
+    for service_id in list_archived_services():
+        count, _ = delete_expired_segments(service_id, settings.LOGS_RETENTION_DAYS)
+        segments_deleted += count
+    blobs_deleted, _ = delete_expired_log_blobs(settings.LOGS_RETENTION_DAYS)
+    rollups_deleted = delete_expired_http_log_rollups(settings.LOGS_RETENTION_DAYS)
+    header_sets_deleted = delete_unused_header_sets(settings.LOGS_RETENTION_DAYS)
+    return (
+        f"Dropped {len(dropped)} log partitions: {dropped}, {deleted_count} logs from the default partitions,"
+        f" {segments_deleted} archived log segments, {blobs_deleted} log blobs, {rollups_deleted} http log rollups"
+        f" and {header_sets_deleted} http header sets"
+    )
+
+
+@shared_task
+def archive_logs():
+    archived = archive_old_logs()
+    return f"Archived {sum(archived.values())} logs of {len(archived)} services"
+
+
+@shared_task
+def purge_expired_logs():
+    reports = purge_expired_service_logs()
+    for report in reports:
+        print(
+            f"Purged {report.rows_deleted} logs ({report.bytes_reclaimed} bytes) of the service `{report.service_id}`"
+            f" with a retention of {report.retention_days} days"
+        )
+    rows_deleted = sum(report.rows_deleted for report in reports)
+    bytes_reclaimed = sum(report.bytes_reclaimed for report in reports)
+    return f"Purged {rows_deleted} logs ({bytes_reclaimed} bytes) of {len(reports)} services"
@@ -1,10 +1,95 @@
+import asyncio
+import datetime
+import gzip
+import io
 import json
+import struct
+import tempfile
+import uuid
+from unittest.mock import AsyncMock, MagicMock, patch
 
+from asgiref.sync import async_to_sync
+
+import msgpack
+import zstandard
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import OperationalError, connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from rest_framework import status
+from rest_framework.exceptions import ValidationError
 
 from .base import AuthAPITestCase
-from ..models import SimpleLog, DockerDeployment
+from ..log_archive import (
+    ARCHIVED_LOG_FIELDS,
+    archive_old_logs,
+    archive_service_logs_of_day,
+    delete_expired_segments,
+    get_segment_path,
+    iter_archived_logs,
+    list_segment_days,
+    write_segment,
+)
+from ..log_collector import (
+    decode_forward_message,
+    new_unpacker,
+    write_forwarded_logs,
+    ForwardProtocolError,
+    LogCollector,
+)
+from ..log_ingestion import (
+    ingest_container_logs,
+    insert_logs,
+    write_logs,
+    iter_json_array,
+    LogParseError,
+    LogPayloadTooLarge,
+    validate_container_log,
+    validate_container_logs,
+    decode_log_tag,
+    parse_log_content,
+    parse_caddy_access_logs,
+    route_container_logs,
+)
+from ..log_live import (
+    get_live_tail_channel,
+    get_recent_logs_key,
+    stream_deployment_logs,
+)
+from ..log_rollups import (
+    aggregate_http_logs,
+    get_bucket_bounds,
+    get_bucket_index,
+    get_percentile,
+    get_request_path,
+    new_histogram,
+    upsert_http_log_rollups,
+    HISTOGRAM_BUCKET_COUNT,
+    HISTOGRAM_MAX_VALUE,
+)
+from ..log_blobs import delete_expired_log_blobs
+from ..log_fields import get_field_value
+from ..log_headers import (
+    delete_unused_header_sets,
+    get_header_set_id,
+    store_header_sets,
+)
+from ..log_partitions import create_log_partitions, drop_expired_log_partitions
+from ..log_queue import LogQueueWriter, write_queued_batches
+from ..log_retention import purge_expired_service_logs
+from ..models import (
+    SimpleLog,
+    DockerDeployment,
+    HttpLog,
+    HttpLogRollup,
+    Project,
+    DockerRegistryService,
+    SimpleLogBlob,
+    SimpleLogField,
+    HttpHeaderSet,
+)
+from ..views.serializers import DockerContainerLogSerializer
 
 
 class SimpleLogCollectViewTests(AuthAPITestCase):
@@ -32,7 +117,8 @@ class SimpleLogCollectViewTests(AuthAPITestCase):
         self.assertEqual(SimpleLog.LogSource.PROXY, log.source)
         self.assertEqual(SimpleLog.LogLevel.INFO, log.level)
         self.assertIsNotNone(log.time)
-        self.assertEqual(json_log, log.content)
+        self.assertEqual(json_log, log.content_json)
+        self.assertIsNone(log.content)
 
     def test_collect_service_logs(self):
         p, service = self.create_and_deploy_redis_docker_service()
@@ -145,3 +231,2530 @@ class SimpleLogCollectViewTests(AuthAPITestCase):
             log.content,
         )
         self.assertIsNotNone(log.service_id)
+
+
+class HttpLogCollectViewTests(AuthAPITestCase):
+    def test_collect_proxy_access_logs_as_http_logs(self):
+        p, service = self.create_and_deploy_redis_docker_service()
+        deployment: DockerDeployment = service.deployments.first()
+
+        access_log = {
+            "level": "info",
+            "ts": 1719324985.9711,
+            "logger": "http.log.access.log0",
+            "msg": "handled request",
+            "request": {
+                "remote_ip": "10.0.0.2",
+                "remote_port": "37420",
+                "client_ip": "10.0.0.2",
+                "proto": "HTTP/1.1",
+                "method": "GET",
+                "host": "redis.zaneops.local",
+                "uri": "/?page=1",
+                "headers": {"Accept": ["*/*"]},
+            },
+            "bytes_read": 0,
+            "user_id": "",
+            "duration": 0.041519349,
+            "size": 238,
+            "status": 502,
+            "resp_headers": {"Content-Length": ["238"]},
+            "zane_deployment_current_hash": deployment.hash,
+            "zane_deployment_current_slot": "blue",
+            "zane_deployment_upstream": "",
+        }
+        logs = [
+            {
+                "source": "stdout",
+                "log": json.dumps(access_log),
+                "container_id": "8320676fc77bb91b54f0dff7015c08148fd3021db7038c8d0c18ec7378e1979e",
+                "container_name": "/zane_zane-proxy.1.kj2d879vqbnpishh4d66i47do",
+                "time": "2024-06-25T14:16:25+0000",
+                "tag": json.dumps({"service_id": "zane.proxy"}),
+            },
+            {
+                "source": "stderr",
+                "log": '{"level":"info","ts":1719324985.9711,"logger":"tls","msg":"cleaning storage unit"}',
+                "container_id": "8320676fc77bb91b54f0dff7015c08148fd3021db7038c8d0c18ec7378e1979e",
+                "container_name": "/zane_zane-proxy.1.kj2d879vqbnpishh4d66i47do",
+                "time": "2024-06-25T14:16:25+0000",
+                "tag": json.dumps({"service_id": "zane.proxy"}),
+            },
+        ]
+
+        response = self.client.post(reverse("zane_api:logs.tail"), data=logs)
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertEqual(1, response.json().get("http_logs_inserted"))
+        self.assertEqual(2, response.json().get("simple_logs_inserted"))
+
+        self.assertEqual(1, deployment.http_logs.count())
+        http_log: HttpLog = deployment.http_logs.first()
+        self.assertEqual(service.id, http_log.service_id)
+        self.assertEqual(HttpLog.RequestMethod.GET, http_log.request_method)
+        self.assertEqual(502, http_log.status)
+        self.assertEqual(42, http_log.request_duration_ms)
+        self.assertEqual("redis.zaneops.local", http_log.request_host)
+        self.assertEqual("/?page=1", http_log.request_uri)
+        self.assertEqual("10.0.0.2", http_log.request_ip)
+        self.assertEqual({"Accept": ["*/*"]}, http_log.request_header_set.headers)
+        # `Content-Length` is not in the default allowlist
+        self.assertIsNone(http_log.response_header_set)
+
+
+class LogWriterTests(AuthAPITestCase):
+    def test_copy_and_bulk_create_writers_store_the_same_rows(self):
+        rows = [
+            dict(
+                source=SimpleLog.LogSource.SERVICE,
+                level=SimpleLog.LogLevel.ERROR,
+                content='Traceback:\n\tFile "main.py" \\ line 1',
+                time="2024-06-30T03:17:14Z",
+                deployment_id="dpl_dkr_KRbXo2FJput",
+                service_id="srv_dkr_LeeCqAUZJnJ",
+            ),
+            dict(
+                source=SimpleLog.LogSource.PROXY,
+                content_json={"msg": "handled request", "status": 200},
+                time="2024-06-30T03:17:15Z",
+            ),
+        ]
+
+        def write_and_read_back(use_copy: bool):
+            self.assertEqual(2, write_logs(SimpleLog, rows, use_copy=use_copy))
+            written = list(
+                SimpleLog.objects.order_by("time").values(
+                    "source",
+                    "level",
+                    "content",
+                    "content_json",
+                    "time",
+                    "service_id",
+                )
+            )
+            SimpleLog.objects.all().delete()
+            return written
+
+        copied = write_and_read_back(use_copy=True)
+        created = write_and_read_back(use_copy=False)
+        self.assertEqual(created, copied)
+        self.assertEqual(SimpleLog.LogLevel.INFO, copied[1]["level"])
+        self.assertIsNone(copied[1]["service_id"])
+
+
+class StreamingLogCollectViewTests(AuthAPITestCase):
+    def test_iter_json_array_decodes_items_split_across_reads(self):
+        items = [
+            {"log": "héllo, [world]", "source": "stdout"},
+            {"log": '{"nested": ["a", "b"]}', "source": "stderr"},
+            {"log": "x" * 100, "source": "stdout"},
+        ]
+        stream = io.BytesIO(json.dumps(items, ensure_ascii=False).encode("utf-8"))
+        self.assertEqual(items, list(iter_json_array(stream, read_size=3)))
+        self.assertEqual([], list(iter_json_array(io.BytesIO(b" [ ] "))))
+
+    def test_iter_json_array_decodes_scalars_split_across_reads(self):
+        items = [12345, 1.5, -3e10, 0.25e-3, True, None, "a,b]"]
+        body = json.dumps(items).encode()
+        for read_size in range(1, 8):
+            with self.subTest(read_size=read_size):
+                self.assertEqual(
+                    items, list(iter_json_array(io.BytesIO(body), read_size=read_size))
+                )
+
+    def test_iter_json_array_rejects_invalid_bodies(self):
+        for body in [
+            b'{"log": "not a list"}',
+            b'[{"log": "unterminated"}',
+            b"[{]",
+            b"[1 2,,3]",
+            b"[1,,2]",
+            b"[1,]",
+            b"[,1]",
+            b"[1]]",
+            b"[1] x",
+            b"[1.]",
+        ]:
+            for read_size in (1, 2, 4, 64):
+                with self.subTest(body=body, read_size=read_size):
+                    with self.assertRaises(LogParseError):
+                        list(iter_json_array(io.BytesIO(body), read_size=read_size))
+
+    def test_iter_json_array_rejects_items_over_the_buffer_size(self):
+        body = json.dumps([{"log": "small"}, {"log": "x" * 1_000}]).encode()
+        items = iter_json_array(io.BytesIO(body), read_size=16, max_buffer_size=256)
+        self.assertEqual({"log": "small"}, next(items))
+        with self.assertRaises(LogPayloadTooLarge):
+            next(items)
+
+    @override_settings(LOGS_INGEST_CHUNK_SIZE=2)
+    def test_collect_logs_in_multiple_chunks(self):
+        p, service = self.create_and_deploy_redis_docker_service()
+        deployment: DockerDeployment = service.deployments.first()
+
+        logs = [
+            {
+                "log": f"1:M 30 Jun 2024 03:17:14.376 * line #{i}",
+                "container_id": "78dfe81bb4b3994eeb38f65f5a586084a2b4a649c0ab08b614d0f4c2cb499761",
+                "container_name": "/srv-prj_ssbvBaqpbD7-srv_dkr_LeeCqAUZJnJ-dpl_dkr_KRbXo2FJput.1.zm0uncmx8w4wvnokdl6qxt55e",
+                "time": "2024-06-30T03:17:14Z",
+                "tag": json.dumps(
+                    {"deployment_id": deployment.hash, "service_id": service.id}
+                ),
+                "source": "stdout",
+            }
+            for i in range(5)
+        ]
+
+        response = self.client.post(reverse("zane_api:logs.tail"), data=logs)
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertEqual(5, response.json().get("simple_logs_inserted"))
+        self.assertEqual(5, deployment.logs.count())
+
+    @override_settings(LOGS_INGEST_CHUNK_SIZE=2)
+    def test_invalid_log_in_a_later_chunk_does_not_insert_anything(self):
+        logs = [
+            {
+                "log": "line",
+                "container_id": "78dfe81bb4b3",
+                "container_name": "/srv-prj_ssbvBaqpbD7",
+                "time": "2024-06-30T03:17:14Z",
+                "tag": json.dumps({"service_id": "srv_dkr_LeeCqAUZJnJ"}),
+                "source": "stdout",
+            }
+        ] * 3 + [{"log": "missing fields"}]
+
+        response = self.client.post(reverse("zane_api:logs.tail"), data=logs)
+        self.assertEqual(status.HTTP_400_BAD_REQUEST, response.status_code)
+        self.assertEqual(0, SimpleLog.objects.count())
+
+    def test_collect_logs_with_malformed_body(self):
+        response = self.client.post(
+            reverse("zane_api:logs.tail"), data='[{"log": "unterminated"'
+        )
+        self.assertEqual(status.HTTP_400_BAD_REQUEST, response.status_code)
+
+
+class FastLogValidationTests(AuthAPITestCase):
+    record = {
+        "log": "1:M 30 Jun 2024 03:17:14.376 * Ready to accept connections tcp",
+        "container_id": "78dfe81bb4b3994eeb38f65f5a586084a2b4a649c0ab08b614d0f4c2cb499761",
+        "container_name": "/srv-prj_ssbvBaqpbD7-srv_dkr_LeeCqAUZJnJ-dpl_dkr_KRbXo2FJput.1.zm0uncmx8w4wvnokdl6qxt55e",
+        "time": "2024-06-30T03:17:14.123+0000",
+        "tag": json.dumps(
+            {
+                "deployment_id": "dpl_dkr_KRbXo2FJput",
+                "service_id": "srv_dkr_LeeCqAUZJnJ",
+            }
+        ),
+        "source": "stderr",
+    }
+
+    def test_compiled_validator_matches_the_serializer(self):
+        serializer = DockerContainerLogSerializer(data=self.record)
+        self.assertTrue(serializer.is_valid())
+        self.assertEqual(
+            dict(serializer.validated_data), validate_container_log(self.record)
+        )
+
+    def test_compiled_validator_matches_the_serializer_on_time_offsets(self):
+        for time in [
+            "2024-06-30T05:17:14.123+0200",
+            "2024-06-29T22:17:14.123456-05:00",
+            "2024-06-30T03:17:14Z",
+            "2024-06-30T03:17:14.123",
+        ]:
+            with self.subTest(time=time):
+                record = {**self.record, "time": time}
+                serializer = DockerContainerLogSerializer(data=record)
+                self.assertTrue(serializer.is_valid())
+                validated = validate_container_log(record)
+                self.assertEqual(dict(serializer.validated_data), validated)
+                self.assertEqual(
+                    serializer.validated_data["time"].isoformat(),
+                    validated["time"].isoformat(),
+                )
+
+    def test_compiled_validator_defers_non_canonical_records_to_the_serializer(self):
+        for override in [
+            {"source": "stdin"},
+            {"time": "30 Jun 2024"},
+            {"container_id": "  "},
+            {"log": None},
+        ]:
+            self.assertIsNone(validate_container_log({**self.record, **override}))
+
+        with self.assertRaises(ValidationError):
+            validate_container_logs([self.record, {**self.record, "source": "stdin"}])
+
+    def test_compiled_validator_matches_the_serializer_on_whitespace(self):
+        record = {
+            **self.record,
+            "log": "    indented line  ",
+            "container_id": " 78dfe81 ",
+        }
+        serializer = DockerContainerLogSerializer(data=record)
+        self.assertTrue(serializer.is_valid())
+        self.assertEqual(
+            dict(serializer.validated_data), validate_container_log(record)
+        )
+        self.assertEqual("    indented line  ", validate_container_log(record)["log"])
+        self.assertEqual("78dfe81", validate_container_log(record)["container_id"])
+
+    def test_collect_logs_with_null_character(self):
+        self.assertIsNone(
+            validate_container_log({**self.record, "log": "null \x00 byte"})
+        )
+
+        response = self.client.post(
+            reverse("zane_api:logs.tail"),
+            data=[self.record, {**self.record, "log": "null \x00 byte"}],
+        )
+        self.assertEqual(status.HTTP_400_BAD_REQUEST, response.status_code)
+        self.assertEqual(0, SimpleLog.objects.count())
+
+    def test_log_tag_is_decoded_once_per_tag(self):
+        decode_log_tag.cache_clear()
+        validated_logs = validate_container_logs([self.record] * 3)
+        route_container_logs(validated_logs)
+        cache_info = decode_log_tag.cache_info()
+        self.assertEqual(1, cache_info.misses)
+        self.assertEqual(2, cache_info.hits)
+        self.assertEqual(
+            ("srv_dkr_LeeCqAUZJnJ", "dpl_dkr_KRbXo2FJput"),
+            decode_log_tag(self.record["tag"]),
+        )
+        self.assertIsNone(decode_log_tag("not json"))
+        self.assertIsNone(decode_log_tag("[1, 2]"))
+
+
+class CompressedLogCollectViewTests(AuthAPITestCase):
+    def get_logs(self, count: int = 3):
+        return [
+            {
+                "log": f"1:M 30 Jun 2024 03:17:14.376 * line #{i}",
+                "container_id": "78dfe81bb4b3994eeb38f65f5a586084a2b4a649c0ab08b614d0f4c2cb499761",
+                "container_name": "/srv-prj_ssbvBaqpbD7-srv_dkr_LeeCqAUZJnJ-dpl_dkr_KRbXo2FJput.1.zm0uncmx8w4wvnokdl6qxt55e",
+                "time": "2024-06-30T03:17:14Z",
+                "tag": json.dumps(
+                    {
+                        "deployment_id": "dpl_dkr_KRbXo2FJput",
+                        "service_id": "srv_dkr_LeeCqAUZJnJ",
+                    }
+                ),
+                "source": "stdout",
+            }
+            for i in range(count)
+        ]
+
+    def post_logs(self, body: bytes, content_type: str, **headers):
+        return self.client.generic(
+            "POST",
+            reverse("zane_api:logs.tail"),
+            data=body,
+            content_type=content_type,
+            **headers,
+        )
+
+    def test_collect_msgpack_logs(self):
+        # fluentd `out_http` concatenates each msgpack record
+        body = b"".join(msgpack.packb(log) for log in self.get_logs())
+        response = self.post_logs(body, "application/msgpack")
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertEqual(3, SimpleLog.objects.count())
+
+    def test_collect_gzip_compressed_msgpack_logs(self):
+        body = gzip.compress(b"".join(msgpack.packb(log) for log in self.get_logs()))
+        response = self.post_logs(
+            body, "application/msgpack", HTTP_CONTENT_ENCODING="gzip"
+        )
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertEqual(3, SimpleLog.objects.count())
+
+    def test_collect_zstd_compressed_json_logs(self):
+        body = zstandard.ZstdCompressor().compress(json.dumps(self.get_logs()).encode())
+        response = self.post_logs(
+            body, "application/json", HTTP_CONTENT_ENCODING="zstd"
+        )
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertEqual(3, SimpleLog.objects.count())
+
+    def test_collect_logs_with_unsupported_encoding(self):
+        response = self.post_logs(
+            json.dumps(self.get_logs()).encode(),
+            "application/json",
+            HTTP_CONTENT_ENCODING="br",
+        )
+        self.assertEqual(status.HTTP_415_UNSUPPORTED_MEDIA_TYPE, response.status_code)
+
+    def test_collect_logs_with_corrupted_compressed_body(self):
+        response = self.post_logs(
+            b"definitely not gzip", "application/json", HTTP_CONTENT_ENCODING="gzip"
+        )
+        self.assertEqual(status.HTTP_400_BAD_REQUEST, response.status_code)
+        self.assertEqual(0, SimpleLog.objects.count())
+
+    def test_collect_logs_inflating_past_the_decompressed_size_limit(self):
+        body = gzip.compress(json.dumps([{"log": " " * 10_000}]).encode())
+        self.assertLess(len(body), 1_000)
+        with patch("zane_api.log_ingestion.MAX_DECOMPRESSED_SIZE", 5_000):
+            response = self.post_logs(
+                body, "application/json", HTTP_CONTENT_ENCODING="gzip"
+            )
+        self.assertEqual(status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, response.status_code)
+        self.assertEqual(0, SimpleLog.objects.count())
+
+
+class ForwardProtocolLogCollectorTests(AuthAPITestCase):
+    tag = json.dumps(
+        {"deployment_id": "dpl_dkr_KRbXo2FJput", "service_id": "srv_dkr_LeeCqAUZJnJ"}
+    )
+
+    @staticmethod
+    def get_record(i: int):
+        return {
+            "log": f"1:M 30 Jun 2024 03:17:14.376 * line #{i}",
+            "container_id": "78dfe81bb4b3994eeb38f65f5a586084a2b4a649c0ab08b614d0f4c2cb499761",
+            "container_name": "/srv-prj_ssbvBaqpbD7-srv_dkr_LeeCqAUZJnJ-dpl_dkr_KRbXo2FJput.1.zm0uncmx8w4wvnokdl6qxt55e",
+            "source": "stdout",
+        }
+
+    def unpack(self, message: list):
+        unpacker = new_unpacker()
+        unpacker.feed(msgpack.packb(message))
+        return decode_forward_message(next(unpacker))
+
+    def test_decode_all_forward_modes(self):
+        event_time = msgpack.ExtType(0, struct.pack(">II", 1719717434, 500_000_000))
+        message = self.unpack([self.tag, event_time, self.get_record(0)])
+        self.assertEqual(1, len(message.records))
+        self.assertEqual("2024-06-30T03:17:14.500000+00:00", message.records[0]["time"])
+        self.assertEqual(self.tag, message.records[0]["tag"])
+        self.assertIsNone(message.chunk_id)
+
+        message = self.unpack(
+            [self.tag, [[1719717434, self.get_record(i)] for i in range(3)]]
+        )
+        self.assertEqual(3, len(message.records))
+
+        packed_entries = b"".join(
+            msgpack.packb([1719717434, self.get_record(i)]) for i in range(4)
+        )
+        message = self.unpack(
+            [
+                self.tag,
+                gzip.compress(packed_entries),
+                {"compressed": "gzip", "chunk": "p8n9gmxTQVC8/nh2wlKKeQ=="},
+            ]
+        )
+        self.assertEqual(4, len(message.records))
+        self.assertEqual("p8n9gmxTQVC8/nh2wlKKeQ==", message.chunk_id)
+
+        with self.assertRaises(ForwardProtocolError):
+            self.unpack([self.tag, [[1719717434, "not a record"]]])
+
+    def test_forwarded_logs_are_routed_like_the_http_endpoint(self):
+        records = self.unpack(
+            [self.tag, [[1719717434, self.get_record(i)] for i in range(3)]]
+        ).records
+        records.append({"tag": self.tag, "time": "2024-06-30T03:17:14+00:00"})
+
+        self.assertEqual((3, 0), write_forwarded_logs(records))
+        self.assertEqual(3, SimpleLog.objects.count())
+        log: SimpleLog = SimpleLog.objects.first()
+        self.assertEqual("srv_dkr_LeeCqAUZJnJ", log.service_id)
+        self.assertEqual("dpl_dkr_KRbXo2FJput", log.deployment_id)
+        self.assertEqual(SimpleLog.LogSource.SERVICE, log.source)
+
+    def test_collector_acknowledges_stored_chunks_and_waits_for_the_connection_to_close(
+        self,
+    ):
+        written = []
+
+        def write_batch(records: list[dict]):
+            written.extend(records)
+            return len(records), 0
+
+        async def handle_connection():
+            collector = LogCollector(flush_interval=0.01)
+            flusher = asyncio.create_task(collector.flush_loop())
+            reader = asyncio.StreamReader()
+            reader.feed_data(
+                msgpack.packb(
+                    [
+                        self.tag,
+                        [[1719717434, self.get_record(i)] for i in range(2)],
+                        {"chunk": "p8n9gmxTQVC8/nh2wlKKeQ=="},
+                    ]
+                )
+            )
+            reader.feed_eof()
+            writer = MagicMock(drain=AsyncMock(), wait_closed=AsyncMock())
+            await collector.handle_connection(reader, writer)
+            flusher.cancel()
+            return writer
+
+        with patch.object(LogCollector, "write_batch", staticmethod(write_batch)):
+            writer = async_to_sync(handle_connection)()
+
+        self.assertEqual(2, len(written))
+        writer.write.assert_called_once_with(
+            msgpack.packb({"ack": "p8n9gmxTQVC8/nh2wlKKeQ=="})
+        )
+        writer.close.assert_called_once()
+        writer.wait_closed.assert_awaited_once()
+
+
+@override_settings(
+    LOGS_INGEST_MODE="queue", LOGS_QUEUE_MAX_LENGTH=1_000, LOGS_QUEUE_DRAIN_RATE=100
+)
+class QueuedLogCollectViewTests(AuthAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.fake_redis_client = MagicMock()
+        self.fake_redis_client.xlen.return_value = 0
+        patch(
+            "zane_api.log_queue.get_redis_client",
+            return_value=self.fake_redis_client,
+        ).start()
+
+    @staticmethod
+    def get_logs(count: int = 3, start: int = 0):
+        return [
+            {
+                "log": f"1:M 30 Jun 2024 03:17:14.376 * line #{start + i}",
+                "container_id": "78dfe81bb4b3994eeb38f65f5a586084a2b4a649c0ab08b614d0f4c2cb499761",
+                "container_name": "/srv-prj_ssbvBaqpbD7-srv_dkr_LeeCqAUZJnJ-dpl_dkr_KRbXo2FJput.1.zm0uncmx8w4wvnokdl6qxt55e",
+                "time": "2024-06-30T03:17:14Z",
+                "tag": json.dumps(
+                    {
+                        "deployment_id": "dpl_dkr_KRbXo2FJput",
+                        "service_id": "srv_dkr_LeeCqAUZJnJ",
+                    }
+                ),
+                "source": "stdout",
+            }
+            for i in range(count)
+        ]
+
+    def get_queued_entries(self):
+        return [
+            (
+                f"1719717434000-{i}".encode(),
+                {
+                    key.encode(): value.encode() if type(value) is str else value
+                    for key, value in call.args[1].items()
+                },
+            )
+            for i, call in enumerate(self.fake_redis_client.xadd.call_args_list)
+        ]
+
+    def test_logs_are_queued_and_written_by_the_queue_writer(self):
+        response = self.client.post(reverse("zane_api:logs.tail"), data=self.get_logs())
+        self.assertEqual(status.HTTP_202_ACCEPTED, response.status_code)
+        self.assertEqual(0, SimpleLog.objects.count())
+
+        response = self.client.generic(
+            "POST",
+            reverse("zane_api:logs.tail"),
+            data=gzip.compress(msgpack.packb(self.get_logs(2, start=3))),
+            content_type="application/msgpack",
+            HTTP_CONTENT_ENCODING="gzip",
+        )
+        self.assertEqual(status.HTTP_202_ACCEPTED, response.status_code)
+
+        self.assertEqual((5, 0), write_queued_batches(self.get_queued_entries()))
+        self.assertEqual(5, SimpleLog.objects.count())
+
+    def test_logs_are_rejected_when_the_queue_is_full(self):
+        self.fake_redis_client.xlen.return_value = 1_250
+        response = self.client.post(reverse("zane_api:logs.tail"), data=self.get_logs())
+        self.assertEqual(status.HTTP_429_TOO_MANY_REQUESTS, response.status_code)
+        self.assertEqual("3", response.headers.get("Retry-After"))
+        self.fake_redis_client.xadd.assert_not_called()
+
+    def test_queue_writer_acks_malformed_and_deleted_batches(self):
+        self.client.post(reverse("zane_api:logs.tail"), data=self.get_logs())
+        self.client.post(reverse("zane_api:logs.tail"), data="[{not json")
+        entries = self.get_queued_entries() + [(b"1719717434000-9", {})]
+
+        writer = LogQueueWriter(consumer_name="writer-1")
+        writer.process(entries)
+
+        self.assertEqual(3, SimpleLog.objects.count())
+        self.fake_redis_client.xack.assert_called_once_with(
+            writer.stream, writer.group, *[entry_id for entry_id, _ in entries]
+        )
+        self.fake_redis_client.xdel.assert_called_once_with(
+            writer.stream, *[entry_id for entry_id, _ in entries]
+        )
+
+    def test_queue_writer_drops_batches_rejected_by_the_database(self):
+        for start in (0, 3, 6):
+            self.client.post(
+                reverse("zane_api:logs.tail"), data=self.get_logs(start=start)
+            )
+        entries = self.get_queued_entries()
+
+        def fail_on_second_batch(logs):
+            if "line #3" in logs[0]["log"]:
+                with connection.cursor() as cursor:
+                    cursor.execute("SELECT 1 / 0")
+            return ingest_container_logs(logs)
+
+        writer = LogQueueWriter(consumer_name="writer-1")
+        with patch(
+            "zane_api.log_queue.log_ingestion.ingest_container_logs",
+            side_effect=fail_on_second_batch,
+        ):
+            writer.process(entries)
+
+        self.assertEqual(
+            {f"1:M 30 Jun 2024 03:17:14.376 * line #{i}" for i in (0, 1, 2, 6, 7, 8)},
+            set(SimpleLog.objects.values_list("content", flat=True)),
+        )
+        self.fake_redis_client.xack.assert_called_once_with(
+            writer.stream, writer.group, *[entry_id for entry_id, _ in entries]
+        )
+
+    def test_queue_writer_retries_batches_when_the_database_is_unavailable(self):
+        self.client.post(reverse("zane_api:logs.tail"), data=self.get_logs())
+        self.client.post(reverse("zane_api:logs.tail"), data=self.get_logs(start=3))
+        ingest_calls = []
+
+        def fail_on_second_batch(logs):
+            ingest_calls.append(logs)
+            if len(ingest_calls) == 2:
+                raise OperationalError("server closed the connection unexpectedly")
+            return ingest_container_logs(logs)
+
+        writer = LogQueueWriter(consumer_name="writer-1")
+        with patch(
+            "zane_api.log_queue.log_ingestion.ingest_container_logs",
+            side_effect=fail_on_second_batch,
+        ), patch("zane_api.log_queue.time.sleep") as sleep:
+            writer.process(self.get_queued_entries())
+
+        sleep.assert_called_once()
+        self.assertEqual(0, SimpleLog.objects.count())
+        self.fake_redis_client.xack.assert_not_called()
+        self.fake_redis_client.xdel.assert_not_called()
+
+
+class LogPartitionTests(AuthAPITestCase):
+    def test_create_partitions_ahead(self):
+        created = create_log_partitions(days_ahead=2, start=datetime.date(2024, 7, 1))
+        self.assertEqual(
+            [
+                "zane_api_simplelog_20240701",
+                "zane_api_simplelog_20240702",
+                "zane_api_simplelog_20240703",
+                "zane_api_simplelogfield_20240701",
+                "zane_api_simplelogfield_20240702",
+                "zane_api_simplelogfield_20240703",
+                "zane_api_httplog_20240701",
+                "zane_api_httplog_20240702",
+                "zane_api_httplog_20240703",
+            ],
+            created,
+        )
+        self.assertEqual(
+            [], create_log_partitions(days_ahead=2, start=datetime.date(2024, 7, 1))
+        )
+
+    def test_logs_in_the_default_partition_are_moved_to_the_new_partition(self):
+        SimpleLog.objects.create(
+            content="hello", time=datetime.datetime(2024, 7, 1, 12, tzinfo=datetime.UTC)
+        )
+        create_log_partitions(days_ahead=0, start=datetime.date(2024, 7, 1))
+
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT count(*) FROM zane_api_simplelog_20240701")
+            self.assertEqual((1,), cursor.fetchone())
+            cursor.execute("SELECT count(*) FROM zane_api_simplelog_default")
+            self.assertEqual((0,), cursor.fetchone())
+        self.assertEqual(1, SimpleLog.objects.count())
+
+    def test_drop_expired_partitions(self):
+        create_log_partitions(days_ahead=2, start=datetime.date(2024, 7, 1))
+        for day in (1, 2, 3):
+            SimpleLog.objects.create(
+                content=f"day #{day}",
+                time=datetime.datetime(2024, 7, day, 12, tzinfo=datetime.UTC),
+            )
+        # older than any partition, stored in the default partition
+        SimpleLog.objects.create(
+            content="old", time=datetime.datetime(2024, 1, 1, tzinfo=datetime.UTC)
+        )
+
+        dropped, deleted_count = drop_expired_log_partitions(
+            retention_days=1,
+            now=datetime.datetime(2024, 7, 4, 6, tzinfo=datetime.UTC),
+        )
+        self.assertEqual(
+            [
+                "zane_api_simplelog_20240701",
+                "zane_api_simplelog_20240702",
+                "zane_api_simplelogfield_20240701",
+                "zane_api_simplelogfield_20240702",
+                "zane_api_httplog_20240701",
+                "zane_api_httplog_20240702",
+            ],
+            dropped,
+        )
+        self.assertEqual(1, deleted_count)
+        self.assertEqual(
+            ["day #3"], list(SimpleLog.objects.values_list("content", flat=True))
+        )
+
+
+class LogRetentionTests(AuthAPITestCase):
+    def create_service_logs(self, service_id: str, now: datetime.datetime):
+        for days_ago in (1, 5, 10):
+            SimpleLog.objects.create(
+                content=f"{days_ago} days ago",
+                service_id=service_id,
+                time=now - datetime.timedelta(days=days_ago),
+            )
+            HttpLog.objects.create(
+                service_id=service_id,
+                time=now - datetime.timedelta(days=days_ago),
+                request_method=HttpLog.RequestMethod.GET,
+                status=200,
+                request_duration_ms=15,
+                request_host="redis.zaneops.local",
+                request_uri="/",
+                request_ip="127.0.0.1",
+            )
+
+    def test_update_service_logs_retention(self):
+        owner = self.loginUser()
+        project = Project.objects.create(slug="zaneops", owner=owner)
+        service = DockerRegistryService.objects.create(slug="redis", project=project)
+
+        url = reverse(
+            "zane_api:services.docker.log_settings",
+            kwargs={"project_slug": "zaneops", "service_slug": "redis"},
+        )
+        response = self.client.patch(url, data={"logs_retention_days": 3})
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        service.refresh_from_db()
+        self.assertEqual(3, service.logs_retention_days)
+
+        response = self.client.get(url)
+        self.assertEqual(
+            {
+                "logs_retention_days": 3,
+                "logs_rate_limit": None,
+                "logs_overflow_sample_rate": 0.0,
+                "logs_multiline_pattern": None,
+                "logs_extracted_fields": [],
+            },
+            response.json(),
+        )
+
+        response = self.client.patch(url, data={"logs_retention_days": 365})
+        self.assertEqual(status.HTTP_400_BAD_REQUEST, response.status_code)
+
+    def test_purge_logs_older_than_the_retention_of_the_service(self):
+        owner = self.loginUser()
+        project = Project.objects.create(
+            slug="zaneops", owner=owner, logs_retention_days=7
+        )
+        service = DockerRegistryService.objects.create(
+            slug="redis", project=project, logs_retention_days=3
+        )
+        other_service = DockerRegistryService.objects.create(
+            slug="caddy", project=project
+        )
+        default_service = DockerRegistryService.objects.create(
+            slug="app",
+            project=Project.objects.create(slug="sandbox", owner=owner),
+        )
+
+        now = datetime.datetime.now(tz=datetime.UTC)
+        for service_id in (service.id, other_service.id, default_service.id):
+            self.create_service_logs(service_id, now)
+
+        reports = purge_expired_service_logs(chunk_size=1, now=now)
+        self.assertEqual(
+            {(service.id, 3, 4), (other_service.id, 7, 2)},
+            {
+                (report.service_id, report.retention_days, report.rows_deleted)
+                for report in reports
+            },
+        )
+        self.assertTrue(all(report.bytes_reclaimed > 0 for report in reports))
+        self.assertEqual(
+            ["1 days ago"],
+            list(
+                SimpleLog.objects.filter(service_id=service.id).values_list(
+                    "content", flat=True
+                )
+            ),
+        )
+        self.assertEqual(2, HttpLog.objects.filter(service_id=other_service.id).count())
+        self.assertEqual(
+            3, SimpleLog.objects.filter(service_id=default_service.id).count()
+        )
+
+
+class LogArchiveTests(AuthAPITestCase):
+    def setUp(self):
+        super().setUp()
+        archive_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(archive_dir.cleanup)
+        override = override_settings(LOGS_ARCHIVE_DIR=archive_dir.name)
+        override.enable()
+        self.addCleanup(override.disable)
+        # small blocks, to have many blocks per segment
+        patch("zane_api.log_archive.LOG_SEGMENT_BLOCK_SIZE", 10).start()
+
+    @staticmethod
+    def create_logs(service_id: str, start: datetime.datetime, count: int):
+        SimpleLog.objects.bulk_create(
+            [
+                SimpleLog(
+                    content=f"line #{i}",
+                    service_id=service_id,
+                    deployment_id="dpl_dkr_KRbXo2FJput",
+                    time=start + datetime.timedelta(minutes=i),
+                )
+                for i in range(count)
+            ]
+        )
+
+    def test_archive_old_logs_into_daily_segments(self):
+        day = datetime.datetime(2024, 7, 1, tzinfo=datetime.UTC)
+        self.create_logs("srv_dkr_LeeCqAUZJnJ", day, 100)
+        self.create_logs("srv_dkr_LeeCqAUZJnJ", day + datetime.timedelta(days=1), 5)
+        self.create_logs("srv_dkr_LeeCqAUZJnJ", day + datetime.timedelta(days=9), 5)
+
+        archived = archive_old_logs(
+            archive_after_days=7, now=day + datetime.timedelta(days=9, hours=1)
+        )
+        self.assertEqual({"srv_dkr_LeeCqAUZJnJ": 105}, archived)
+        self.assertEqual(5, SimpleLog.objects.count())
+        self.assertEqual(
+            [datetime.date(2024, 7, 1), datetime.date(2024, 7, 2)],
+            list_segment_days("srv_dkr_LeeCqAUZJnJ"),
+        )
+
+        logs = list(iter_archived_logs("srv_dkr_LeeCqAUZJnJ"))
+        self.assertEqual(105, len(logs))
+        self.assertEqual("line #0", logs[0]["content"])
+        self.assertEqual(day, logs[0]["time"])
+
+    def test_read_a_time_range_of_the_archived_logs(self):
+        day = datetime.datetime(2024, 7, 1, tzinfo=datetime.UTC)
+        self.create_logs("srv_dkr_LeeCqAUZJnJ", day, 100)
+        archive_service_logs_of_day("srv_dkr_LeeCqAUZJnJ", day.date())
+
+        logs = list(
+            iter_archived_logs(
+                "srv_dkr_LeeCqAUZJnJ",
+                time_after=day + datetime.timedelta(minutes=15),
+                time_before=day + datetime.timedelta(minutes=42),
+            )
+        )
+        self.assertEqual(
+            [f"line #{i}" for i in range(15, 42)], [log["content"] for log in logs]
+        )
+
+    def test_logs_received_late_are_merged_into_the_segment(self):
+        day = datetime.datetime(2024, 7, 1, tzinfo=datetime.UTC)
+        self.create_logs("srv_dkr_LeeCqAUZJnJ", day, 20)
+        archive_service_logs_of_day("srv_dkr_LeeCqAUZJnJ", day.date())
+        self.create_logs("srv_dkr_LeeCqAUZJnJ", day + datetime.timedelta(seconds=30), 3)
+        archive_service_logs_of_day("srv_dkr_LeeCqAUZJnJ", day.date())
+
+        logs = list(iter_archived_logs("srv_dkr_LeeCqAUZJnJ"))
+        self.assertEqual(23, len(logs))
+        self.assertEqual(
+            sorted(log["time"] for log in logs), [log["time"] for log in logs]
+        )
+        self.assertEqual(0, SimpleLog.objects.count())
+
+    def test_logs_left_by_an_interrupted_archival_are_not_duplicated(self):
+        day = datetime.datetime(2024, 7, 1, tzinfo=datetime.UTC)
+        self.create_logs("srv_dkr_LeeCqAUZJnJ", day, 25)
+        # the segment was written, but the logs were not deleted
+        write_segment(
+            get_segment_path("srv_dkr_LeeCqAUZJnJ", day.date()),
+            SimpleLog.objects.order_by("time", "id").values(*ARCHIVED_LOG_FIELDS)[:15],
+        )
+
+        self.assertEqual(
+            25, archive_service_logs_of_day("srv_dkr_LeeCqAUZJnJ", day.date())
+        )
+        logs = list(iter_archived_logs("srv_dkr_LeeCqAUZJnJ"))
+        self.assertEqual(
+            [f"line #{i}" for i in range(25)], [log["content"] for log in logs]
+        )
+        self.assertEqual(0, SimpleLog.objects.count())
+
+    def test_delete_expired_segments(self):
+        day = datetime.datetime(2024, 7, 1, tzinfo=datetime.UTC)
+        for days in range(3):
+            self.create_logs(
+                "srv_dkr_LeeCqAUZJnJ", day + datetime.timedelta(days=days), 5
+            )
+            archive_service_logs_of_day(
+                "srv_dkr_LeeCqAUZJnJ", (day + datetime.timedelta(days=days)).date()
+            )
+
+        deleted_count, bytes_reclaimed = delete_expired_segments(
+            "srv_dkr_LeeCqAUZJnJ",
+            retention_days=1,
+            now=day + datetime.timedelta(days=3, hours=12),
+        )
+        self.assertEqual(2, deleted_count)
+        self.assertGreater(bytes_reclaimed, 0)
+        self.assertEqual(
+            [datetime.date(2024, 7, 3)], list_segment_days("srv_dkr_LeeCqAUZJnJ")
+        )
+
+
+class DockerServiceLogsViewTests(AuthAPITestCase):
+    def setUp(self):
+        super().setUp()
+        archive_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(archive_dir.cleanup)
+        override = override_settings(LOGS_ARCHIVE_DIR=archive_dir.name)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def create_service(self):
+        owner = self.loginUser()
+        project = Project.objects.create(slug="zaneops", owner=owner)
+        return DockerRegistryService.objects.create(slug="redis", project=project)
+
+    @staticmethod
+    def create_logs(
+        service_id: str, start: datetime.datetime, count: int, **kwargs
+    ) -> list[SimpleLog]:
+        return SimpleLog.objects.bulk_create(
+            [
+                SimpleLog(
+                    content=f"line #{i}",
+                    service_id=service_id,
+                    # pairs of logs with the same time, to check the tie-break on `id`
+                    time=start + datetime.timedelta(seconds=i // 2),
+                    **kwargs,
+                )
+                for i in range(count)
+            ]
+        )
+
+    def fetch_all_pages(self, url: str) -> list[dict]:
+        logs = []
+        while url is not None:
+            response = self.client.get(url)
+            self.assertEqual(status.HTTP_200_OK, response.status_code)
+            logs.extend(response.json()["results"])
+            url = response.json()["next"]
+        return logs
+
+    def test_service_logs_views_look_up_the_service_the_same_way(self):
+        self.create_service()
+        for name in ("services.docker.logs", "services.docker.log_settings"):
+            response = self.client.get(
+                reverse(
+                    f"zane_api:{name}",
+                    kwargs={"project_slug": "zaneops", "service_slug": "unknown"},
+                )
+            )
+            self.assertEqual(status.HTTP_404_NOT_FOUND, response.status_code)
+            self.assertEqual(
+                "A service with the slug `unknown` does not exist within the project `zaneops`",
+                response.json()["errors"][0]["detail"],
+            )
+
+    def test_paginate_service_logs_with_a_cursor(self):
+        service = self.create_service()
+        start = datetime.datetime(2024, 7, 1, tzinfo=datetime.UTC)
+        logs = self.create_logs(service.id, start, 25)
+        self.create_logs("srv_dkr_other", start, 5)
+        url = reverse(
+            "zane_api:services.docker.logs",
+            kwargs={"project_slug": "zaneops", "service_slug": "redis"},
+        )
+
+        response = self.client.get(url, {"per_page": 10})
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        first_page = response.json()
+        self.assertEqual(10, len(first_page["results"]))
+        self.assertIsNone(first_page["previous"])
+        self.assertNotIn("count", first_page)
+
+        expected_ids = [
+            str(log.id)
+            for log in sorted(
+                logs, key=lambda log: (log.time, str(log.id)), reverse=True
+            )
+        ]
+        self.assertEqual(
+            expected_ids,
+            [log["id"] for log in self.fetch_all_pages(url + "?per_page=10")],
+        )
+
+        # going back from the second page returns the first page
+        second_page = self.client.get(first_page["next"]).json()
+        self.assertEqual(
+            expected_ids[10:20], [log["id"] for log in second_page["results"]]
+        )
+        previous_page = self.client.get(second_page["previous"]).json()
+        self.assertEqual(first_page["results"], previous_page["results"])
+
+    def test_filter_service_logs(self):
+        service = self.create_service()
+        start = datetime.datetime(2024, 7, 1, tzinfo=datetime.UTC)
+        self.create_logs(service.id, start, 10, level=SimpleLog.LogLevel.INFO)
+        self.create_logs(service.id, start, 4, level=SimpleLog.LogLevel.ERROR)
+        url = reverse(
+            "zane_api:services.docker.logs",
+            kwargs={"project_slug": "zaneops", "service_slug": "redis"},
+        )
+
+        response = self.client.get(url, {"level": "ERROR"})
+        self.assertEqual(4, len(response.json()["results"]))
+
+        response = self.client.get(
+            url,
+            {
+                "level": "INFO",
+                "time_after": "2024-07-01T00:00:01Z",
+                "time_before": "2024-07-01T00:00:02Z",
+            },
+        )
+        self.assertEqual(4, len(response.json()["results"]))
+
+        response = self.client.get(url, {"cursor": "not-a-cursor"})
+        self.assertEqual(status.HTTP_404_NOT_FOUND, response.status_code)
+
+    def test_deployment_logs(self):
+        _, service = self.create_and_deploy_redis_docker_service()
+        deployment: DockerDeployment = service.deployments.first()
+        start = datetime.datetime(2024, 7, 1, tzinfo=datetime.UTC)
+        self.create_logs(service.id, start, 6, deployment_id=deployment.hash)
+        self.create_logs(service.id, start, 3, deployment_id="dpl_dkr_other")
+
+        response = self.client.get(
+            reverse(
+                "zane_api:services.docker.deployment_logs",
+                kwargs={
+                    "project_slug": "zaneops",
+                    "service_slug": "redis",
+                    "deployment_hash": deployment.hash,
+                },
+            )
+        )
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertEqual(6, len(response.json()["results"]))
+
+    def test_archived_logs_are_merged_with_the_logs_in_the_database(self):
+        service = self.create_service()
+        old_day = datetime.datetime(2024, 7, 1, tzinfo=datetime.UTC)
+        self.create_logs(service.id, old_day, 15)
+        archive_service_logs_of_day(service.id, old_day.date())
+        self.create_logs(service.id, old_day + datetime.timedelta(days=10), 15)
+        self.assertEqual(15, SimpleLog.objects.count())
+
+        url = reverse(
+            "zane_api:services.docker.logs",
+            kwargs={"project_slug": "zaneops", "service_slug": "redis"},
+        )
+        logs = self.fetch_all_pages(url + "?per_page=7")
+        self.assertEqual(30, len(logs))
+        self.assertEqual(
+            sorted([log["time"] for log in logs], reverse=True),
+            [log["time"] for log in logs],
+        )
+
+        response = self.client.get(
+            url, {"time_before": "2024-07-01T00:00:03Z", "per_page": 50}
+        )
+        self.assertEqual(8, len(response.json()["results"]))
+
+
+class LogSearchViewTests(AuthAPITestCase):
+    def setUp(self):
+        super().setUp()
+        archive_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(archive_dir.cleanup)
+        override = override_settings(LOGS_ARCHIVE_DIR=archive_dir.name)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def test_search_logs_content(self):
+        owner = self.loginUser()
+        project = Project.objects.create(slug="zaneops", owner=owner)
+        service = DockerRegistryService.objects.create(slug="redis", project=project)
+        start = datetime.datetime(2024, 7, 1, tzinfo=datetime.UTC)
+        contents = [
+            "Error: connect ECONNREFUSED 127.0.0.1:5432, connection refused",
+            "GET /api/users 200",
+            "dial tcp 10.0.0.4:6379: connection refused",
+            "connection established",
+            "1:M 30 Jun 2024 03:17:14.376 * Ready to accept connections tcp",
+        ]
+        SimpleLog.objects.bulk_create(
+            [
+                SimpleLog(
+                    content=content,
+                    service_id=service.id,
+                    time=start + datetime.timedelta(seconds=i),
+                )
+                for i, content in enumerate(contents)
+            ]
+        )
+        url = reverse(
+            "zane_api:services.docker.logs",
+            kwargs={"project_slug": "zaneops", "service_slug": "redis"},
+        )
+
+        response = self.client.get(url, {"q": '"connection refused"'})
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertEqual(
+            [contents[2], contents[0]],
+            [log["content"] for log in response.json()["results"]],
+        )
+
+        response = self.client.get(url, {"q": "connection -refused"})
+        self.assertEqual(
+            [contents[3]], [log["content"] for log in response.json()["results"]]
+        )
+
+        # archived logs are also searched
+        archive_service_logs_of_day(service.id, start.date())
+        response = self.client.get(url, {"q": '"connection refused"'})
+        self.assertEqual(
+            [contents[2], contents[0]],
+            [log["content"] for log in response.json()["results"]],
+        )
+        response = self.client.get(url, {"q": "connection -refused"})
+        self.assertEqual(
+            [contents[3]], [log["content"] for log in response.json()["results"]]
+        )
+
+
+class LiveTailTests(AuthAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.fake_redis_client = MagicMock()
+        patch(
+            "zane_api.log_live.get_redis_client", return_value=self.fake_redis_client
+        ).start()
+
+    def test_ingested_logs_are_published_to_their_deployment_channel(self):
+        logs = QueuedLogCollectViewTests.get_logs(3)
+        logs[2]["tag"] = json.dumps(
+            {"deployment_id": "dpl_dkr_other", "service_id": "srv_dkr_LeeCqAUZJnJ"}
+        )
+        response = self.client.post(reverse("zane_api:logs.tail"), data=logs)
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+
+        pipeline = self.fake_redis_client.pipeline.return_value
+        published = {
+            call.args[0]: json.loads(call.args[1])
+            for call in pipeline.publish.call_args_list
+        }
+        self.assertEqual(
+            {
+                get_live_tail_channel("dpl_dkr_KRbXo2FJput"),
+                get_live_tail_channel("dpl_dkr_other"),
+            },
+            set(published.keys()),
+        )
+        deployment_logs = published[get_live_tail_channel("dpl_dkr_KRbXo2FJput")]
+        self.assertEqual(2, len(deployment_logs))
+        # the published ids are the ones of the stored logs
+        self.assertEqual(
+            set(
+                str(log_id)
+                for log_id in SimpleLog.objects.filter(
+                    deployment_id="dpl_dkr_KRbXo2FJput"
+                ).values_list("id", flat=True)
+            ),
+            set(log["id"] for log in deployment_logs),
+        )
+        pipeline.execute.assert_called_once()
+
+    @override_settings(LOGS_RECENT_BUFFER_SIZE=100)
+    def test_ingested_logs_are_pushed_to_the_recent_logs_of_their_deployment(self):
+        logs = QueuedLogCollectViewTests.get_logs(3)
+        logs[0]["time"] = "2024-06-30T03:17:15Z"
+        response = self.client.post(reverse("zane_api:logs.tail"), data=logs)
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+
+        pipeline = self.fake_redis_client.pipeline.return_value
+        key, *entries = pipeline.lpush.call_args.args
+        self.assertEqual(get_recent_logs_key("dpl_dkr_KRbXo2FJput"), key)
+        # the newest log is pushed last to end up at the head of the list
+        self.assertEqual(
+            ["line #1", "line #2", "line #0"],
+            [json.loads(entry)["content"].split(" * ")[1] for entry in entries],
+        )
+        pipeline.ltrim.assert_called_once_with(key, 0, 99)
+
+    def test_first_page_of_deployment_logs_is_served_from_the_recent_logs(self):
+        _, service = self.create_and_deploy_redis_docker_service()
+        deployment: DockerDeployment = service.deployments.first()
+        start = datetime.datetime(2024, 7, 1, tzinfo=datetime.UTC)
+        logs = DockerServiceLogsViewTests.create_logs(
+            service.id, start, 12, deployment_id=deployment.hash
+        )
+        expected_ids = [
+            str(log.id)
+            for log in sorted(
+                logs, key=lambda log: (log.time, str(log.id)), reverse=True
+            )
+        ]
+        # the 8 most recent logs, not in order
+        self.fake_redis_client.lrange.return_value = [
+            json.dumps(
+                {
+                    field: getattr(log, field)
+                    for field in (
+                        "id",
+                        "service_id",
+                        "deployment_id",
+                        "time",
+                        "created_at",
+                        "content",
+                        "level",
+                        "source",
+                    )
+                },
+                cls=DjangoJSONEncoder,
+            )
+            for log in logs[4:]
+        ]
+        url = reverse(
+            "zane_api:services.docker.deployment_logs",
+            kwargs={
+                "project_slug": "zaneops",
+                "service_slug": "redis",
+                "deployment_hash": deployment.hash,
+            },
+        )
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, {"per_page": 5})
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertFalse(
+            any(
+                SimpleLog._meta.db_table in query["sql"]
+                for query in queries.captured_queries
+            )
+        )
+        self.assertEqual(
+            expected_ids[:5], [log["id"] for log in response.json()["results"]]
+        )
+        self.fake_redis_client.lrange.assert_called_once_with(
+            get_recent_logs_key(deployment.hash), 0, -1
+        )
+
+        # the next pages come from the database
+        response = self.client.get(response.json()["next"])
+        self.assertEqual(
+            expected_ids[5:10], [log["id"] for log in response.json()["results"]]
+        )
+
+        # not enough recent logs for the page
+        response = self.client.get(url, {"per_page": 10})
+        self.assertEqual(
+            expected_ids[:10], [log["id"] for log in response.json()["results"]]
+        )
+
+    def test_stream_deployment_logs_as_server_sent_events(self):
+        fake_pubsub = MagicMock()
+        fake_pubsub.subscribe = AsyncMock()
+        fake_pubsub.aclose = AsyncMock()
+        fake_pubsub.get_message = AsyncMock(
+            side_effect=[
+                {"type": "message", "data": b'[{"content": "line #0"}]'},
+                None,
+            ]
+        )
+        fake_client = MagicMock()
+        fake_client.pubsub.return_value = fake_pubsub
+        fake_client.aclose = AsyncMock()
+
+        async def read_events(count: int) -> list[str]:
+            stream = stream_deployment_logs("dpl_dkr_KRbXo2FJput", heartbeat_seconds=0)
+            events = [await anext(stream) for _ in range(count)]
+            await stream.aclose()
+            return events
+
+        with patch("redis.asyncio.Redis.from_url", return_value=fake_client):
+            events = async_to_sync(read_events)(3)
+
+        self.assertEqual("retry: 3000\n\n", events[0])
+        self.assertEqual('event: logs\ndata: [{"content": "line #0"}]\n\n', events[1])
+        self.assertEqual(": heartbeat\n\n", events[2])
+        fake_pubsub.subscribe.assert_awaited_once_with(
+            get_live_tail_channel("dpl_dkr_KRbXo2FJput")
+        )
+        fake_pubsub.aclose.assert_awaited_once()
+        fake_client.aclose.assert_awaited_once()
+
+    def test_tail_logs_of_a_deployment(self):
+        _, service = self.create_and_deploy_redis_docker_service()
+        deployment: DockerDeployment = service.deployments.first()
+        fake_pubsub = MagicMock()
+        fake_pubsub.subscribe = AsyncMock()
+        fake_pubsub.aclose = AsyncMock()
+        fake_pubsub.get_message = AsyncMock(
+            return_value={"type": "message", "data": b'[{"content": "line #0"}]'}
+        )
+        fake_client = MagicMock()
+        fake_client.pubsub.return_value = fake_pubsub
+        fake_client.aclose = AsyncMock()
+        self.async_client.force_login(service.project.owner)
+
+        def get_url(deployment_hash: str) -> str:
+            return reverse(
+                "zane_api:services.docker.deployment_logs_tail",
+                kwargs={
+                    "project_slug": "zaneops",
+                    "service_slug": "redis",
+                    "deployment_hash": deployment_hash,
+                },
+            )
+
+        async def read_events(url: str, count: int):
+            response = await self.async_client.get(url)
+            if not response.streaming:
+                return response, []
+            # the stream never ends, only its first events are read
+            stream = aiter(response.streaming_content)
+            events = [(await anext(stream)).decode() for _ in range(count)]
+            await stream.aclose()
+            return response, events
+
+        with patch("redis.asyncio.Redis.from_url", return_value=fake_client):
+            response, events = async_to_sync(read_events)(get_url(deployment.hash), 2)
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertEqual("text/event-stream", response["Content-Type"])
+        self.assertEqual(
+            ["retry: 3000\n\n", 'event: logs\ndata: [{"content": "line #0"}]\n\n'],
+            events,
+        )
+        fake_pubsub.subscribe.assert_awaited_once_with(
+            get_live_tail_channel(deployment.hash)
+        )
+        fake_pubsub.aclose.assert_awaited_once()
+
+        response, _ = async_to_sync(read_events)(get_url("dpl_dkr_unknown"), 0)
+        self.assertEqual(status.HTTP_404_NOT_FOUND, response.status_code)
+
+        self.async_client.logout()
+        response, _ = async_to_sync(read_events)(get_url(deployment.hash), 0)
+        self.assertEqual(status.HTTP_401_UNAUTHORIZED, response.status_code)
+
+    def test_tail_logs_is_refused_when_served_by_wsgi(self):
+        _, service = self.create_and_deploy_redis_docker_service()
+        deployment: DockerDeployment = service.deployments.first()
+        response = self.client.get(
+            reverse(
+                "zane_api:services.docker.deployment_logs_tail",
+                kwargs={
+                    "project_slug": "zaneops",
+                    "service_slug": "redis",
+                    "deployment_hash": deployment.hash,
+                },
+            )
+        )
+        self.assertEqual(status.HTTP_501_NOT_IMPLEMENTED, response.status_code)
+        self.assertFalse(response.streaming)
+
+
+class HttpLogRollupTests(AuthAPITestCase):
+    @staticmethod
+    def get_http_log(
+        deployment_id: str, time: datetime.datetime, status_code: int, duration: int
+    ):
+        return dict(
+            time=time,
+            deployment_id=deployment_id,
+            service_id="srv_dkr_LeeCqAUZJnJ",
+            request_method=HttpLog.RequestMethod.GET,
+            status=status_code,
+            request_duration_ms=duration,
+            request_host="redis.zaneops.local",
+            request_uri="/users?page=1" if duration % 2 == 0 else "/health",
+            request_ip="10.0.0.2",
+        )
+
+    def test_histogram_buckets(self):
+        previous_upper = 0
+        for index in range(HISTOGRAM_BUCKET_COUNT):
+            lower, upper = get_bucket_bounds(index)
+            # the buckets are contiguous
+            self.assertEqual(previous_upper, lower)
+            self.assertEqual(index, get_bucket_index(lower))
+            self.assertEqual(index, get_bucket_index(upper - 1))
+            # with a relative error bounded to 12.5%
+            self.assertLessEqual(upper - 1 - lower, max(lower / 8, 0))
+            previous_upper = upper
+        self.assertEqual(HISTOGRAM_MAX_VALUE + 1, previous_upper)
+        self.assertEqual(HISTOGRAM_BUCKET_COUNT - 1, get_bucket_index(10**12))
+
+        histogram = new_histogram()
+        for duration in range(1, 1001):
+            histogram[get_bucket_index(duration)] += 1
+        self.assertIsNone(get_percentile(new_histogram(), 50))
+        for percentile, exact in ((50, 500), (95, 950), (99, 990)):
+            estimation = get_percentile(histogram, percentile)
+            self.assertGreaterEqual(estimation, exact)
+            self.assertLessEqual(estimation, exact * 1.125)
+
+    def test_rollups_are_merged_on_ingest(self):
+        minute = datetime.datetime(2024, 7, 1, 10, 30, tzinfo=datetime.UTC)
+        first_batch = [
+            self.get_http_log(
+                "dpl_dkr_KRbXo2FJput",
+                minute + datetime.timedelta(seconds=i),
+                500 if i % 10 == 0 else 200,
+                i,
+            )
+            for i in range(50)
+        ]
+        second_batch = [
+            self.get_http_log(
+                "dpl_dkr_KRbXo2FJput",
+                minute + datetime.timedelta(seconds=50 + i // 2),
+                404,
+                50 + i,
+            )
+            for i in range(20)
+        ]
+        upsert_http_log_rollups(aggregate_http_logs(first_batch))
+        upsert_http_log_rollups(aggregate_http_logs(second_batch))
+
+        self.assertEqual(
+            {"", "/users", "/health"},
+            set(HttpLogRollup.objects.values_list("request_path", flat=True)),
+        )
+        total: HttpLogRollup = HttpLogRollup.objects.get(request_path="")
+        self.assertEqual(minute, total.minute)
+        self.assertEqual(70, total.request_count)
+        self.assertEqual(45, total.status_2xx_count)
+        self.assertEqual(20, total.status_4xx_count)
+        self.assertEqual(5, total.status_5xx_count)
+        self.assertEqual(sum(range(70)), total.duration_sum_ms)
+        self.assertEqual(69, total.duration_max_ms)
+        self.assertEqual(70, sum(total.duration_histogram))
+        self.assertEqual(
+            35, HttpLogRollup.objects.get(request_path="/users").request_count
+        )
+
+    def test_http_metrics_are_read_from_the_rollups(self):
+        _, service = self.create_and_deploy_redis_docker_service()
+        deployment: DockerDeployment = service.deployments.first()
+        start = datetime.datetime(2024, 7, 1, 10, 0, tzinfo=datetime.UTC)
+        http_logs = [
+            self.get_http_log(
+                deployment.hash,
+                start + datetime.timedelta(minutes=minute, seconds=i),
+                200,
+                (minute + 1) * 10,
+            )
+            for minute in range(3)
+            for i in range(10)
+        ]
+        upsert_http_log_rollups(aggregate_http_logs(http_logs))
+        url = reverse(
+            "zane_api:services.docker.deployment_http_metrics",
+            kwargs={
+                "project_slug": "zaneops",
+                "service_slug": "redis",
+                "deployment_hash": deployment.hash,
+            },
+        )
+        params = {
+            "time_after": "2024-07-01T09:00:00Z",
+            "time_before": "2024-07-01T11:00:00Z",
+        }
+
+        response = self.client.get(url, params)
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        metrics = response.json()
+        self.assertEqual(3, len(metrics))
+        self.assertEqual([10, 10, 10], [item["request_count"] for item in metrics])
+        self.assertEqual(10, metrics[0]["p99_duration_ms"])
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, {**params, "interval": "hour"})
+        self.assertFalse(
+            any(
+                f'"{HttpLog._meta.db_table}"' in query["sql"]
+                for query in queries.captured_queries
+            )
+        )
+        (metrics,) = response.json()
+        self.assertEqual("2024-07-01T10:00:00Z", metrics["time"])
+        self.assertEqual(30, metrics["request_count"])
+        self.assertEqual(30, metrics["duration_max_ms"])
+        self.assertEqual(20.0, metrics["avg_duration_ms"])
+        # highest value of the bucket of 20ms
+        self.assertEqual(21, metrics["p50_duration_ms"])
+        self.assertEqual(31, metrics["p99_duration_ms"])
+
+        response = self.client.get(url, {**params, "request_path": "/users"})
+        self.assertEqual(
+            [10, 10, 10], [item["request_count"] for item in response.json()]
+        )
+        response = self.client.get(url, {**params, "request_path": "/health"})
+        self.assertEqual([], response.json())
+
+    def test_rollups_are_shared_by_the_paths_of_the_same_route(self):
+        minute = datetime.datetime(2024, 7, 1, 10, 30, tzinfo=datetime.UTC)
+        request_uris = [
+            "/users/42?page=1",
+            "/users/43/posts",
+            "/users/3f2504e0-4f89-11d3-9a0c-0305e82c3301",
+            "/commits/9fceb02d0ae598e95dc970b74767f19372d61af8",
+            "/api/v1/users/44",
+            "/",
+        ]
+        http_logs = [
+            dict(
+                self.get_http_log("dpl_dkr_KRbXo2FJput", minute, 200, 10),
+                request_uri=request_uri,
+            )
+            for request_uri in request_uris * 2
+        ]
+        upsert_http_log_rollups(aggregate_http_logs(http_logs))
+
+        self.assertEqual(
+            {
+                "": 12,
+                "/users/:id": 2,
+                "/users/:id/posts": 2,
+                "/users/:uuid": 2,
+                "/commits/:hash": 2,
+                "/api/v1/users/:id": 2,
+                "/": 2,
+            },
+            dict(HttpLogRollup.objects.values_list("request_path", "request_count")),
+        )
+        # the paths of the metrics API are normalized the same way
+        self.assertEqual("/users/:id", get_request_path("/users/99"))
+
+
+class LogDedupeTests(AuthAPITestCase):
+    def test_lines_sent_again_are_only_stored_once(self):
+        logs = QueuedLogCollectViewTests.get_logs(3)
+        response = self.client.post(reverse("zane_api:logs.tail"), data=logs)
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertEqual(3, response.json()["simple_logs_inserted"])
+
+        # fluentd retrying the batch with a new line
+        logs.append(QueuedLogCollectViewTests.get_logs(1, start=3)[0])
+        response = self.client.post(reverse("zane_api:logs.tail"), data=logs)
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertEqual(1, response.json()["simple_logs_inserted"])
+        self.assertEqual(4, SimpleLog.objects.count())
+        self.assertEqual(4, SimpleLog.objects.values("dedupe_key").distinct().count())
+
+    def test_identical_lines_in_the_same_second_are_all_stored(self):
+        logs = QueuedLogCollectViewTests.get_logs(1) * 3
+        logs[0] = {**logs[0], "log": ""}
+        logs.append(dict(logs[0]))
+        response = self.client.post(reverse("zane_api:logs.tail"), data=logs)
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertEqual(4, response.json()["simple_logs_inserted"])
+
+        # the same batch retried by fluentd
+        response = self.client.post(reverse("zane_api:logs.tail"), data=logs)
+        self.assertEqual(0, response.json()["simple_logs_inserted"])
+        self.assertEqual(4, SimpleLog.objects.count())
+
+    def test_access_logs_sent_again_are_not_counted_twice(self):
+        _, service = self.create_and_deploy_redis_docker_service()
+        deployment: DockerDeployment = service.deployments.first()
+        access_log = {
+            "level": "info",
+            "ts": 1719324985.9711,
+            "logger": "http.log.access.log0",
+            "msg": "handled request",
+            "request": {
+                "remote_ip": "10.0.0.2",
+                "remote_port": "37420",
+                "client_ip": "10.0.0.2",
+                "proto": "HTTP/1.1",
+                "method": "GET",
+                "host": "redis.zaneops.local",
+                "uri": "/",
+                "headers": {"Accept": ["*/*"]},
+            },
+            "bytes_read": 0,
+            "user_id": "",
+            "duration": 0.041519349,
+            "size": 238,
+            "status": 200,
+            "resp_headers": {"Content-Length": ["238"]},
+            "zane_deployment_current_hash": deployment.hash,
+            "zane_deployment_current_slot": "blue",
+            "zane_deployment_upstream": "",
+        }
+        logs = [
+            {
+                "source": "stdout",
+                "log": json.dumps(access_log),
+                "container_id": "8320676fc77bb91b54f0dff7015c08148fd3021db7038c8d0c18ec7378e1979e",
+                "container_name": "/zane_zane-proxy.1.kj2d879vqbnpishh4d66i47do",
+                "time": "2024-06-25T14:16:25+0000",
+                "tag": json.dumps({"service_id": "zane.proxy"}),
+            }
+        ]
+
+        for expected_count in (1, 0):
+            response = self.client.post(reverse("zane_api:logs.tail"), data=logs)
+            self.assertEqual(expected_count, response.json()["http_logs_inserted"])
+        self.assertEqual(1, HttpLog.objects.count())
+        self.assertEqual(1, SimpleLog.objects.count())
+        self.assertEqual(
+            1,
+            HttpLogRollup.objects.get(
+                deployment_id=deployment.hash, request_path=""
+            ).request_count,
+        )
+
+    def test_copy_and_bulk_create_writers_skip_the_stored_rows(self):
+        def get_rows(dedupe_keys: list[uuid.UUID | None]):
+            return [
+                dict(
+                    content=f"line #{i}",
+                    time=datetime.datetime(2024, 7, 1, tzinfo=datetime.UTC),
+                    dedupe_key=dedupe_key,
+                )
+                for i, dedupe_key in enumerate(dedupe_keys)
+            ]
+
+        first_key, second_key = uuid.uuid4(), uuid.uuid4()
+        for use_copy in (True, False):
+            self.assertEqual(
+                3,
+                write_logs(
+                    SimpleLog,
+                    get_rows([first_key, None, first_key, second_key]),
+                    use_copy=use_copy,
+                ),
+            )
+            inserted = insert_logs(
+                SimpleLog, get_rows([second_key, None]), use_copy=use_copy
+            )
+            self.assertEqual(["line #1"], [row["content"] for row in inserted])
+            self.assertEqual(4, SimpleLog.objects.count())
+            SimpleLog.objects.all().delete()
+
+    def test_bulk_create_writer_skips_the_rows_stored_concurrently(self):
+        time = datetime.datetime(2024, 7, 1, tzinfo=datetime.UTC)
+        first_key, second_key = uuid.uuid4(), uuid.uuid4()
+        bulk_create = SimpleLog.objects.bulk_create
+
+        def bulk_create_after_another_batch(*args, **kwargs):
+            # stored by a concurrent batch, after the stored dedupe keys were read
+            SimpleLog.objects.create(content="other", time=time, dedupe_key=first_key)
+            return bulk_create(*args, **kwargs)
+
+        with patch.object(
+            SimpleLog.objects,
+            "bulk_create",
+            side_effect=bulk_create_after_another_batch,
+        ):
+            inserted = insert_logs(
+                SimpleLog,
+                [
+                    dict(content="line #0", time=time, dedupe_key=first_key),
+                    dict(content="line #1", time=time, dedupe_key=second_key),
+                ],
+                use_copy=False,
+            )
+        self.assertEqual(["line #1"], [row["content"] for row in inserted])
+        self.assertEqual(
+            {"other", "line #1"},
+            set(SimpleLog.objects.values_list("content", flat=True)),
+        )
+
+
+@override_settings(LOGS_SERVICE_RATE_LIMIT=1, LOGS_RATE_LIMIT_WINDOW_SECONDS=5)
+class LogRateLimitTests(AuthAPITestCase):
+    def setUp(self):
+        super().setUp()
+        # all the batches are received in the same window
+        fake_time = patch("zane_api.log_rate_limit.time").start()
+        fake_time.time.return_value = 1719717430.0
+
+    def get_service_logs(self) -> list[str]:
+        return list(
+            SimpleLog.objects.filter(
+                service_id="srv_dkr_LeeCqAUZJnJ", source=SimpleLog.LogSource.SERVICE
+            )
+            .order_by("content")
+            .values_list("content", flat=True)
+        )
+
+    def test_lines_over_the_budget_of_the_service_are_dropped(self):
+        response = self.client.post(
+            reverse("zane_api:logs.tail"),
+            data=QueuedLogCollectViewTests.get_logs(8),
+        )
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        # the budget is 1 line per second for a window of 5 seconds
+        self.assertEqual(5, len(self.get_service_logs()))
+        system_log: SimpleLog = SimpleLog.objects.get(source=SimpleLog.LogSource.SYSTEM)
+        self.assertEqual("srv_dkr_LeeCqAUZJnJ", system_log.service_id)
+        self.assertEqual("dpl_dkr_KRbXo2FJput", system_log.deployment_id)
+        self.assertEqual(
+            "3 log lines dropped, the service exceeded its limit of 1 lines per second",
+            system_log.content,
+        )
+
+        # the budget is shared by the following batches of the window
+        self.client.post(
+            reverse("zane_api:logs.tail"),
+            data=QueuedLogCollectViewTests.get_logs(2, start=8),
+        )
+        self.assertEqual(5, len(self.get_service_logs()))
+        self.assertEqual(
+            2, SimpleLog.objects.filter(source=SimpleLog.LogSource.SYSTEM).count()
+        )
+
+    def test_lines_over_the_budget_are_sampled(self):
+        owner = self.loginUser()
+        project = Project.objects.create(slug="zaneops", owner=owner)
+        DockerRegistryService.objects.create(
+            id="srv_dkr_LeeCqAUZJnJ",
+            slug="redis",
+            project=project,
+            logs_rate_limit=2,
+        )
+        url = reverse(
+            "zane_api:services.docker.log_settings",
+            kwargs={"project_slug": "zaneops", "service_slug": "redis"},
+        )
+        response = self.client.patch(url, data={"logs_overflow_sample_rate": 0.25})
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        response = self.client.patch(url, data={"logs_overflow_sample_rate": 2})
+        self.assertEqual(status.HTTP_400_BAD_REQUEST, response.status_code)
+
+        self.client.post(
+            reverse("zane_api:logs.tail"),
+            data=QueuedLogCollectViewTests.get_logs(18),
+        )
+        # 10 lines within the budget, then 1 line out of 4
+        self.assertEqual(12, len(self.get_service_logs()))
+        self.assertEqual(
+            "6 log lines dropped, the service exceeded its limit of 2 lines per second",
+            SimpleLog.objects.get(source=SimpleLog.LogSource.SYSTEM).content,
+        )
+
+
+class SimpleLogLayoutTests(AuthAPITestCase):
+    def test_only_json_lines_are_stored_parsed(self):
+        self.assertEqual(
+            (None, {"msg": "ready"}), parse_log_content('{"msg": "ready"}')
+        )
+        self.assertEqual((None, [1, 2]), parse_log_content(" [1, 2]"))
+        self.assertEqual(("{not json", None), parse_log_content("{not json"))
+        self.assertEqual(("42", None), parse_log_content("42"))
+        self.assertEqual(("ready", None), parse_log_content("ready"))
+
+    def test_json_content_is_searched_and_returned_parsed(self):
+        owner = self.loginUser()
+        project = Project.objects.create(slug="zaneops", owner=owner)
+        service = DockerRegistryService.objects.create(slug="redis", project=project)
+        SimpleLog.objects.bulk_create(
+            [
+                SimpleLog(
+                    content="connection refused",
+                    service_id=service.id,
+                    time=datetime.datetime(2024, 7, 1, tzinfo=datetime.UTC),
+                ),
+                SimpleLog(
+                    content_json={"msg": "connection established"},
+                    service_id=service.id,
+                    time=datetime.datetime(2024, 7, 1, 0, 1, tzinfo=datetime.UTC),
+                ),
+            ]
+        )
+        url = reverse(
+            "zane_api:services.docker.logs",
+            kwargs={"project_slug": "zaneops", "service_slug": "redis"},
+        )
+        response = self.client.get(url)
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertEqual(
+            [{"msg": "connection established"}, "connection refused"],
+            [log["content"] for log in response.json()["results"]],
+        )
+
+        response = self.client.get(url, {"q": "established"})
+        self.assertEqual(
+            [{"msg": "connection established"}],
+            [log["content"] for log in response.json()["results"]],
+        )
+
+    def test_level_and_source_are_stored_as_codes(self):
+        SimpleLog.objects.create(
+            content="hello",
+            level=SimpleLog.LogLevel.ERROR,
+            source=SimpleLog.LogSource.PROXY,
+            time=datetime.datetime(2024, 7, 1, tzinfo=datetime.UTC),
+        )
+        write_logs(
+            SimpleLog,
+            [
+                dict(
+                    content="world",
+                    time=datetime.datetime(2024, 7, 1, 0, 1, tzinfo=datetime.UTC),
+                )
+            ],
+            use_copy=True,
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT "level", "source" FROM "zane_api_simplelog" ORDER BY "time"'
+            )
+            self.assertEqual([(0, 1), (1, 2)], cursor.fetchall())
+
+        self.assertEqual(
+            ["hello"],
+            list(
+                SimpleLog.objects.filter(
+                    level=SimpleLog.LogLevel.ERROR,
+                    source__in=[SimpleLog.LogSource.PROXY, SimpleLog.LogSource.SYSTEM],
+                ).values_list("content", flat=True)
+            ),
+        )
+        self.assertEqual(
+            [("ERROR", "PROXY"), ("INFO", "SERVICE")],
+            list(SimpleLog.objects.order_by("time").values_list("level", "source")),
+        )
+
+    def test_segments_archived_before_content_json_are_read(self):
+        archive_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(archive_dir.cleanup)
+        time = datetime.datetime(2024, 7, 1, tzinfo=datetime.UTC)
+        with override_settings(LOGS_ARCHIVE_DIR=archive_dir.name):
+            write_segment(
+                get_segment_path("srv_dkr_LeeCqAUZJnJ", time.date()),
+                [
+                    dict(
+                        id=uuid.uuid4(),
+                        created_at=time,
+                        service_id="srv_dkr_LeeCqAUZJnJ",
+                        deployment_id="dpl_dkr_KRbXo2FJput",
+                        time=time,
+                        content=content,
+                        level="INFO",
+                        source="SERVICE",
+                    )
+                    for content in ({"msg": "ready"}, "ready")
+                ],
+            )
+            logs = list(iter_archived_logs("srv_dkr_LeeCqAUZJnJ"))
+        self.assertEqual(
+            [(None, {"msg": "ready"}), ("ready", None)],
+            [(log["content"], log["content_json"]) for log in logs],
+        )
+
+
+class LogExportTests(AuthAPITestCase):
+    def setUp(self):
+        super().setUp()
+        archive_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(archive_dir.cleanup)
+        override = override_settings(LOGS_ARCHIVE_DIR=archive_dir.name)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def create_deployment_logs(self) -> DockerDeployment:
+        _, service = self.create_and_deploy_redis_docker_service()
+        deployment: DockerDeployment = service.deployments.first()
+        old_day = datetime.datetime(2024, 7, 1, tzinfo=datetime.UTC)
+        DockerServiceLogsViewTests.create_logs(
+            service.id, old_day, 3, deployment_id=deployment.hash
+        )
+        archive_service_logs_of_day(service.id, old_day.date())
+        start = datetime.datetime(2024, 7, 10, tzinfo=datetime.UTC)
+        DockerServiceLogsViewTests.create_logs(
+            service.id, start, 4, deployment_id=deployment.hash
+        )
+        SimpleLog.objects.create(
+            content_json={"msg": "ready"},
+            level=SimpleLog.LogLevel.ERROR,
+            service_id=service.id,
+            deployment_id=deployment.hash,
+            time=start + datetime.timedelta(minutes=1),
+        )
+        DockerServiceLogsViewTests.create_logs(
+            service.id, start, 2, deployment_id="dpl_dkr_other"
+        )
+        return deployment
+
+    @staticmethod
+    def get_export_url(deployment: DockerDeployment) -> str:
+        return reverse(
+            "zane_api:services.docker.deployment_logs_export",
+            kwargs={
+                "project_slug": "zaneops",
+                "service_slug": "redis",
+                "deployment_hash": deployment.hash,
+            },
+        )
+
+    @override_settings(LOGS_EXPORT_CHUNK_SIZE=2)
+    def test_export_all_the_logs_of_a_deployment_as_ndjson(self):
+        deployment = self.create_deployment_logs()
+
+        response = self.client.get(self.get_export_url(deployment))
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertEqual("application/x-ndjson", response["Content-Type"])
+        self.assertEqual(
+            f'attachment; filename="{deployment.hash}.ndjson"',
+            response["Content-Disposition"],
+        )
+        logs = [
+            json.loads(line)
+            for line in b"".join(response.streaming_content).splitlines()
+        ]
+        # the archived logs come first, from the oldest
+        self.assertEqual(
+            [f"line #{i}" for i in range(3)]
+            + [f"line #{i}" for i in range(4)]
+            + [{"msg": "ready"}],
+            [log["content"] for log in logs],
+        )
+        self.assertEqual(
+            sorted((log["time"], log["id"]) for log in logs),
+            [(log["time"], log["id"]) for log in logs],
+        )
+        self.assertEqual({deployment.hash}, {log["deployment_id"] for log in logs})
+        self.assertEqual("ERROR", logs[-1]["level"])
+
+        response = self.client.get(self.get_export_url(deployment), {"level": "ERROR"})
+        self.assertEqual(
+            [{"msg": "ready"}],
+            [
+                json.loads(line)["content"]
+                for line in b"".join(response.streaming_content).splitlines()
+            ],
+        )
+
+    def test_export_gzip_compressed(self):
+        deployment = self.create_deployment_logs()
+
+        # flushed after every line
+        with patch("zane_api.log_export.EXPORT_FLUSH_SIZE", 1):
+            response = self.client.get(
+                self.get_export_url(deployment), {"compression": "gzip"}
+            )
+            chunks = list(response.streaming_content)
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertEqual("application/gzip", response["Content-Type"])
+        self.assertEqual(
+            f'attachment; filename="{deployment.hash}.ndjson.gz"',
+            response["Content-Disposition"],
+        )
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual(
+            8, len(gzip.decompress(b"".join(chunks)).decode().splitlines())
+        )
+
+    def test_export_logs_being_archived_only_once(self):
+        deployment = self.create_deployment_logs()
+        # a log copied to its segment, but not yet deleted from the database
+        archived = list(iter_archived_logs(deployment.service.id))[0]
+        SimpleLog.objects.create(
+            id=archived["id"],
+            content=archived["content"],
+            service_id=archived["service_id"],
+            deployment_id=archived["deployment_id"],
+            time=archived["time"],
+        )
+
+        response = self.client.get(self.get_export_url(deployment))
+        ids = [
+            json.loads(line)["id"]
+            for line in b"".join(response.streaming_content).splitlines()
+        ]
+        self.assertEqual(8, len(ids))
+        self.assertEqual(len(ids), len(set(ids)))
+
+    @override_settings(LOGS_EXPORT_CHUNK_SIZE=2)
+    def test_export_is_streamed_by_asgi(self):
+        deployment = self.create_deployment_logs()
+        self.async_client.force_login(deployment.service.project.owner)
+
+        async def read_export():
+            with patch("zane_api.log_export.EXPORT_FLUSH_SIZE", 1):
+                response = await self.async_client.get(self.get_export_url(deployment))
+                # an async iterator is sent as it is read, a sync one would be read whole first
+                self.assertTrue(response.is_async)
+                return [chunk async for chunk in response.streaming_content]
+
+        chunks = async_to_sync(read_export)()
+        self.assertEqual(8, len(chunks))
+        self.assertEqual(
+            [f"line #{i}" for i in range(3)]
+            + [f"line #{i}" for i in range(4)]
+            + [{"msg": "ready"}],
+            [json.loads(chunk)["content"] for chunk in chunks],
+        )
+
+    def test_export_with_an_unknown_compression(self):
+        deployment = self.create_deployment_logs()
+        response = self.client.get(
+            self.get_export_url(deployment), {"compression": "brotli"}
+        )
+        self.assertEqual(status.HTTP_400_BAD_REQUEST, response.status_code)
+
+    def test_export_of_a_missing_deployment(self):
+        _, service = self.create_and_deploy_redis_docker_service()
+        response = self.client.get(
+            reverse(
+                "zane_api:services.docker.deployment_logs_export",
+                kwargs={
+                    "project_slug": "zaneops",
+                    "service_slug": "redis",
+                    "deployment_hash": "dpl_dkr_unknown",
+                },
+            )
+        )
+        self.assertEqual(status.HTTP_404_NOT_FOUND, response.status_code)
+
+
+class MultilineLogTests(AuthAPITestCase):
+    def setUp(self):
+        super().setUp()
+        owner = self.loginUser()
+        project = Project.objects.create(slug="zaneops", owner=owner)
+        self.service = DockerRegistryService.objects.create(
+            id="srv_dkr_LeeCqAUZJnJ", slug="redis", project=project
+        )
+
+    def set_multiline_pattern(self, pattern: str | None):
+        return self.client.patch(
+            reverse(
+                "zane_api:services.docker.log_settings",
+                kwargs={"project_slug": "zaneops", "service_slug": "redis"},
+            ),
+            data={"logs_multiline_pattern": pattern},
+            content_type="application/json",
+        )
+
+    @staticmethod
+    def get_logs(lines: list[tuple[str, str]], source: str = "stderr") -> list[dict]:
+        logs = QueuedLogCollectViewTests.get_logs(len(lines))
+        for log, (time, line) in zip(logs, lines):
+            log["time"] = time
+            log["log"] = line
+            log["source"] = source
+        return logs
+
+    def get_stored_lines(self) -> list[str]:
+        return list(
+            SimpleLog.objects.filter(service_id=self.service.id)
+            .order_by("time", "content")
+            .values_list("content", flat=True)
+        )
+
+    def test_lines_of_a_stack_trace_are_joined(self):
+        response = self.set_multiline_pattern(r"^\d{4}-")
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        response = self.set_multiline_pattern(r"^(\d{4}")
+        self.assertEqual(status.HTTP_400_BAD_REQUEST, response.status_code)
+
+        logs = self.get_logs(
+            [
+                (
+                    "2024-06-30T03:17:14.100Z",
+                    "2024-06-30 03:17:14 ERROR request failed",
+                ),
+                ("2024-06-30T03:17:14.101Z", "Traceback (most recent call last):"),
+                ("2024-06-30T03:17:14.102Z", '  File "main.py", line 1, in <module>'),
+                ("2024-06-30T03:17:14.103Z", "ValueError: boom"),
+                ("2024-06-30T03:17:15.000Z", "2024-06-30 03:17:15 INFO next request"),
+            ]
+        )
+        # the lines of the other stream of the container are not joined with these
+        logs.insert(
+            2,
+            self.get_logs(
+                [("2024-06-30T03:17:14.101Z", "    indented stdout line")],
+                source="stdout",
+            )[0],
+        )
+        response = self.client.post(reverse("zane_api:logs.tail"), data=logs)
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertEqual(3, response.json()["simple_logs_inserted"])
+
+        self.assertEqual(
+            [
+                "2024-06-30 03:17:14 ERROR request failed\n"
+                "Traceback (most recent call last):\n"
+                '  File "main.py", line 1, in <module>\n'
+                "ValueError: boom",
+                "    indented stdout line",
+                "2024-06-30 03:17:15 INFO next request",
+            ],
+            self.get_stored_lines(),
+        )
+        joined_log = SimpleLog.objects.get(content__startswith="2024-06-30 03:17:14")
+        self.assertEqual(
+            datetime.datetime(2024, 6, 30, 3, 17, 14, 100_000, tzinfo=datetime.UTC),
+            joined_log.time,
+        )
+
+    @override_settings(LOGS_MULTILINE_WINDOW_MS=500, LOGS_MULTILINE_MAX_LINES=2)
+    def test_lines_are_only_joined_within_the_window_and_line_limit(self):
+        self.set_multiline_pattern(r"^\S")
+        logs = self.get_logs(
+            [
+                ("2024-06-30T03:17:14.000Z", "first"),
+                ("2024-06-30T03:17:14.200Z", "  continued"),
+                ("2024-06-30T03:17:14.300Z", "  over the line limit"),
+                ("2024-06-30T03:17:20.000Z", "  after the window"),
+            ]
+        )
+        self.client.post(reverse("zane_api:logs.tail"), data=logs)
+        self.assertEqual(
+            [
+                "first\n  continued",
+                "  over the line limit",
+                "  after the window",
+            ],
+            self.get_stored_lines(),
+        )
+
+    def test_lines_are_stored_on_their_own_without_pattern(self):
+        logs = self.get_logs(
+            [
+                ("2024-06-30T03:17:14.000Z", "first"),
+                ("2024-06-30T03:17:14.001Z", "  continued"),
+            ]
+        )
+        self.client.post(reverse("zane_api:logs.tail"), data=logs)
+        self.assertEqual(["first", "  continued"], self.get_stored_lines())
+
+
+@override_settings(LOGS_MAX_INLINE_LENGTH=100, LOGS_PREVIEW_LENGTH=10)
+class OversizedLogTests(AuthAPITestCase):
+    def setUp(self):
+        super().setUp()
+        owner = self.loginUser()
+        project = Project.objects.create(slug="zaneops", owner=owner)
+        self.service = DockerRegistryService.objects.create(
+            id="srv_dkr_LeeCqAUZJnJ", slug="redis", project=project
+        )
+
+    def get_blob(self, blob_id: str, service_slug: str = "redis"):
+        return self.client.get(
+            reverse(
+                "zane_api:services.docker.log_blob",
+                kwargs={
+                    "project_slug": "zaneops",
+                    "service_slug": service_slug,
+                    "blob_id": blob_id,
+                },
+            )
+        )
+
+    def test_oversized_lines_are_spilled_to_a_blob(self):
+        oversized_line = json.dumps({"dump": "x" * 1_000})
+        logs = QueuedLogCollectViewTests.get_logs(2)
+        logs[0]["log"] = oversized_line
+        response = self.client.post(reverse("zane_api:logs.tail"), data=logs)
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertEqual(2, response.json()["simple_logs_inserted"])
+
+        oversized_log = SimpleLog.objects.get(content_blob_id__isnull=False)
+        # stored as text, the JSON of the line is not parsed
+        self.assertEqual(oversized_line[:10], oversized_log.content)
+        self.assertIsNone(oversized_log.content_json)
+        blob = SimpleLogBlob.objects.get(id=oversized_log.content_blob_id)
+        self.assertEqual(len(oversized_line), blob.length)
+        self.assertEqual(oversized_log.time, blob.time)
+        self.assertLess(len(blob.content), len(oversized_line))
+        self.assertEqual(
+            1, SimpleLog.objects.filter(content_blob_id__isnull=True).count()
+        )
+
+        response = self.get_blob(str(blob.id))
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertEqual("text/plain; charset=utf-8", response["Content-Type"])
+        self.assertEqual(oversized_line, response.content.decode())
+
+        response = self.client.get(
+            reverse(
+                "zane_api:services.docker.logs",
+                kwargs={"project_slug": "zaneops", "service_slug": "redis"},
+            )
+        )
+        self.assertEqual(
+            {str(blob.id), None},
+            {log["content_blob_id"] for log in response.json()["results"]},
+        )
+
+        # the lines sent again by fluentd are skipped with their blob
+        response = self.client.post(reverse("zane_api:logs.tail"), data=logs)
+        self.assertEqual(0, response.json()["simple_logs_inserted"])
+        self.assertEqual(1, SimpleLogBlob.objects.count())
+
+    def test_spilled_lines_are_archived_with_their_blob_id(self):
+        archive_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(archive_dir.cleanup)
+        logs = QueuedLogCollectViewTests.get_logs(2)
+        logs[0]["log"] = "z" * 500
+        self.client.post(reverse("zane_api:logs.tail"), data=logs)
+        blob = SimpleLogBlob.objects.get()
+
+        with override_settings(LOGS_ARCHIVE_DIR=archive_dir.name):
+            self.assertEqual(
+                2,
+                archive_service_logs_of_day(
+                    self.service.id, datetime.date(2024, 6, 30)
+                ),
+            )
+            archived_logs = list(iter_archived_logs(self.service.id))
+        self.assertEqual(
+            {str(blob.id), None}, {log["content_blob_id"] for log in archived_logs}
+        )
+        self.assertEqual(0, SimpleLog.objects.count())
+
+    def test_blobs_are_only_served_to_their_service(self):
+        other_service = DockerRegistryService.objects.create(
+            slug="postgres", project=self.service.project
+        )
+        logs = QueuedLogCollectViewTests.get_logs(1)
+        logs[0]["log"] = "y" * 500
+        self.client.post(reverse("zane_api:logs.tail"), data=logs)
+        blob = SimpleLogBlob.objects.get()
+        self.assertEqual(self.service.id, blob.service_id)
+
+        response = self.get_blob(str(blob.id), service_slug=other_service.slug)
+        self.assertEqual(status.HTTP_404_NOT_FOUND, response.status_code)
+        response = self.get_blob(str(uuid.uuid4()))
+        self.assertEqual(status.HTTP_404_NOT_FOUND, response.status_code)
+
+    def test_expired_blobs_are_deleted(self):
+        now = datetime.datetime(2024, 7, 31, tzinfo=datetime.UTC)
+        for days_ago in (40, 20):
+            SimpleLogBlob.objects.create(
+                id=uuid.uuid4(),
+                service_id=self.service.id,
+                time=now - datetime.timedelta(days=days_ago),
+                length=3,
+                content=b"abc",
+            )
+        self.assertEqual((1, 3), delete_expired_log_blobs(30, now=now))
+        self.assertEqual((0, 0), delete_expired_log_blobs(30, now=now))
+        self.assertEqual(
+            (0, 0), delete_expired_log_blobs(10, service_id="srv_dkr_other", now=now)
+        )
+        self.assertEqual(
+            (1, 3),
+            delete_expired_log_blobs(10, service_id=self.service.id, now=now),
+        )
+
+
+class ExtractedLogFieldsTests(AuthAPITestCase):
+    def setUp(self):
+        super().setUp()
+        owner = self.loginUser()
+        project = Project.objects.create(slug="zaneops", owner=owner)
+        self.service = DockerRegistryService.objects.create(
+            id="srv_dkr_LeeCqAUZJnJ", slug="redis", project=project
+        )
+
+    def set_extracted_fields(self, fields: list[str]):
+        return self.client.patch(
+            reverse(
+                "zane_api:services.docker.log_settings",
+                kwargs={"project_slug": "zaneops", "service_slug": "redis"},
+            ),
+            data={"logs_extracted_fields": fields},
+            content_type="application/json",
+        )
+
+    def get_logs(self, fields: list[str]):
+        return self.client.get(
+            reverse(
+                "zane_api:services.docker.logs",
+                kwargs={"project_slug": "zaneops", "service_slug": "redis"},
+            ),
+            {"field": fields},
+        )
+
+    def ingest(self, lines: list[str]):
+        logs = QueuedLogCollectViewTests.get_logs(len(lines))
+        for log, line in zip(logs, lines):
+            log["log"] = line
+        response = self.client.post(reverse("zane_api:logs.tail"), data=logs)
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+
+    def test_extracted_fields_are_validated(self):
+        response = self.set_extracted_fields(["request_id", "user.id"])
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertEqual(
+            ["request_id", "user.id"], response.json()["logs_extracted_fields"]
+        )
+        self.assertEqual(
+            status.HTTP_400_BAD_REQUEST,
+            self.set_extracted_fields(["user id"]).status_code,
+        )
+        self.assertEqual(
+            status.HTTP_400_BAD_REQUEST,
+            self.set_extracted_fields(["user..id"]).status_code,
+        )
+        self.assertEqual(
+            status.HTTP_400_BAD_REQUEST,
+            self.set_extracted_fields([f"field_{i}" for i in range(11)]).status_code,
+        )
+
+    def test_get_field_value(self):
+        content = {
+            "request_id": "abc",
+            "user": {"id": 42, "admin": False},
+            "tags": ["a", "b"],
+            "body": "x" * 300,
+            "missing": None,
+        }
+        self.assertEqual("abc", get_field_value(content, "request_id"))
+        self.assertEqual("42", get_field_value(content, "user.id"))
+        self.assertEqual("false", get_field_value(content, "user.admin"))
+        self.assertEqual("b", get_field_value(content, "tags.1"))
+        self.assertIsNone(get_field_value(content, "tags.2"))
+        self.assertIsNone(get_field_value(content, "user"))
+        self.assertIsNone(get_field_value(content, "body"))
+        self.assertIsNone(get_field_value(content, "missing"))
+        self.assertIsNone(get_field_value(content, "request_id.value"))
+        self.assertIsNone(get_field_value(["abc"], "request_id"))
+
+    def test_filter_logs_on_extracted_fields(self):
+        self.set_extracted_fields(["request_id", "user.id"])
+        self.ingest(
+            [
+                json.dumps({"request_id": "abc", "user": {"id": 42}}),
+                json.dumps({"request_id": "def", "user": {"id": 42}}),
+                json.dumps({"msg": "no request"}),
+                "request_id=abc",
+            ]
+        )
+        self.assertEqual(
+            [
+                ("request_id", "abc"),
+                ("request_id", "def"),
+                ("user.id", "42"),
+                ("user.id", "42"),
+            ],
+            list(
+                SimpleLogField.objects.order_by("name", "value").values_list(
+                    "name", "value"
+                )
+            ),
+        )
+
+        response = self.get_logs(["request_id:abc"])
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertEqual(
+            [{"request_id": "abc", "user": {"id": 42}}],
+            [log["content"] for log in response.json()["results"]],
+        )
+        response = self.get_logs(["user.id:42"])
+        self.assertEqual(2, len(response.json()["results"]))
+        response = self.get_logs(["user.id:42", "request_id:def"])
+        self.assertEqual(
+            ["def"],
+            [log["content"]["request_id"] for log in response.json()["results"]],
+        )
+        response = self.get_logs(["user.id:43"])
+        self.assertEqual([], response.json()["results"])
+        response = self.get_logs(["request_id"])
+        self.assertEqual(status.HTTP_400_BAD_REQUEST, response.status_code)
+
+    def test_fields_are_extracted_without_copy(self):
+        self.set_extracted_fields(["request_id"])
+        with patch("zane_api.log_ingestion.copy_is_available", return_value=False):
+            self.ingest([json.dumps({"request_id": "abc"}), "request_id=def"])
+
+        log = SimpleLog.objects.get(content_json__isnull=False)
+        self.assertEqual(
+            [(log.id, "request_id", "abc")],
+            list(SimpleLogField.objects.values_list("log_id", "name", "value")),
+        )
+
+    def test_fields_are_not_extracted_without_rules(self):
+        self.ingest([json.dumps({"request_id": "abc"})])
+        self.assertEqual(1, SimpleLog.objects.count())
+        self.assertEqual(0, SimpleLogField.objects.count())
+
+    def test_archived_logs_are_filtered_on_their_json(self):
+        archive_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(archive_dir.cleanup)
+        self.set_extracted_fields(["request_id"])
+        self.ingest(
+            [
+                json.dumps({"request_id": "abc"}),
+                json.dumps({"request_id": "def"}),
+            ]
+        )
+
+        with override_settings(LOGS_ARCHIVE_DIR=archive_dir.name):
+            archive_old_logs(
+                archive_after_days=7,
+                now=datetime.datetime(2024, 7, 31, tzinfo=datetime.UTC),
+            )
+            self.assertEqual(0, SimpleLog.objects.count())
+            self.assertEqual(0, SimpleLogField.objects.count())
+
+            response = self.get_logs(["request_id:def"])
+            self.assertEqual(
+                [{"request_id": "def"}],
+                [log["content"] for log in response.json()["results"]],
+            )
+
+
+class HttpHeaderSetTests(AuthAPITestCase):
+    @staticmethod
+    def get_access_log(
+        request_headers: dict[str, list[str]], response_headers: dict[str, list[str]]
+    ) -> dict:
+        return {
+            "level": "info",
+            "ts": 1719324985.9711,
+            "logger": "http.log.access.log0",
+            "msg": "handled request",
+            "request": {
+                "remote_ip": "10.0.0.2",
+                "remote_port": "37420",
+                "client_ip": "10.0.0.2",
+                "proto": "HTTP/1.1",
+                "method": "GET",
+                "host": "redis.zaneops.local",
+                "uri": "/",
+                "headers": request_headers,
+            },
+            "bytes_read": 0,
+            "user_id": "",
+            "duration": 0.01,
+            "size": 238,
+            "status": 200,
+            "resp_headers": response_headers,
+            "zane_deployment_current_hash": "",
+            "zane_deployment_current_slot": "blue",
+            "zane_deployment_upstream": "",
+        }
+
+    def test_header_sets_are_stored_once(self):
+        access_logs = [
+            (
+                self.get_access_log(
+                    {
+                        "Accept": ["*/*"],
+                        "User-Agent": ["curl/8.5.0"],
+                        "Cookie": [f"session={i}"],
+                    },
+                    {"Server": ["Caddy"], "Content-Length": [str(100 + i)]},
+                ),
+                uuid.uuid4(),
+            )
+            for i in range(3)
+        ]
+        # same headers in another order
+        access_logs.append(
+            (
+                self.get_access_log(
+                    {"User-Agent": ["curl/8.5.0"], "Accept": ["*/*"]},
+                    {"Date": ["Tue, 25 Jun 2024 14:16:25 GMT"]},
+                ),
+                uuid.uuid4(),
+            )
+        )
+        rows = parse_caddy_access_logs(access_logs)
+        self.assertEqual(4, len(insert_logs(HttpLog, rows, use_copy=True)))
+
+        self.assertEqual(
+            [
+                {"Accept": ["*/*"], "User-Agent": ["curl/8.5.0"]},
+                {"Server": ["Caddy"]},
+            ],
+            sorted(
+                HttpHeaderSet.objects.values_list("headers", flat=True),
+                key=lambda headers: list(headers),
+            ),
+        )
+        self.assertEqual(
+            1,
+            HttpLog.objects.values("request_header_set_id").distinct().count(),
+        )
+        # none of the response headers of the last log are allowed
+        self.assertEqual(
+            1, HttpLog.objects.filter(response_header_set__isnull=True).count()
+        )
+
+    @override_settings(LOGS_HTTP_HEADERS_ALLOWLIST=["x-request-id"])
+    def test_headers_allowlist_is_case_insensitive(self):
+        rows = parse_caddy_access_logs(
+            [
+                (
+                    self.get_access_log(
+                        {"X-Request-Id": ["abc"], "Accept": ["*/*"]}, {}
+                    ),
+                    uuid.uuid4(),
+                )
+            ]
+        )
+        self.assertIsNone(rows[0]["response_header_set_id"])
+        self.assertEqual(
+            {"X-Request-Id": ["abc"]},
+            HttpHeaderSet.objects.get(id=rows[0]["request_header_set_id"]).headers,
+        )
+
+    @override_settings(LOGS_HTTP_HEADERS_ALLOWLIST=["*"])
+    def test_wildcard_keeps_all_headers(self):
+        headers = {"Cookie": ["session=1"], "Accept": ["*/*"]}
+        rows = parse_caddy_access_logs(
+            [(self.get_access_log(headers, headers), uuid.uuid4())]
+        )
+        self.assertEqual(get_header_set_id(headers), rows[0]["request_header_set_id"])
+        self.assertEqual(
+            rows[0]["request_header_set_id"], rows[0]["response_header_set_id"]
+        )
+        self.assertEqual(1, HttpHeaderSet.objects.count())
+
+    def test_unused_header_sets_are_deleted(self):
+        now = datetime.datetime(2024, 7, 31, tzinfo=datetime.UTC)
+        used_headers, unused_headers = {"Accept": ["*/*"]}, {"Server": ["Caddy"]}
+        for headers in (used_headers, unused_headers):
+            HttpHeaderSet.objects.create(
+                id=get_header_set_id(headers),
+                headers=headers,
+                last_seen_at=now - datetime.timedelta(days=40),
+            )
+
+        # seen again, its `last_seen_at` is refreshed
+        store_header_sets({get_header_set_id(used_headers): used_headers}, now=now)
+        self.assertEqual(
+            now, HttpHeaderSet.objects.get(headers=used_headers).last_seen_at
+        )
+
+        self.assertEqual(1, delete_unused_header_sets(30, now=now))
+        self.assertEqual(
+            [used_headers],
+            list(HttpHeaderSet.objects.values_list("headers", flat=True)),
+        )
+
+    def test_header_sets_in_use_are_locked_against_their_deletion(self):
+        headers = {"Accept": ["*/*"]}
+        with CaptureQueriesContext(connection) as queries:
+            store_header_sets({get_header_set_id(headers): headers})
+            delete_unused_header_sets(30)
+        # the sets read by the ingest are locked until its commit, the deletion skips them
+        self.assertIn("FOR KEY SHARE", queries.captured_queries[0]["sql"])
+        self.assertIn("FOR UPDATE SKIP LOCKED", queries.captured_queries[-1]["sql"])
+        self.assertEqual(1, HttpHeaderSet.objects.count())
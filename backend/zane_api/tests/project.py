@@ -209,6 +209,23 @@ class ProjectUpdateViewTests(AuthAPITestCase):
         )
         self.assertNotEquals(previous_project.updated_at, updated_project.updated_at)
 
+    def test_sucessfully_update_project_logs_retention(self):
+        owner = self.loginUser()
+        Project.objects.create(slug="gh-next", owner=owner)
+        response = self.client.patch(
+            reverse("zane_api:projects.details", kwargs={"slug": "gh-next"}),
+            data={"logs_retention_days": 7},
+        )
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertEqual(7, response.json().get("logs_retention_days"))
+        self.assertEqual(7, Project.objects.get(slug="gh-next").logs_retention_days)
+
+        response = self.client.patch(
+            reverse("zane_api:projects.details", kwargs={"slug": "gh-next"}),
+            data={"logs_retention_days": 0},
+        )
+        self.assertEqual(status.HTTP_400_BAD_REQUEST, response.status_code)
+
     def test_prevent_empy_update(self):
         owner = self.loginUser()
         previous_project = Project.objects.create(slug="gh-next", owner=owner)
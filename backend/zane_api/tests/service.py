@@ -1,8 +1,10 @@
+import datetime
 import json
 import re
 from unittest.mock import patch, Mock, MagicMock
 
 import responses
+from django.test import override_settings
 from django.urls import reverse
 from django_celery_beat.models import PeriodicTask, IntervalSchedule
 from rest_framework import status
@@ -12,6 +14,7 @@ from .base import AuthAPITestCase, FakeDockerClient
 from ..docker_operations import (
     get_swarm_service_name_for_deployment,
 )
+from ..log_rollups import aggregate_http_logs, upsert_http_log_rollups
 from ..models import (
     Project,
     DockerRegistryService,
@@ -1109,6 +1112,92 @@ class DockerServiceMonitorTests(AuthAPITestCase):
             latest_deployment.status,
         )
 
+    def deploy_app(self) -> tuple[DockerDeployment, Token]:
+        owner = self.loginUser()
+        p = Project.objects.create(slug="zaneops", owner=owner)
+        service = DockerRegistryService.objects.create(slug="app", project=p)
+        DockerDeploymentChange.objects.create(
+            field=DockerDeploymentChange.ChangeField.IMAGE,
+            type=DockerDeploymentChange.ChangeType.UPDATE,
+            new_value="valkey/valkey:7.2-alpine",
+            service=service,
+        )
+        response = self.client.put(
+            reverse(
+                "zane_api:services.docker.deploy_service",
+                kwargs={"project_slug": p.slug, "service_slug": service.slug},
+            ),
+        )
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        return service.latest_production_deployment, Token.objects.get(user=owner)
+
+    @staticmethod
+    def receive_requests(
+        deployment: DockerDeployment, statuses: list[int], duration_ms: int = 20
+    ):
+        now = datetime.datetime.now(tz=datetime.UTC)
+        upsert_http_log_rollups(
+            aggregate_http_logs(
+                [
+                    dict(
+                        deployment_id=deployment.hash,
+                        service_id=deployment.service_id,
+                        time=now,
+                        status=status_code,
+                        request_duration_ms=duration_ms,
+                        request_uri="/",
+                    )
+                    for status_code in statuses
+                ]
+            )
+        )
+
+    @override_settings(DEPLOYMENT_HTTP_HEALTH_MIN_REQUESTS=10)
+    def test_deployment_is_unhealthy_when_most_requests_fail(self):
+        deployment, token = self.deploy_app()
+
+        # too few requests to tell
+        self.receive_requests(deployment, [500] * 9)
+        monitor_docker_service_deployment(deployment.hash, token.key)
+        deployment.refresh_from_db()
+        self.assertEqual(DockerDeployment.DeploymentStatus.HEALTHY, deployment.status)
+
+        self.receive_requests(deployment, [200] * 5)
+        monitor_docker_service_deployment(deployment.hash, token.key)
+        deployment.refresh_from_db()
+        self.assertEqual(DockerDeployment.DeploymentStatus.UNHEALTHY, deployment.status)
+        self.assertEqual(
+            "64% of the requests of the last 5 minutes failed with a 5xx status (the limit is 50%).",
+            deployment.status_reason,
+        )
+
+    @override_settings(
+        DEPLOYMENT_HTTP_HEALTH_MIN_REQUESTS=10, DEPLOYMENT_HTTP_MAX_P99_MS=1_000
+    )
+    def test_deployment_is_unhealthy_when_its_requests_are_slow(self):
+        deployment, token = self.deploy_app()
+
+        self.receive_requests(deployment, [200] * 10, duration_ms=900)
+        monitor_docker_service_deployment(deployment.hash, token.key)
+        deployment.refresh_from_db()
+        self.assertEqual(DockerDeployment.DeploymentStatus.HEALTHY, deployment.status)
+
+        self.receive_requests(deployment, [200] * 10, duration_ms=5_000)
+        monitor_docker_service_deployment(deployment.hash, token.key)
+        deployment.refresh_from_db()
+        self.assertEqual(DockerDeployment.DeploymentStatus.UNHEALTHY, deployment.status)
+        self.assertIn("The p99 latency", deployment.status_reason)
+
+    @override_settings(
+        DEPLOYMENT_HTTP_HEALTH_MIN_REQUESTS=0, DEPLOYMENT_HTTP_MAX_P99_MS=1_000
+    )
+    def test_deployment_without_requests_is_healthy(self):
+        deployment, token = self.deploy_app()
+
+        monitor_docker_service_deployment(deployment.hash, token.key)
+        deployment.refresh_from_db()
+        self.assertEqual(DockerDeployment.DeploymentStatus.HEALTHY, deployment.status)
+
     def test_restart_is_set_after_multiple_tasks_deployments(self):
         owner = self.loginUser()
         p = Project.objects.create(slug="zaneops", owner=owner)
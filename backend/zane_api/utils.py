@@ -1,11 +1,18 @@
 import dataclasses
 import datetime
 import json
+import os
+import threading
+import time
+import uuid
 from contextlib import contextmanager
 from dataclasses import dataclass
 from enum import Enum
-from typing import Callable, TypeVar, List, Optional
+from functools import lru_cache
+from typing import Any, Callable, Iterable, Iterator, TypeVar, List, Optional
 
+import redis
+from django.conf import settings
 from django.core.cache import cache
 
 
@@ -170,3 +177,54 @@ class EnhancedJSONEncoder(json.JSONEncoder):
         if dataclasses.is_dataclass(o):
             return dataclasses.asdict(o)
         return super().default(o)
+
+
+@lru_cache
+def get_redis_client() -> redis.Redis:
+    """
+    Raw redis client, for the data structures not exposed by the django cache (streams, pub/sub, ...)
+    """
+    return redis.Redis.from_url(settings.REDIS_URL)
+
+
+_last_log_id = (0, 0)
+_log_id_lock = threading.Lock()
+
+
+def generate_log_id() -> uuid.UUID:
+    """
+    Time ordered UUID (version 7 layout: 48 bits of unix time in ms followed by 74 random bits),
+    strictly increasing within the process, so that logs with the same `time` are sorted by `id`
+    in the order they were received.
+    """
+    global _last_log_id
+    unix_ms = time.time_ns() // 1_000_000
+    random_bits = int.from_bytes(os.urandom(10), "big") >> 6  # 74 bits
+    with _log_id_lock:
+        last_ms, last_random_bits = _last_log_id
+        if unix_ms <= last_ms:
+            # same millisecond (or clock going back): increment the random part of the last id
+            unix_ms, random_bits = last_ms, last_random_bits + 1
+            if random_bits >= 1 << 74:
+                unix_ms, random_bits = last_ms + 1, 0
+        _last_log_id = (unix_ms, random_bits)
+
+    value = (
+        (unix_ms << 80)
+        | (0x7 << 76)  # version
+        | ((random_bits >> 62) << 64)
+        | (0x2 << 62)  # variant
+        | (random_bits & ((1 << 62) - 1))
+    )
+    return uuid.UUID(int=value)
+
+
+def chunked(items: Iterable[Any], size: int) -> Iterator[list[Any]]:
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if len(chunk) > 0:
+        yield chunk
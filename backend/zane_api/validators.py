@@ -44,3 +44,18 @@ def validate_env_name(value: str):
         raise ValidationError(
             "shoud starts with an underscore (_) or a letter followed by letters, number or underscores(_)"
         )
+
+
+def validate_regex(value: str):
+    try:
+        re.compile(value)
+    except re.error as e:
+        raise ValidationError(f"should be a valid regular expression ({e})")
+
+
+def validate_json_field_path(value: str):
+    pattern = r"^[^.:\s]+(\.[^.:\s]+)*$"
+    if not bool(re.match(pattern, value)):
+        raise ValidationError(
+            "should be a path of keys separated by dots (like `user.id`), without spaces or colons (:)"
+        )
@@ -1,18 +1,44 @@
-import json
+import datetime
+from typing import Any, Iterable, Iterator
 
+from django.conf import settings
+from django.db import transaction
+from django.core.handlers.asgi import ASGIRequest
+from django.db.models import QuerySet
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.views import View
+from django_filters.rest_framework import DjangoFilterBackend
+from drf_spectacular.types import OpenApiTypes
 from drf_spectacular.utils import extend_schema
-from rest_framework import status, permissions
+from rest_framework import status, permissions, exceptions
+from rest_framework.generics import ListAPIView
 from rest_framework.request import Request
 from rest_framework.response import Response
 from rest_framework.throttling import ScopedRateThrottle
 from rest_framework.views import APIView
 
-from .helpers import ZaneServices
+from .base import PayloadTooLarge
 from .serializers import (
+    HttpMetricsParamsSerializer,
+    HttpMetricsSerializer,
     DockerContainerLogsResponseSerializer,
     DockerContainerLogsRequestSerializer,
+    SimpleLogFilterSet,
+    LogCursorPagination,
+    LogsExportParamsSerializer,
 )
-from ..models import SimpleLog, HttpLog
+from .. import log_blobs, log_export, log_ingestion, log_live, log_queue, log_rollups
+from ..log_archive import iter_archived_logs, merge_logs
+from ..models import (
+    Project,
+    DockerRegistryService,
+    DockerDeployment,
+    HttpLogRollup,
+    SimpleLog,
+    SimpleLogBlob,
+)
+from ..serializers import DockerServiceLogSettingsSerializer, SimpleLogSerializer
 
 
 class LogTailAPIView(APIView):
@@ -21,72 +47,381 @@ class LogTailAPIView(APIView):
     throttle_classes = [ScopedRateThrottle]
     serializer_class = DockerContainerLogsResponseSerializer
 
+    def get_log_items(self, request: Request) -> Iterable[Any]:
+        content_encoding = request.META.get("HTTP_CONTENT_ENCODING")
+        if (
+            settings.LOGS_INGEST_STREAMING
+            or content_encoding is not None
+            or log_ingestion.get_media_type(request.content_type)
+            not in log_ingestion.JSON_CONTENT_TYPES
+        ):
+            # walk the records one by one instead of loading the whole fluentd batch in memory
+            return log_ingestion.iter_log_records(
+                request.stream, request.content_type, content_encoding
+            )
+        if not isinstance(request.data, list):
+            raise exceptions.ParseError("Expected a list of logs.")
+        return request.data
+
     @extend_schema(
         request=DockerContainerLogsRequestSerializer,
         operation_id="collectContainerLogs",
     )
     def post(self, request: Request):
-        serializer = DockerContainerLogsRequestSerializer(data=request.data)
-        if serializer.is_valid(raise_exception=True):
-            logs = serializer.data
-
-            simple_logs: list[SimpleLog] = []
-            http_logs: list[HttpLog] = []
-
-            for log in logs:
-                try:
-                    json_tag = json.loads(log["tag"])
-                except json.JSONDecodeError:
-                    # Ignore this log
-                    continue
-                else:
-                    service_id = json_tag.get("service_id")
-                    match service_id:
-                        case None:
-                            # Ignore this log
-                            continue
-                        case ZaneServices.PROXY:
-                            try:
-                                content = json.loads(log["log"])
-                            except json.JSONDecodeError:
-                                content = log["log"]
-                            simple_logs.append(
-                                SimpleLog(
-                                    source=SimpleLog.LogSource.PROXY,
-                                    level=(
-                                        SimpleLog.LogLevel.INFO
-                                        if log["source"] == "stdout"
-                                        else SimpleLog.LogLevel.ERROR
-                                    ),
-                                    content=content,
-                                    time=log["time"],
-                                )
-                            )
-                        case ZaneServices.API | ZaneServices.WORKER:
-                            # do nothing for now...
-                            pass
-                        case _:
-                            deployment_id = json_tag["deployment_id"]
-                            simple_logs.append(
-                                SimpleLog(
-                                    source=SimpleLog.LogSource.SERVICE,
-                                    level=(
-                                        SimpleLog.LogLevel.INFO
-                                        if log["source"] == "stdout"
-                                        else SimpleLog.LogLevel.ERROR
-                                    ),
-                                    content=log["log"],
-                                    time=log["time"],
-                                    deployment_id=deployment_id,
-                                    service_id=service_id,
-                                )
-                            )
-            SimpleLog.objects.bulk_create(simple_logs)
-
-            response = DockerContainerLogsResponseSerializer(
-                {
-                    "simple_logs_inserted": len(simple_logs),
-                    "http_logs_inserted": len(http_logs),
-                }
+        if settings.LOGS_INGEST_MODE == "queue":
+            return self.enqueue(request)
+
+        simple_logs_inserted = 0
+        http_logs_inserted = 0
+
+        with transaction.atomic():
+            try:
+                for chunk in log_ingestion.chunked(
+                    self.get_log_items(request), settings.LOGS_INGEST_CHUNK_SIZE
+                ):
+                    simple_count, http_count = log_ingestion.ingest_container_logs(
+                        log_ingestion.validate_container_logs(chunk)
+                    )
+                    simple_logs_inserted += simple_count
+                    http_logs_inserted += http_count
+            except log_ingestion.UnsupportedLogFormat as e:
+                raise exceptions.UnsupportedMediaType(
+                    request.content_type, detail=str(e)
+                )
+            except log_ingestion.LogPayloadTooLarge as e:
+                raise PayloadTooLarge(str(e))
+            except log_ingestion.LogParseError as e:
+                raise exceptions.ParseError(f"Parse error - {e}")
+
+        response = DockerContainerLogsResponseSerializer(
+            {
+                "simple_logs_inserted": simple_logs_inserted,
+                "http_logs_inserted": http_logs_inserted,
+            }
+        )
+        return Response(response.data, status=status.HTTP_200_OK)
+
+    @staticmethod
+    def enqueue(request: Request):
+        # the batch is stored as is, decoding & validation are left to the queue writers
+        body = request.stream.read() if request.stream is not None else b""
+        retry_after = log_queue.enqueue_log_batch(
+            body,
+            content_type=request.content_type,
+            content_encoding=request.META.get("HTTP_CONTENT_ENCODING"),
+        )
+        if retry_after is not None:
+            raise exceptions.Throttled(
+                wait=retry_after, detail="The logs queue is full, retry later."
+            )
+        return Response(status=status.HTTP_202_ACCEPTED)
+
+
+def get_user_service(
+    user, project_slug: str, service_slug: str
+) -> DockerRegistryService:
+    """
+    Service of a project of `user`, shared by the views of the logs of a service.
+    """
+    try:
+        project = Project.objects.get(slug=project_slug.lower(), owner=user)
+    except Project.DoesNotExist:
+        raise exceptions.NotFound(
+            detail=f"A project with the slug `{project_slug}` does not exist"
+        )
+    try:
+        return DockerRegistryService.objects.get(slug=service_slug, project=project)
+    except DockerRegistryService.DoesNotExist:
+        raise exceptions.NotFound(
+            detail=f"A service with the slug `{service_slug}`"
+            f" does not exist within the project `{project_slug}`"
+        )
+
+
+class DockerServiceLogSettingsAPIView(APIView):
+    serializer_class = DockerServiceLogSettingsSerializer
+
+    @extend_schema(operation_id="getDockerServiceLogSettings")
+    def get(self, request: Request, project_slug: str, service_slug: str):
+        service = get_user_service(request.user, project_slug, service_slug)
+        response = DockerServiceLogSettingsSerializer(service)
+        return Response(response.data, status=status.HTTP_200_OK)
+
+    @extend_schema(operation_id="updateDockerServiceLogSettings")
+    def patch(self, request: Request, project_slug: str, service_slug: str):
+        service = get_user_service(request.user, project_slug, service_slug)
+        form = DockerServiceLogSettingsSerializer(
+            service, data=request.data, partial=True
+        )
+        form.is_valid(raise_exception=True)
+        form.save()
+        return Response(form.data, status=status.HTTP_200_OK)
+
+
+class BaseDockerServiceLogsAPIView(ListAPIView):
+    serializer_class = SimpleLogSerializer
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = SimpleLogFilterSet
+    pagination_class = LogCursorPagination
+    queryset = (
+        SimpleLog.objects.all()
+    )  # This is to document API endpoints with drf-spectacular, in practive what is used is `get_queryset`
+
+    def get_service(self) -> DockerRegistryService:
+        return get_user_service(
+            self.request.user, self.kwargs["project_slug"], self.kwargs["service_slug"]
+        )
+
+    def get_archived_logs(
+        self,
+        time_after: datetime.datetime | None,
+        time_before: datetime.datetime | None,
+        reverse: bool,
+    ) -> Iterator[dict]:
+        """
+        Logs of the service moved out of the database by the archival, with the same filters as the queryset.
+        """
+        filterset = self.filterset_class(
+            data=self.request.query_params,
+            queryset=SimpleLog.objects.none(),
+            request=self.request,
+        )
+        filterset.is_valid()
+        filter_time_after, filter_time_before = filterset.get_time_range()
+        if filter_time_after is not None:
+            time_after = max(filter(None, [time_after, filter_time_after]))
+        if filter_time_before is not None:
+            time_before = min(filter(None, [time_before, filter_time_before]))
+
+        for log in iter_archived_logs(
+            self.service.id, time_after, time_before, reverse=reverse
+        ):
+            if self.archived_log_matches(log) and filterset.matches(log):
+                yield log
+
+    def archived_log_matches(self, log: dict) -> bool:
+        return True
+
+
+class DockerServiceLogsAPIView(BaseDockerServiceLogsAPIView):
+    @extend_schema(operation_id="getDockerServiceLogs")
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
+    def get_queryset(self) -> QuerySet[SimpleLog]:
+        self.service = self.get_service()
+        return SimpleLog.objects.filter(service_id=self.service.id)
+
+
+class DockerDeploymentLogsAPIView(BaseDockerServiceLogsAPIView):
+    @extend_schema(operation_id="getDockerDeploymentLogs")
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
+    def get_queryset(self) -> QuerySet[SimpleLog]:
+        self.service = self.get_service()
+        deployment_hash = self.kwargs["deployment_hash"]
+        try:
+            self.deployment = DockerDeployment.objects.get(
+                service=self.service, hash=deployment_hash
+            )
+        except DockerDeployment.DoesNotExist:
+            raise exceptions.NotFound(
+                detail=f"A deployment with the hash `{deployment_hash}` does not exist for this service."
             )
-            return Response(response.data, status=status.HTTP_200_OK)
+        return self.deployment.logs
+
+    def paginate_queryset(self, queryset):
+        # the first page without filters is served from the recent logs kept in redis
+        if set(self.request.query_params) <= {self.paginator.page_size_query_param}:
+            recent_logs = log_live.get_recent_deployment_logs(self.deployment.hash)
+            if recent_logs is not None:
+                page = self.paginator.paginate_recent_logs(recent_logs, self.request)
+                if page is not None:
+                    return page
+        return super().paginate_queryset(queryset)
+
+    def archived_log_matches(self, log: dict) -> bool:
+        return log["deployment_id"] == self.deployment.hash
+
+
+class DockerDeploymentLogsExportAPIView(DockerDeploymentLogsAPIView):
+    """
+    Download all the logs of a deployment (with the same filters as the logs API) as NDJSON, from the oldest.
+    The logs are read from a server-side cursor and streamed as they are read,
+    so that exporting millions of lines never loads them all in the worker.
+    """
+
+    pagination_class = None
+
+    @extend_schema(
+        parameters=[LogsExportParamsSerializer],
+        responses={
+            (200, log_export.NDJSON_CONTENT_TYPE): OpenApiTypes.BINARY,
+            (200, log_export.GZIP_CONTENT_TYPE): OpenApiTypes.BINARY,
+        },
+        operation_id="exportDockerDeploymentLogs",
+    )
+    def get(self, request, *args, **kwargs):
+        form = LogsExportParamsSerializer(data=request.query_params.dict())
+        form.is_valid(raise_exception=True)
+        compress = form.validated_data["compression"] == "gzip"
+
+        queryset = self.filter_queryset(self.get_queryset())
+        # the logs being archived are both in their segment and in the database until they are deleted
+        logs = merge_logs(
+            self.get_archived_logs(None, None, reverse=False),
+            queryset.order_by("time", "id")
+            .values(*log_export.EXPORTED_LOG_FIELDS)
+            .iterator(chunk_size=settings.LOGS_EXPORT_CHUNK_SIZE),
+        )
+        chunks = log_export.iter_ndjson(logs, compress=compress)
+        # `request` is the DRF request, wrapping the one of Django
+        if isinstance(request._request, ASGIRequest):
+            chunks = log_export.aiter_chunks(chunks)
+
+        filename = f"{self.deployment.hash}.ndjson"
+        response = StreamingHttpResponse(
+            chunks,
+            content_type=(
+                log_export.GZIP_CONTENT_TYPE
+                if compress
+                else log_export.NDJSON_CONTENT_TYPE
+            ),
+        )
+        response["Content-Disposition"] = (
+            f'attachment; filename="{filename}.gz"'
+            if compress
+            else f'attachment; filename="{filename}"'
+        )
+        return response
+
+
+class DockerServiceLogBlobAPIView(APIView):
+    """
+    Full content of a log line too long to be stored with the log (see `SimpleLog.content_blob_id`)
+    """
+
+    @extend_schema(
+        responses={(200, "text/plain"): OpenApiTypes.STR},
+        operation_id="getDockerServiceLogBlob",
+    )
+    def get(self, request: Request, project_slug: str, service_slug: str, blob_id: str):
+        service = get_user_service(request.user, project_slug, service_slug)
+        try:
+            blob = SimpleLogBlob.objects.get(id=blob_id, service_id=service.id)
+        except SimpleLogBlob.DoesNotExist:
+            raise exceptions.NotFound(
+                detail=f"A log blob with the id `{blob_id}` does not exist for this service."
+            )
+        return HttpResponse(
+            log_blobs.read_log_blob(blob), content_type="text/plain; charset=utf-8"
+        )
+
+
+class DockerDeploymentHttpMetricsAPIView(APIView):
+    serializer_class = HttpMetricsSerializer
+
+    @extend_schema(
+        parameters=[HttpMetricsParamsSerializer],
+        responses={200: HttpMetricsSerializer(many=True)},
+        operation_id="getDockerDeploymentHttpMetrics",
+    )
+    def get(
+        self,
+        request: Request,
+        project_slug: str,
+        service_slug: str,
+        deployment_hash: str,
+    ):
+        deployment = DockerDeployment.objects.filter(
+            hash=deployment_hash,
+            service__slug=service_slug,
+            service__project__slug=project_slug,
+            service__project__owner=request.user,
+        ).first()
+        if deployment is None:
+            raise exceptions.NotFound(
+                detail=f"A deployment with the hash `{deployment_hash}` does not exist for this service."
+            )
+
+        form = HttpMetricsParamsSerializer(data=request.query_params.dict())
+        form.is_valid(raise_exception=True)
+        params = form.validated_data
+        time_before = params.get("time_before") or timezone.now()
+        time_after = params.get("time_after") or time_before - datetime.timedelta(
+            hours=1
+        )
+
+        # only the rollups are read, never the raw http logs
+        rollups = HttpLogRollup.objects.filter(
+            deployment_id=deployment.hash,
+            request_path=(
+                log_rollups.get_request_path(params["request_path"])
+                if params["request_path"]
+                else ""
+            ),
+            minute__gte=time_after,
+            minute__lt=time_before,
+        )
+        metrics = log_rollups.get_http_metrics(rollups, params["interval"])
+        response = HttpMetricsSerializer(metrics, many=True)
+        return Response(response.data, status=status.HTTP_200_OK)
+
+
+class DockerDeploymentLogsTailView(View):
+    """
+    Follow the logs of a deployment as server-sent events, streamed from the redis channel
+    the ingest path publishes to, this view is async and needs to be served by `backend.asgi`:
+    under WSGI the endless stream would be consumed to the end before being sent, so it is refused.
+    """
+
+    @staticmethod
+    def error_response(code: str, detail: str, status_code: int) -> JsonResponse:
+        return JsonResponse(
+            {
+                "type": "client_error" if status_code < 500 else "server_error",
+                "errors": [{"code": code, "detail": detail, "attr": None}],
+            },
+            status=status_code,
+        )
+
+    async def get(
+        self, request, project_slug: str, service_slug: str, deployment_hash: str
+    ):
+        user = await request.auser()
+        if not user.is_authenticated:
+            return self.error_response(
+                "not_authenticated",
+                "Authentication credentials were not provided.",
+                status.HTTP_401_UNAUTHORIZED,
+            )
+        if not isinstance(request, ASGIRequest):
+            return self.error_response(
+                "not_implemented",
+                "Following the logs needs the API to be served by an ASGI server (`backend.asgi`),"
+                " use the deployment logs endpoint instead.",
+                status.HTTP_501_NOT_IMPLEMENTED,
+            )
+        # the only query of the stream, the logs themselves never touch the database
+        deployment_exists = await DockerDeployment.objects.filter(
+            hash=deployment_hash,
+            service__slug=service_slug,
+            service__project__slug=project_slug,
+            service__project__owner=user,
+        ).aexists()
+        if not deployment_exists:
+            return self.error_response(
+                "not_found",
+                f"A deployment with the hash `{deployment_hash}` does not exist for this service.",
+                status.HTTP_404_NOT_FOUND,
+            )
+
+        response = StreamingHttpResponse(
+            log_live.stream_deployment_logs(deployment_hash),
+            content_type="text/event-stream",
+        )
+        response["Cache-Control"] = "no-cache"
+        # disable the buffering of the response by the reverse proxies
+        response["X-Accel-Buffering"] = "no"
+        return response
@@ -182,6 +182,9 @@ class ProjectDetailsView(APIView):
             try:
                 project.slug = form.data.get("slug", project.slug)
                 project.description = form.data.get("description", project.description)
+                project.logs_retention_days = form.data.get(
+                    "logs_retention_days", project.logs_retention_days
+                )
                 project.save()
             except IntegrityError:
                 raise ResourceConflict(
@@ -1,20 +1,34 @@
+import base64
+import binascii
 import dataclasses
+import datetime
+import heapq
+import itertools
 import json
-from typing import Any
+import re
+import uuid
+from collections import OrderedDict
+from typing import Any, Iterator
 
 import django_filters
+from django import forms
 from django.conf import settings
+from django.contrib.postgres.search import SearchQuery
 from django.core.exceptions import ValidationError
-from django.db.models import Q
+from django.db.models import Exists, OuterRef, Q, QuerySet
 from django.utils.translation import gettext_lazy as _
 from django_filters import OrderingFilter
-from rest_framework import pagination
+from rest_framework import pagination, exceptions
+from rest_framework.response import Response
 
 from .helpers import (
     compute_docker_service_snapshot_with_changes,
     compute_all_deployment_changes,
 )
 from .. import serializers
+from ..log_export import EXPORT_COMPRESSIONS
+from ..log_fields import get_field_value
+from ..log_rollups import ROLLUP_INTERVALS
 from ..docker_operations import (
     check_if_docker_image_exists,
     check_if_port_is_available_on_host,
@@ -28,6 +42,8 @@ from ..models import (
     Volume,
     DockerEnvVariable,
     PortConfiguration,
+    SimpleLog,
+    SimpleLogField,
 )
 from ..utils import EnhancedJSONEncoder
 from ..validators import validate_url_path, validate_env_name
@@ -255,11 +271,17 @@ class ProjectCreateRequestSerializer(serializers.Serializer):
 class ProjectUpdateRequestSerializer(serializers.Serializer):
     slug = serializers.SlugField(max_length=255, required=False)
     description = serializers.CharField(required=False)
+    logs_retention_days = serializers.IntegerField(
+        required=False,
+        allow_null=True,
+        min_value=1,
+        max_value=settings.LOGS_RETENTION_DAYS,
+    )
 
     def validate(self, attrs: dict[str, str]):
         if not bool(attrs):
             raise serializers.ValidationError(
-                "one of `slug` or `description` should be provided"
+                "one of `slug`, `description` or `logs_retention_days` should be provided"
             )
         return attrs
 
@@ -813,7 +835,8 @@ class DockerDeploymentFieldChangeRequestSerializer(serializers.Serializer):
 
 
 class DockerContainerLogSerializer(serializers.Serializer):
-    log = serializers.CharField(required=True, allow_blank=True)
+    # the whitespace of the lines is kept, the indentation of the continuation lines is significant
+    log = serializers.CharField(required=True, allow_blank=True, trim_whitespace=False)
     container_id = serializers.CharField(required=True)
     container_name = serializers.CharField(required=True)
     time = serializers.DateTimeField(required=True)
@@ -872,9 +895,16 @@ class HTTPServiceLogSerializer(serializers.Serializer):
         child=serializers.ListField(child=serializers.CharField())
     )
     request = HTTPServiceRequestSerializer()
-    zane_deployment_upstream = serializers.CharField()
-    zane_deployment_current_slot = serializers.CharField()
-    zane_deployment_current_hash = serializers.CharField()
+    # these are only set for the services exposed by zane, not for zaneops own routes
+    zane_deployment_upstream = serializers.CharField(
+        required=False, allow_null=True, allow_blank=True
+    )
+    zane_deployment_current_slot = serializers.CharField(
+        required=False, allow_null=True, allow_blank=True
+    )
+    zane_deployment_current_hash = serializers.CharField(
+        required=False, allow_null=True, allow_blank=True
+    )
 
 
 class DockerContainerLogsRequestSerializer(serializers.ListSerializer):
@@ -884,3 +914,364 @@ class DockerContainerLogsRequestSerializer(serializers.ListSerializer):
 class DockerContainerLogsResponseSerializer(serializers.Serializer):
     simple_logs_inserted = serializers.IntegerField(min_value=0)
     http_logs_inserted = serializers.IntegerField(min_value=0)
+
+
+# ==============================
+#          Logs query          #
+# ==============================
+
+
+class LogFieldsFormField(forms.Field):
+    # every `field` parameter of the query, not only the last one
+    widget = forms.MultipleHiddenInput
+
+    def to_python(self, value) -> list[tuple[str, str]]:
+        fields = []
+        for item in value or []:
+            name, separator, field_value = item.partition(":")
+            if separator == "" or name == "":
+                raise ValidationError(
+                    _("Enter the fields as `name:value`."), code="invalid"
+                )
+            fields.append((name, field_value))
+        return fields
+
+
+class LogFieldsFilter(django_filters.Filter):
+    field_class = LogFieldsFormField
+
+
+class SimpleLogFilterSet(django_filters.FilterSet):
+    level = django_filters.MultipleChoiceFilter(choices=SimpleLog.LogLevel.choices)
+    source = django_filters.MultipleChoiceFilter(choices=SimpleLog.LogSource.choices)
+    time = django_filters.IsoDateTimeFromToRangeFilter()
+    q = django_filters.CharFilter(
+        method="filter_q",
+        label="Full text search in the content of the logs, supports quoted phrases, `or` & `-word`",
+    )
+    field = LogFieldsFilter(
+        method="filter_field",
+        label="Value of a field extracted from the JSON logs (see `logs_extracted_fields`) as `name:value`,"
+        " can be repeated to filter on several fields",
+    )
+
+    class Meta:
+        model = SimpleLog
+        fields = ["level", "source", "time", "q", "field"]
+
+    @staticmethod
+    def filter_q(queryset: QuerySet[SimpleLog], name: str, value: str):
+        return queryset.filter(
+            content_search_vector=SearchQuery(
+                value, config="simple", search_type="websearch"
+            )
+        )
+
+    @staticmethod
+    def filter_field(
+        queryset: QuerySet[SimpleLog], name: str, value: list[tuple[str, str]]
+    ):
+        for field_name, field_value in value:
+            queryset = queryset.filter(
+                Exists(
+                    SimpleLogField.objects.filter(
+                        service_id=OuterRef("service_id"),
+                        name=field_name,
+                        value=field_value,
+                        time=OuterRef("time"),
+                        log_id=OuterRef("id"),
+                    )
+                )
+            )
+        return queryset
+
+    def get_time_range(
+        self,
+    ) -> tuple[datetime.datetime | None, datetime.datetime | None]:
+        """
+        Time range of the filter as `[time_after, time_before)`
+        """
+        time_range: slice | None = self.form.cleaned_data.get("time")
+        if time_range is None:
+            return None, None
+        time_before = time_range.stop
+        if time_before is not None:
+            time_before += datetime.timedelta(microseconds=1)
+        return time_range.start, time_before
+
+    def matches(self, log: dict) -> bool:
+        """
+        Apply the filters to a log which is not in the database (like the archived logs)
+        """
+        data = self.form.cleaned_data
+        if data.get("level") and log["level"] not in data["level"]:
+            return False
+        if data.get("source") and log["source"] not in data["source"]:
+            return False
+        if data.get("q") and not self.matches_search_query(
+            (
+                log["content_json"]
+                if log.get("content_json") is not None
+                else log["content"]
+            ),
+            data["q"],
+        ):
+            return False
+        for field_name, field_value in data.get("field") or []:
+            if (
+                log.get("content_json") is None
+                or get_field_value(log["content_json"], field_name) != field_value
+            ):
+                return False
+        return True
+
+    @staticmethod
+    def matches_search_query(content: Any, query: str) -> bool:
+        """
+        Approximation of the `websearch` full text search of postgres:
+        every word & quoted phrase of the query is in the content, except the ones prefixed with `-`.
+        """
+        words = " ".join(re.findall(r"\w+", json.dumps(content).lower()))
+        for negated, phrase, negated_word, word in re.findall(
+            r'(-?)"([^"]*)"|(-?)(\S+)', query.lower()
+        ):
+            terms = " ".join(re.findall(r"\w+", phrase or word))
+            if terms == "" or terms == "or":
+                continue
+            found = re.search(rf"\b{re.escape(terms)}\b", words) is not None
+            if found == bool(negated or negated_word):
+                return False
+        return True
+
+
+@dataclasses.dataclass
+class LogCursor:
+    time: datetime.datetime
+    id: str
+    # `True` when going back to the newer logs
+    reverse: bool = False
+
+
+class LogCursorPagination(pagination.BasePagination):
+    """
+    Keyset pagination on `(time, id)`, from the newest logs to the oldest.
+    Every page is fetched with a range scan of the `(..., time, id)` indexes starting at the cursor,
+    so the cost of a page does not depend on its depth (no `OFFSET` & no `COUNT(*)`).
+
+    If the view defines `get_archived_logs(time_after, time_before, reverse)`,
+    the archived logs are merged with the logs of the database.
+    """
+
+    page_size = 50
+    max_page_size = 200
+    page_size_query_param = "per_page"
+    cursor_query_param = "cursor"
+
+    def get_page_size(self, request) -> int:
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(page_size, 1), self.max_page_size)
+
+    def decode_cursor(self, request) -> LogCursor | None:
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            data = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+            return LogCursor(
+                time=datetime.datetime.fromisoformat(data["t"]),
+                id=str(uuid.UUID(data["id"])),
+                reverse=bool(data["r"]),
+            )
+        except (binascii.Error, ValueError, TypeError, KeyError):
+            raise exceptions.NotFound("Invalid cursor")
+
+    def encode_cursor(self, cursor: LogCursor) -> str:
+        data = json.dumps(
+            {"t": cursor.time.isoformat(), "id": cursor.id, "r": cursor.reverse}
+        )
+        url = self.request.build_absolute_uri()
+        return pagination.replace_query_param(
+            url,
+            self.cursor_query_param,
+            base64.urlsafe_b64encode(data.encode()).decode(),
+        )
+
+    @staticmethod
+    def get_position(log: SimpleLog | dict) -> tuple[datetime.datetime, str]:
+        if isinstance(log, dict):
+            return log["time"], str(log["id"])
+        return log.time, str(log.id)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page_size = self.get_page_size(request)
+        cursor = self.decode_cursor(request)
+        reverse = cursor is not None and cursor.reverse
+
+        if cursor is None:
+            queryset = queryset.order_by("-time", "-id")
+        elif reverse:
+            queryset = (
+                queryset.filter(time__gte=cursor.time)
+                .exclude(time=cursor.time, id__lte=cursor.id)
+                .order_by("time", "id")
+            )
+        else:
+            queryset = (
+                queryset.filter(time__lte=cursor.time)
+                .exclude(time=cursor.time, id__gte=cursor.id)
+                .order_by("-time", "-id")
+            )
+        logs: Iterator[SimpleLog | dict] = iter(queryset[: page_size + 1])
+
+        get_archived_logs = getattr(view, "get_archived_logs", None)
+        if get_archived_logs is not None:
+            logs = self.merge_archived_logs(logs, get_archived_logs, cursor)
+
+        page = list(itertools.islice(logs, page_size + 1))
+        has_more = len(page) > page_size
+        page = page[:page_size]
+        if reverse:
+            page.reverse()
+
+        self.next_cursor = None
+        self.previous_cursor = None
+        if len(page) > 0:
+            newest_time, newest_id = self.get_position(page[0])
+            oldest_time, oldest_id = self.get_position(page[-1])
+            if has_more or reverse:
+                self.next_cursor = LogCursor(oldest_time, oldest_id, reverse=False)
+            if (has_more and reverse) or (cursor is not None and not reverse):
+                self.previous_cursor = LogCursor(newest_time, newest_id, reverse=True)
+        return page
+
+    def paginate_recent_logs(self, logs: list[dict], request) -> list[dict] | None:
+        """
+        First page taken from the recent logs kept outside the database (sorted from the newest),
+        returns `None` if there are not enough of them to fill the page.
+        """
+        self.request = request
+        page_size = self.get_page_size(request)
+        if len(logs) <= page_size:
+            return None
+        page = logs[:page_size]
+        oldest_time, oldest_id = self.get_position(page[-1])
+        # the next pages are read from the database
+        self.next_cursor = LogCursor(oldest_time, oldest_id, reverse=False)
+        self.previous_cursor = None
+        return page
+
+    def merge_archived_logs(
+        self,
+        logs: Iterator[SimpleLog | dict],
+        get_archived_logs,
+        cursor: LogCursor | None,
+    ) -> Iterator[SimpleLog | dict]:
+        reverse = cursor is not None and cursor.reverse
+        time_after, time_before = None, None
+        if cursor is not None and reverse:
+            time_after = cursor.time
+        elif cursor is not None:
+            time_before = cursor.time + datetime.timedelta(microseconds=1)
+
+        position = self.get_position
+        archived_logs = get_archived_logs(
+            time_after=time_after, time_before=time_before, reverse=not reverse
+        )
+        if cursor is not None:
+            cursor_position = (cursor.time, cursor.id)
+            archived_logs = (
+                log
+                for log in archived_logs
+                if (
+                    position(log) > cursor_position
+                    if reverse
+                    else position(log) < cursor_position
+                )
+            )
+
+        last_id = None
+        for log in heapq.merge(logs, archived_logs, key=position, reverse=not reverse):
+            # a log may still be in the database while it is being archived
+            _, log_id = position(log)
+            if log_id != last_id:
+                yield log
+            last_id = log_id
+
+    def get_paginated_response(self, data):
+        return Response(
+            OrderedDict(
+                [
+                    ("next", self.get_next_link()),
+                    ("previous", self.get_previous_link()),
+                    ("results", data),
+                ]
+            )
+        )
+
+    def get_next_link(self) -> str | None:
+        if self.next_cursor is None:
+            return None
+        return self.encode_cursor(self.next_cursor)
+
+    def get_previous_link(self) -> str | None:
+        if self.previous_cursor is None:
+            return None
+        return self.encode_cursor(self.previous_cursor)
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "previous": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+
+class LogsExportParamsSerializer(serializers.Serializer):
+    compression = serializers.ChoiceField(
+        choices=EXPORT_COMPRESSIONS,
+        default="none",
+        help_text="`gzip` to download the export gzip compressed",
+    )
+
+
+# ==============================
+#         HTTP metrics         #
+# ==============================
+
+
+class HttpMetricsParamsSerializer(serializers.Serializer):
+    time_after = serializers.DateTimeField(
+        required=False, help_text="Defaults to one hour before `time_before`"
+    )
+    time_before = serializers.DateTimeField(required=False, help_text="Defaults to now")
+    interval = serializers.ChoiceField(choices=ROLLUP_INTERVALS, default="minute")
+    request_path = serializers.CharField(
+        required=False,
+        allow_blank=True,
+        default="",
+        help_text="Path of the requests (without the query string), all the requests of the deployment if empty."
+        " The ids in the path are replaced by placeholders: `/users/42` & `/users/:id` are the same path",
+    )
+
+
+class HttpMetricsSerializer(serializers.Serializer):
+    time = serializers.DateTimeField()
+    request_count = serializers.IntegerField()
+    status_1xx_count = serializers.IntegerField()
+    status_2xx_count = serializers.IntegerField()
+    status_3xx_count = serializers.IntegerField()
+    status_4xx_count = serializers.IntegerField()
+    status_5xx_count = serializers.IntegerField()
+    duration_max_ms = serializers.IntegerField()
+    avg_duration_ms = serializers.FloatField(allow_null=True)
+    p50_duration_ms = serializers.IntegerField(allow_null=True)
+    p95_duration_ms = serializers.IntegerField(allow_null=True)
+    p99_duration_ms = serializers.IntegerField(allow_null=True)